@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = 'accounts'
+
+    def ready(self):
+        import accounts.signals  # noqa: F401
+        import accounts.search  # noqa: F401
+        import accounts.reference  # noqa: F401
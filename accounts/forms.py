@@ -1,8 +1,44 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import ValidationError
+from django.utils.choices import CallableChoiceIterator
+
+from . import reference
 from .models import User, EmployeeProfile, CustomerProfile, Skill
 
 
+class SkillMultipleChoiceField(forms.ModelMultipleChoiceField):
+    """
+    Skill picker backed by the cached skill catalog: rendering and validation
+    read ``reference.get('skills')`` instead of querying the skill table.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('widget', forms.CheckboxSelectMultiple)
+        kwargs.setdefault('required', False)
+        super().__init__(queryset=Skill.objects.all(), **kwargs)
+
+    def _get_choices(self):
+        return CallableChoiceIterator(lambda: reference.get('skills')['choices'])
+
+    choices = property(_get_choices, forms.ModelMultipleChoiceField.choices.fset)
+
+    def _check_values(self, value):
+        pks = set()
+        for pk in value:
+            try:
+                pks.add(int(pk))
+            except (TypeError, ValueError):
+                raise ValidationError(self.error_messages['invalid_pk_value'], code='invalid_pk_value',
+                                      params={'pk': pk})
+        unknown = pks - reference.get('skills')['ids']
+        if unknown:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                                  params={'value': min(unknown)})
+        # Lazy: only evaluated when the selection is saved
+        return self.queryset.filter(pk__in=pks)
+
+
 class SignUpForm(UserCreationForm):
     """Registration form that also picks a role."""
     role = forms.ChoiceField(choices=[('employee', 'Employee'), ('customer', 'Customer')])
@@ -19,15 +55,12 @@ class SignUpForm(UserCreationForm):
 class UserUpdateForm(forms.ModelForm):
     class Meta:
         model = User
-        fields = ['first_name', 'last_name', 'email', 'phone', 'address', 'city', 'profile_picture']
+        fields = ['first_name', 'last_name', 'email', 'phone', 'address', 'city', 'profile_picture',
+                  'email_digest']
 
 
 class EmployeeProfileForm(forms.ModelForm):
-    skills = forms.ModelMultipleChoiceField(
-        queryset=Skill.objects.all(),
-        widget=forms.CheckboxSelectMultiple,
-        required=False,
-    )
+    skills = SkillMultipleChoiceField()
 
     class Meta:
         model = EmployeeProfile
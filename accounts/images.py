@@ -0,0 +1,194 @@
+"""
+Size variants for uploaded images.
+
+Uploads are streamed to a temporary file on disk (``FILE_UPLOAD_HANDLERS``)
+and stored as-is. Once the saving transaction commits, a small thread pool
+re-saves the original without its EXIF and XMP blocks (pointing the field at
+the new name if the storage picked one), then decodes it once and writes one
+WebP file per entry of ``VARIANTS`` next to it under ``variants/``, with the
+EXIF orientation applied and all metadata (EXIF, GPS, ICC, XMP) dropped. Templates pick a variant with the
+``variant`` filter from ``{% load images %}``; it gives '' until the variant
+exists, and is never the original's URL, which may still carry the
+uploader's location. ``manage.py build_image_variants`` backfills existing
+media.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps
+
+logger = logging.getLogger('jobmate.images')
+
+# name -> (width, height, crop). Crop fills the box exactly; otherwise the image fits inside it.
+VARIANTS = {
+    'full': (1600, 1600, False),
+    'card': (640, 640, False),
+    'avatar': (160, 160, True),  # 2x the largest avatar in the listings
+}
+WEBP_QUALITY = 80
+# Image.info keys that carry metadata besides EXIF (XMP, including GPS in some files)
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp')
+ORIENTATION = 0x0112  # EXIF tag
+
+_tracked = []  # (model, field name)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(name, variant):
+    """Storage name of ``variant`` for the stored original ``name``."""
+    return f'variants/{os.path.splitext(name)[0]}.{variant}.webp'
+
+
+def variant_url(field_file, variant):
+    """URL of the variant, or '' when there is no file or the variant has not been built (yet)."""
+    if not field_file:
+        return ''
+    name = variant_name(field_file.name, variant)
+    storage = field_file.storage
+    return storage.url(name) if storage.exists(name) else ''
+
+
+def _resized(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    image = image.copy()
+    image.thumbnail((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return image
+
+
+def build_variants(name, storage=default_storage, force=False):
+    """Write every missing (or, with ``force``, every) variant of ``name``; returns how many were written."""
+    targets = {variant: variant_name(name, variant) for variant in VARIANTS}
+    if not force:
+        targets = {variant: target for variant, target in targets.items() if not storage.exists(target)}
+    if not targets:
+        return 0
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        # JPEG can decode straight at a fraction of the size when only smaller outputs are needed
+        largest = max(max(VARIANTS[variant][:2]) for variant in targets)
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    # Largest first, each smaller variant resampled from the previous one rather than the original
+    for variant in sorted(targets, key=lambda v: -max(VARIANTS[v][:2])):
+        width, height, crop = VARIANTS[variant]
+        resized = _resized(image, width, height, crop)
+        if not crop:
+            image = resized
+        out = io.BytesIO()
+        resized.save(out, 'WEBP', quality=WEBP_QUALITY, method=4)  # no exif/icc passed: metadata is dropped
+        if storage.exists(targets[variant]):
+            storage.delete(targets[variant])
+        storage.save(targets[variant], ContentFile(out.getvalue()))
+    return len(targets)
+
+
+def _has_metadata(image):
+    return bool(image.getexif()) or any(key in image.info for key in METADATA_KEYS)
+
+
+def strip_metadata(name, storage=default_storage):
+    """
+    Re-save the original ``name`` in its own format without EXIF (GPS
+    included) and XMP, applying the EXIF orientation first. Returns the name
+    the storage saved it under, which may differ from ``name``, or None when
+    there was nothing to strip.
+    """
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        if not _has_metadata(image):
+            return None
+        fmt = image.format
+        image.load()
+    rotated = image.getexif().get(ORIENTATION, 1) != 1
+    upright = ImageOps.exif_transpose(image) if rotated else image
+    params = {'icc_profile': image.info['icc_profile']} if 'icc_profile' in image.info else {}
+    if fmt == 'JPEG':
+        # Same quantization tables when the pixels are untouched: no further loss
+        params['quality'] = 95 if rotated else 'keep'
+    out = io.BytesIO()
+    upright.save(out, fmt, **params)  # no exif/xmp passed: both are left out
+    storage.delete(name)
+    return storage.save(name, ContentFile(out.getvalue()))
+
+
+def strip_and_build(model, field_name, name, storage=default_storage, force=False, **lookup):
+    """
+    Strip the metadata from the original ``name`` stored in ``model.field_name``,
+    point the rows holding it (narrowed by ``lookup``) at the name it was saved
+    under, then build its variants. Returns (variants written, whether anything
+    was stripped).
+    """
+    stripped = strip_metadata(name, storage)
+    if stripped is not None and stripped != name:
+        # Stripped first so that the variants are named after the file the field ends up with
+        model._default_manager.filter(**{field_name: name}, **lookup).update(**{field_name: stripped})
+        name = stripped
+    return build_variants(name, storage, force=force), stripped is not None
+
+
+def _process(model, field_name, name, pk, on_built):
+    try:
+        strip_and_build(model, field_name, name, pk=pk)
+        if on_built is not None:
+            on_built(pk)
+    except Exception:
+        logger.exception('Building variants of %s failed', name)
+    finally:
+        close_old_connections()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images')
+        return _executor
+
+
+def schedule(model, field_name, name, pk, on_built=None):
+    """
+    Strip and build the variants of the file ``name`` stored in row ``pk`` of
+    ``model.field_name`` in the worker pool once the transaction commits, then
+    call ``on_built(pk)`` there.
+    """
+    if name:
+        transaction.on_commit(lambda: _pool().submit(_process, model, field_name, name, pk, on_built))
+
+
+def track(model, field_name, on_built=None):
+    """
+    Build variants whenever a new file is saved into ``model.field_name``;
+    ``on_built(pk)`` runs in the worker once they exist.
+    """
+    _tracked.append((model, field_name))
+    flag = f'_{field_name}_uploaded'
+
+    def uploading(sender, instance, **kwargs):
+        field_file = getattr(instance, field_name)
+        # Not committed yet = a new upload that this save is about to store
+        setattr(instance, flag, bool(field_file) and not field_file._committed)
+
+    def saved(sender, instance, **kwargs):
+        if getattr(instance, flag, False):
+            setattr(instance, flag, False)
+            schedule(model, field_name, getattr(instance, field_name).name, instance.pk, on_built)
+
+    uid = f'images:{model._meta.label}.{field_name}'
+    pre_save.connect(uploading, sender=model, weak=False, dispatch_uid=f'{uid}:pre')
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=f'{uid}:post')
+
+
+def tracked_fields():
+    """Every (model, field name) registered with ``track``."""
+    return list(_tracked)
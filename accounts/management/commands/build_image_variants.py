@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts import images
+from accounts.signals import notify_profiles_changed
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the missing size variants of every stored profile picture and work-proof image, "
+        "and strip EXIF/XMP metadata from the originals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild variants that already exist.")
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_WORKERS)
+
+    def handle(self, *args, **options):
+        stored = []  # (model, field name, file name)
+        for model, field_name in images.tracked_fields():
+            stored.extend(
+                (model, field_name, name) for name in
+                model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .order_by().values_list(field_name, flat=True).distinct()
+            )
+
+        def build(entry):
+            model, field_name, name = entry
+            try:
+                return images.strip_and_build(model, field_name, name, force=options['force'])
+            except Exception as exc:
+                self.stderr.write(f"  {name}: {exc}")
+                return 0, False
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(build, stored))
+        written = sum(count for count, _ in results)
+        stripped = sum(1 for _, had_metadata in results if had_metadata)
+        if written:
+            # Cached employee cards still show placeholders
+            notify_profiles_changed(None, fields={'profile_picture'})
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} variant(s) for {len(stored)} image(s); stripped metadata from {stripped}."))
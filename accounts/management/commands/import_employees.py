@@ -0,0 +1,319 @@
+import csv
+import json
+import sys
+from time import monotonic
+
+from django import forms
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from accounts import reference
+from accounts.models import EmployeeProfile, Skill, User
+from accounts.signals import notify_profiles_changed
+from dashboard.models import PlatformStats
+
+USER_COLUMNS = ['email', 'first_name', 'last_name', 'phone', 'city']
+PROFILE_COLUMNS = ['bio', 'hourly_rate', 'daily_rate', 'monthly_rate', 'availability',
+                   'experience_years', 'is_verified', 'latitude', 'longitude']
+COLUMNS = {'username', 'skills', *USER_COLUMNS, *PROFILE_COLUMNS}
+# Rates derived from the hourly rate when a row leaves them blank (8h day, 160h month)
+RATE_MULTIPLIERS = {'daily_rate': 8, 'monthly_rate': 160}
+JSON_READ_SIZE = 64 * 1024
+
+
+# One imported employee. Blank optional cells take the model defaults.
+ROW_FIELDS = {
+    'username': forms.CharField(max_length=150, validators=[User.username_validator]),
+    'email': forms.EmailField(required=False),
+    'first_name': forms.CharField(max_length=150, required=False),
+    'last_name': forms.CharField(max_length=150, required=False),
+    'phone': forms.CharField(max_length=20, required=False),
+    'city': forms.CharField(max_length=100, required=False),
+    'bio': forms.CharField(required=False),
+    'hourly_rate': forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False),
+    'daily_rate': forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False),
+    'monthly_rate': forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False),
+    'availability': forms.ChoiceField(choices=EmployeeProfile.AVAILABILITY_CHOICES, required=False),
+    'experience_years': forms.IntegerField(min_value=0, required=False),
+    'is_verified': forms.NullBooleanField(required=False),
+    'latitude': forms.FloatField(min_value=-90, max_value=90, required=False),
+    'longitude': forms.FloatField(min_value=-180, max_value=180, required=False),
+    # "Plumbing; Trade: Tiling": names separated by ';', optionally prefixed by a category
+    'skills': forms.CharField(required=False),
+}
+
+
+def _parse_skills(value):
+    """{name: category} from a skills cell."""
+    skills = {}
+    for entry in value.split(';'):
+        category, _, name = entry.rpartition(':')
+        name, category = name.strip(), category.strip()
+        if not name:
+            continue
+        if len(name) > 100 or len(category) > 100:
+            raise ValidationError(f'Skill name or category too long: {entry.strip()!r}.')
+        skills.setdefault(name, category)
+    return skills
+
+
+def clean_row(record):
+    """
+    (cleaned values, {field: [messages]}) for one record. The shared field
+    objects are used directly: a Form per row would deep-copy them every time.
+    """
+    cleaned, errors = {}, {}
+    for name, field in ROW_FIELDS.items():
+        try:
+            value = field.clean(record.get(name, ''))
+            if name == 'skills':
+                value = _parse_skills(value)
+            cleaned[name] = value
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    hourly = cleaned.get('hourly_rate')
+    for field, multiplier in RATE_MULTIPLIERS.items():
+        if cleaned.get(field) is None and hourly is not None:
+            cleaned[field] = hourly * multiplier
+    return cleaned, errors
+
+
+def _csv_records(stream):
+    reader = csv.DictReader(stream)
+    blank = [str(position) for position, name in enumerate(reader.fieldnames or [], 1) if not name.strip()]
+    if blank:
+        raise CommandError(f"The CSV header has blank column name(s) at position(s) {', '.join(blank)}.")
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _json_records(stream):
+    """Objects of a JSON array or of JSON Lines, decoded incrementally; yields (number, object)."""
+    decoder = json.JSONDecoder()
+    buffer, pos, number, in_array = '', 0, 0, None
+    while True:
+        chunk = stream.read(JSON_READ_SIZE)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] in ',]')):
+                pos += 1
+            if pos == len(buffer):
+                break
+            if in_array is None:
+                in_array = buffer[pos] == '['
+                pos += in_array
+                continue
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError(f'Invalid JSON after record {number}.')
+                break  # the record continues in the next read
+            number += 1
+            pos = end
+            yield number, record
+        if not chunk:
+            return
+
+
+def _cell(value):
+    if isinstance(value, list):
+        return '; '.join(str(item) for item in value)
+    return '' if value is None else value
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update employees (user, profile and skills) from CSV or JSON, "
+        "a chunk of rows per handful of set-based statements."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV, JSON array or JSON Lines file; '-' reads stdin.")
+        parser.add_argument('--format', choices=['csv', 'json'],
+                            help="Default: from the file extension (csv unless .json/.jsonl/.ndjson).")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path, fmt = options['path'], options['format']
+        if fmt is None:
+            fmt = 'json' if path.rsplit('.', 1)[-1].lower() in ('json', 'jsonl', 'ndjson') else 'csv'
+        self.started = monotonic()
+        self.totals = {'created': 0, 'updated': 0, 'failed': 0}
+        self.password = make_password(None)  # imported employees set a password via reset
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        try:
+            records = _csv_records(stream) if fmt == 'csv' else _json_records(stream)
+            self.run(records, options['chunk_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = monotonic() - self.started
+        rows = sum(self.totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.totals['created']} created, {self.totals['updated']} updated, "
+            f"{self.totals['failed']} failed in {elapsed:.1f}s ({rows / max(elapsed, 1e-6):,.0f} rows/s)."
+        ))
+
+    def run(self, records, chunk_size):
+        columns, chunk, ignored = None, [], set()
+        for number, record in records:
+            if not isinstance(record, dict):
+                self.error(number, 'not an object')
+                continue
+            if None in record:  # csv.DictReader's key for cells past the header
+                self.error(number, f'{len(record[None])} more cell(s) than the header has columns')
+                continue
+            if columns is None:
+                # The first record (the CSV header) decides which fields the import writes
+                columns = set(record)
+                unknown = columns - COLUMNS
+                if unknown:
+                    raise CommandError(f"Unknown column(s): {', '.join(map(repr, sorted(unknown)))}. "
+                                       f"Available: {', '.join(sorted(COLUMNS))}.")
+                if 'username' not in columns:
+                    raise CommandError("A 'username' column is required.")
+            extra = set(record) - columns - ignored
+            if extra:
+                # JSON records may carry keys the first one lacked; they are not imported
+                ignored |= extra
+                self.stderr.write(f"  row {number}: ignoring key(s) {', '.join(map(repr, sorted(extra)))} "
+                                  f"missing from the first record, which sets the columns")
+            chunk.append((number, record))
+            if len(chunk) >= chunk_size:
+                self.import_chunk(chunk, columns)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk, columns)
+
+    def error(self, number, message):
+        self.totals['failed'] += 1
+        self.stderr.write(f"  row {number}: {message}")
+
+    def validate(self, chunk, columns):
+        rows, seen = [], set()
+        for number, record in chunk:
+            row, errors = clean_row({column: _cell(record.get(column)) for column in columns})
+            if errors:
+                self.error(number, '; '.join(f'{field}: {" ".join(messages)}' for field, messages in errors.items()))
+            elif row['username'] in seen:
+                self.error(number, f"username {row['username']!r} repeats an earlier row")
+            else:
+                seen.add(row['username'])
+                rows.append((number, row))
+        return rows
+
+    def import_chunk(self, chunk, columns):
+        rows = self.validate(chunk, columns)
+        existing = {
+            username: (pk, role) for pk, username, role in
+            User.objects.filter(username__in=[row['username'] for _, row in rows]).values_list('pk', 'username', 'role')
+        }
+        numbers, accepted = [], []
+        for number, row in rows:
+            role = existing.get(row['username'], (None, 'employee'))[1]
+            if role != 'employee':
+                self.error(number, f"{row['username']!r} is an existing {role} account")
+            else:
+                numbers.append(number)
+                accepted.append(row)
+        if not accepted:
+            return
+
+        user_fields = [c for c in USER_COLUMNS if c in columns]
+        profile_fields = [c for c in PROFILE_COLUMNS if c in columns]
+        if 'hourly_rate' in columns:
+            profile_fields += [field for field in RATE_MULTIPLIERS if field not in profile_fields]
+        try:
+            with transaction.atomic():
+                skill_ids = self.upsert_skills(accepted) if 'skills' in columns else None
+                users = User.objects.bulk_create(
+                    [User(username=row['username'], role='employee', password=self.password,
+                          **{field: row[field] for field in user_fields}) for row in accepted],
+                    update_conflicts=bool(user_fields), ignore_conflicts=not user_fields,
+                    unique_fields=['username'], update_fields=user_fields or None,
+                )
+                if not user_fields:
+                    # ignore_conflicts returns no pks: read them back
+                    ids = dict(User.objects.filter(username__in=[u.username for u in users])
+                               .values_list('username', 'pk'))
+                    for user in users:
+                        user.pk = ids[user.username]
+                was_verified = dict(EmployeeProfile.objects.filter(user__in=users).values_list('user_id', 'is_verified'))
+                profiles = EmployeeProfile.objects.bulk_create(
+                    [EmployeeProfile(user=user, **self.profile_values(row, profile_fields))
+                     for user, row in zip(users, accepted)],
+                    update_conflicts=True, unique_fields=['user'],
+                    update_fields=profile_fields or ['user'],
+                )
+                if skill_ids is not None:
+                    self.replace_skills(profiles, accepted, skill_ids, existed=was_verified.keys())
+
+                created = sum(1 for user in users if user.username not in existing)
+                pending = 0
+                for profile in profiles:
+                    if profile.user_id not in was_verified:
+                        pending += not profile.is_verified
+                    elif 'is_verified' in columns:
+                        pending += was_verified[profile.user_id] - profile.is_verified
+                PlatformStats.apply(users_employee=created, pending_verifications=pending)
+        except DatabaseError as exc:
+            for number in numbers:
+                self.error(number, f'chunk rolled back: {exc}')
+            return
+
+        # Search documents, card versions, the matching index and page caches
+        notify_profiles_changed(profile.pk for profile in profiles)
+        self.totals['created'] += created
+        self.totals['updated'] += len(accepted) - created
+        done = sum(self.totals.values())
+        self.stdout.write(f"  [{monotonic() - self.started:7.1f}s] {done} rows")
+
+    def profile_values(self, row, fields):
+        values = {}
+        for field in fields:
+            value = row[field]
+            if value is None or value == '':
+                value = EmployeeProfile._meta.get_field(field).get_default()
+            values[field] = value
+        return values
+
+    def upsert_skills(self, rows):
+        """{name: pk} for every skill named in ``rows``, creating the missing ones."""
+        wanted = {}
+        for row in rows:
+            for name, category in row['skills'].items():
+                wanted.setdefault(name, category)
+        if not wanted:
+            return {}
+        ids = dict(Skill.objects.filter(name__in=wanted).values_list('name', 'pk'))
+        missing = [Skill(name=name, category=wanted[name]) for name in wanted if name not in ids]
+        if missing:
+            Skill.objects.bulk_create(missing, ignore_conflicts=True)
+            ids.update(Skill.objects.filter(name__in=[s.name for s in missing]).values_list('name', 'pk'))
+            reference.invalidate('skills')  # bulk_create sends no post_save
+        return ids
+
+    def replace_skills(self, profiles, rows, skill_ids, existed):
+        """Set each profile's skills to its row's: one DELETE (existing profiles only) and one INSERT."""
+        through = EmployeeProfile.skills.through
+        through.objects.filter(employeeprofile__user_id__in=existed).delete()
+        profile_ids, ids = [], []
+        for profile, row in zip(profiles, rows):
+            for name in row['skills']:
+                profile_ids.append(profile.pk)
+                ids.append(skill_ids[name])
+        if not ids:
+            return
+        # Link rows are the bulk of an import: insert them from two arrays instead of model instances
+        table = connection.ops.quote_name(through._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (employeeprofile_id, skill_id) '
+                f'SELECT * FROM unnest(%s::bigint[], %s::bigint[])',
+                [profile_ids, ids],
+            )
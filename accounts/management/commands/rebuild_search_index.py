@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import EmployeeProfile
+from accounts.search import update_search_documents
+
+
+class Command(BaseCommand):
+    help = "Regenerate the full-text search document of every employee profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Profiles updated per UPDATE statement.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(EmployeeProfile.objects.order_by('pk').values_list('pk', flat=True))
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            updated += update_search_documents(ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {updated} search documents."))
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def populate_search_documents(apps, schema_editor):
+    from accounts.search import document_expression
+    EmployeeProfile = apps.get_model('accounts', 'EmployeeProfile')
+    EmployeeProfile.objects.update(search_document=document_expression(
+        apps.get_model('accounts', 'Skill'), apps.get_model('accounts', 'User'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeeprofile',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='employeeprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='employee_search_gin'),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
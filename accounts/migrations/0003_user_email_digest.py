@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_employeeprofile_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_digest',
+            field=models.BooleanField(default=False, help_text='Bundle booking notifications into a periodic digest email.'),
+        ),
+    ]
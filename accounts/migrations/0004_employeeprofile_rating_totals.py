@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-17 13:40
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+
+def populate_rating_totals(apps, schema_editor):
+    EmployeeProfile = apps.get_model('accounts', 'EmployeeProfile')
+    Review = apps.get_model('bookings', 'Review')
+    reviews = Review.objects.filter(booking__employee=OuterRef('user_id')).order_by().values('booking__employee')
+    rating_sum = Coalesce(Subquery(reviews.annotate(s=Sum('rating')).values('s'), output_field=IntegerField()), 0)
+    rating_count = Coalesce(Subquery(reviews.annotate(n=Count('pk')).values('n'), output_field=IntegerField()), 0)
+    EmployeeProfile.objects.update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        avg_rating=Cast(rating_sum, FloatField()) / Greatest(rating_count, Value(1)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_email_digest'),
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeeprofile',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='employeeprofile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_rating_totals, migrations.RunPython.noop),
+    ]
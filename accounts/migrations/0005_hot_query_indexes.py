@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:50
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without blocking writes to large tables
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0004_employeeprofile_rating_totals'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='employeeprofile',
+            index=models.Index(fields=['availability', '-avg_rating', 'id'], name='employee_available_rating'),
+        ),
+        AddIndexConcurrently(
+            model_name='employeeprofile',
+            index=models.Index(condition=models.Q(('is_verified', False)), fields=['id'], name='employee_unverified'),
+        ),
+    ]
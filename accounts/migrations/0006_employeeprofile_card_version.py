@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-17 16:30
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeeprofile',
+            name='card_version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
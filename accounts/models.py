@@ -1,4 +1,8 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -28,6 +32,8 @@ class User(AbstractUser):
     address = models.TextField(blank=True)
     city = models.CharField(max_length=100, blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    email_digest = models.BooleanField(
+        default=False, help_text="Bundle booking notifications into a periodic digest email.")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -66,19 +72,34 @@ class EmployeeProfile(models.Model):
     avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0,
                                      validators=[MinValueValidator(0), MaxValueValidator(5)])
     total_jobs = models.PositiveIntegerField(default=0)
+    # Running review totals; avg_rating is derived from them (see bookings.ratings)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    # Denormalised skills/names/city/bio tsvector, maintained by accounts.search
+    search_document = SearchVectorField(null=True, editable=False)
+    # Replaced whenever the profile, its user or its skills change; part of the
+    # cache key of the rendered employee cards (see bookings.cards)
+    card_version = models.UUIDField(default=uuid.uuid4, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_document'], name='employee_search_gin'),
+            # Home page: available employees by rating, in (avg_rating desc, pk) keyset order
+            models.Index(fields=['availability', '-avg_rating', 'id'], name='employee_available_rating'),
+            # Admin dashboard: the (shrinking) set of employees awaiting verification
+            models.Index(fields=['id'], condition=models.Q(is_verified=False), name='employee_unverified'),
+        ]
 
     def __str__(self):
         return f"Employee: {self.user.get_full_name() or self.user.username}"
 
     def update_rating(self):
-        """Recalculate average rating from all completed booking reviews."""
-        from bookings.models import Review
-        reviews = Review.objects.filter(booking__employee=self.user, rating__isnull=False)
-        if reviews.exists():
-            self.avg_rating = reviews.aggregate(models.Avg('rating'))['rating__avg']
-            self.save(update_fields=['avg_rating'])
+        """Recalculate the rating totals and average from all of the employee's reviews."""
+        from bookings.ratings import recount_employee
+        recount_employee(self.user_id)
+        self.refresh_from_db(fields=['rating_sum', 'rating_count', 'avg_rating'])
 
 
 class CustomerProfile(models.Model):
@@ -0,0 +1,103 @@
+"""
+Two-tier cache for reference data that forms render on every request.
+
+A reference dataset (e.g. the skill catalog) is built by a registered loader
+and stored in the shared cache under its current version, a random token kept
+in the shared cache too. Each process also keeps the last few datasets it has
+used in a small LRU keyed by (name, version), so a warm read is one cache
+``get`` for the version and no database query. Writes to the underlying
+models replace the version on commit, which retires both tiers at once.
+Code that writes through ``bulk_create`` or ``QuerySet.update`` should call
+``invalidate()`` itself.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Skill
+
+LOCAL_SIZE = 8  # datasets (any name, any version) kept per process
+SHARED_TIMEOUT = 24 * 3600  # superseded versions simply expire
+
+_loaders = {}
+_local = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version_key(name):
+    return f'reference:{name}:version'
+
+
+def _version(name):
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def register(name, *models):
+    """Register the decorated loader as dataset ``name``, invalidated by writes to ``models``."""
+    def decorator(loader):
+        _loaders[name] = loader
+
+        def changed(sender, **kwargs):
+            invalidate(name)
+
+        for model in models:
+            post_save.connect(changed, sender=model, weak=False, dispatch_uid=f'reference:{name}:save')
+            post_delete.connect(changed, sender=model, weak=False, dispatch_uid=f'reference:{name}:delete')
+        return loader
+    return decorator
+
+
+def get(name):
+    """The current version of dataset ``name``, loading it if neither tier has it."""
+    version = _version(name)
+    with _lock:
+        data = _local.get((name, version))
+        if data is not None:
+            _local.move_to_end((name, version))
+            return data
+
+    shared_key = f'reference:{name}:{version}'
+    data = cache.get(shared_key)
+    if data is None:
+        data = _loaders[name]()
+        cache.set(shared_key, data, SHARED_TIMEOUT)
+
+    with _lock:
+        _local[(name, version)] = data
+        while len(_local) > LOCAL_SIZE:
+            _local.popitem(last=False)
+    return data
+
+
+def invalidate(name):
+    """Retire the cached copies of ``name`` once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(_version_key(name), uuid.uuid4().hex, timeout=None))
+
+
+@register('skills', Skill)
+def load_skills():
+    """
+    The skill catalog: ``ids`` (a frozenset), ``by_category`` ({category: [(pk,
+    name)]}, '' for uncategorised) and ``choices``, grouped by category for
+    choice widgets with uncategorised skills under "Other".
+    """
+    by_category = {}
+    for pk, name, category in Skill.objects.order_by('category', 'name').values_list('pk', 'name', 'category'):
+        by_category.setdefault(category, []).append((pk, name))
+    choices = [(category, skills) for category, skills in by_category.items() if category]
+    if '' in by_category:
+        choices.append(('Other', by_category['']))
+    return {
+        'ids': frozenset(pk for skills in by_category.values() for pk, _ in skills),
+        'by_category': by_category,
+        'choices': choices,
+    }
@@ -0,0 +1,100 @@
+"""
+Full-text search documents for employee profiles.
+
+Each EmployeeProfile carries a denormalised ``search_document`` tsvector
+(skills, names, city and bio, weighted in that order) backed by a GIN index.
+Documents are rebuilt with a single set-based UPDATE whenever
+``employee_profiles_changed`` reports a change to one of ``SEARCHED_FIELDS``
+(or does not say what changed); rating, job count or picture updates leave
+them alone. ``manage.py rebuild_search_index`` regenerates all of them.
+"""
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Concat
+from django.dispatch import receiver
+
+from .models import EmployeeProfile, Skill, User
+from .signals import employee_profiles_changed
+
+# 'simple' keeps names and cities intact (no stemming or stop words)
+SEARCH_CONFIG = 'simple'
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Everything document_expression() reads ('skills' covers skill names and links)
+SEARCHED_FIELDS = frozenset({'skills', 'first_name', 'last_name', 'username', 'city', 'bio'})
+
+
+def document_expression(skill_model=Skill, user_model=User):
+    """
+    Expression computing a profile's search document from correlated
+    subqueries, usable in ``QuerySet.update()`` (which does not allow joins).
+    The model arguments let migrations pass historical models.
+    """
+    skill_names = Subquery(
+        skill_model.objects
+        .filter(employees=OuterRef('pk'))
+        .order_by()
+        .values('employees')
+        .annotate(names=StringAgg('name', delimiter=' '))
+        .values('names'),
+        output_field=TextField(),
+    )
+    user = user_model.objects.filter(pk=OuterRef('user_id'))
+    names = Subquery(
+        user.annotate(names=Concat('first_name', Value(' '), 'last_name', Value(' '), 'username',
+                                   output_field=TextField()))
+        .values('names'),
+        output_field=TextField(),
+    )
+    city = Subquery(user.values('city'), output_field=TextField())
+    return (
+        SearchVector(skill_names, weight='A', config=SEARCH_CONFIG)
+        + SearchVector(names, weight='A', config=SEARCH_CONFIG)
+        + SearchVector(city, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('bio', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_documents(profile_ids=None):
+    """Rebuild the search document of ``profile_ids`` (all profiles when None)."""
+    qs = EmployeeProfile.objects.all()
+    if profile_ids is not None:
+        qs = qs.filter(pk__in=profile_ids)
+    return qs.update(search_document=document_expression())
+
+
+def build_query(query_text):
+    """
+    Parse free text into a prefix-matching OR query, e.g. ``plumb lon`` ->
+    ``plumb:* | lon:*``. Returns None when there is nothing searchable.
+    """
+    tokens = _TOKEN_RE.findall(query_text.lower())
+    if not tokens:
+        return None
+    raw = ' | '.join(f'{token}:*' for token in dict.fromkeys(tokens))
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_profiles(query_text, queryset=None):
+    """Profiles matching ``query_text``, best matches first."""
+    qs = EmployeeProfile.objects.all() if queryset is None else queryset
+    query = build_query(query_text or '')
+    if query is None:
+        return qs.none()
+    return (
+        qs.filter(search_document=query)
+        # ts_rank is a real; as a double it round-trips exactly through Python,
+        # which keyset cursors on the rank rely on
+        .annotate(rank=Cast(SearchRank(F('search_document'), query), FloatField()))
+        .order_by('-rank', 'pk')
+    )
+
+
+@receiver(employee_profiles_changed)
+def refresh_search_documents(sender, profile_ids, deleted=False, fields=None, **kwargs):
+    if not deleted and (fields is None or fields & SEARCHED_FIELDS):
+        update_search_documents(profile_ids)
@@ -0,0 +1,90 @@
+"""
+Change notifications for employee data.
+
+Model signals on EmployeeProfile, its skills, Skill and User are translated
+into a single ``employee_profiles_changed`` signal so in-process indexes and
+caches have one place to listen. Code that writes through ``QuerySet.update``
+or ``bulk_create`` (which skip model signals) should send it explicitly.
+"""
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver, Signal
+
+from . import images
+from .models import User, EmployeeProfile, Skill
+
+# Sent with ``profile_ids`` (a list of EmployeeProfile pks, or None for
+# "everything"), ``deleted`` (True when the profiles no longer exist) and
+# ``fields`` (a frozenset of the changed User/EmployeeProfile field names,
+# 'skills' for skill changes, or None when unknown).
+employee_profiles_changed = Signal()
+
+
+def notify_profiles_changed(profile_ids, deleted=False, fields=None):
+    """Send ``employee_profiles_changed`` for the given profiles."""
+    if profile_ids is not None:
+        profile_ids = list(profile_ids)
+        if not profile_ids:
+            return
+    if fields is not None:
+        fields = frozenset(fields)
+    employee_profiles_changed.send(sender=EmployeeProfile, profile_ids=profile_ids, deleted=deleted, fields=fields)
+
+
+@receiver(post_save, sender=EmployeeProfile)
+def employee_profile_saved(sender, instance, update_fields=None, **kwargs):
+    notify_profiles_changed([instance.pk], fields=update_fields)
+
+
+@receiver(post_delete, sender=EmployeeProfile)
+def employee_profile_deleted(sender, instance, **kwargs):
+    notify_profiles_changed([instance.pk], deleted=True)
+
+
+@receiver(m2m_changed, sender=EmployeeProfile.skills.through)
+def employee_skills_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            notify_profiles_changed([instance.pk], fields={'skills'})
+    elif action == 'pre_clear':
+        # Skill.employees.clear(): pk_set is not provided, remember who is affected
+        instance._cleared_profile_ids = list(instance.employees.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        notify_profiles_changed(getattr(instance, '_cleared_profile_ids', None), fields={'skills'})
+    else:
+        notify_profiles_changed(pk_set or [], fields={'skills'})
+
+
+@receiver(post_save, sender=Skill)
+def skill_saved(sender, instance, created, **kwargs):
+    if not created:
+        notify_profiles_changed(instance.employees.values_list('pk', flat=True), fields={'skills'})
+
+
+@receiver(pre_delete, sender=Skill)
+def skill_deleting(sender, instance, **kwargs):
+    # The M2M rows are gone by post_delete, so collect the holders first
+    instance._affected_profile_ids = list(instance.employees.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Skill)
+def skill_deleted(sender, instance, **kwargs):
+    notify_profiles_changed(getattr(instance, '_affected_profile_ids', None), fields={'skills'})
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return  # every login touches last_login; nothing profile-related changed
+    profile_ids = EmployeeProfile.objects.filter(user=instance).values_list('pk', flat=True)
+    notify_profiles_changed(profile_ids, fields=update_fields)
+
+
+def _avatar_built(user_id):
+    # Cached employee cards embed the avatar URL
+    notify_profiles_changed(EmployeeProfile.objects.filter(user_id=user_id).values_list('pk', flat=True),
+                            fields={'profile_picture'})
+
+
+images.track(User, 'profile_picture', on_built=_avatar_built)
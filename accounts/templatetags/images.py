@@ -0,0 +1,11 @@
+from django import template
+
+from accounts.images import variant_url
+
+register = template.Library()
+
+
+@register.filter
+def variant(field_file, name):
+    """``{{ user.profile_picture|variant:'avatar' }}``: URL of a size variant, or '' until it is built."""
+    return variant_url(field_file, name)
@@ -1,3 +1,224 @@
+"""
+Tests for the employee search documents, the bulk employee importer and the
+image metadata stripping.
+
+    python manage.py test accounts
+"""
+import io
+import json
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from bookings.ratings import apply_rating_change
+from dashboard.models import PlatformStats
+from . import images
+from .models import EmployeeProfile, Skill, User
+from .search import search_profiles
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'full-text search runs on PostgreSQL')
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plumbing = Skill.objects.create(name='Plumbing')
+        cls.plumber = cls.employee('mario', 'Mario', 'Rossi', 'London', 'Fixes leaks.', cls.plumbing)
+        cls.painter = cls.employee('luigi', 'Luigi', 'Verdi', 'Leeds', 'Used to do plumbing, now paints.')
+
+    @staticmethod
+    def employee(username, first_name, last_name, city, bio, *skills):
+        user = User.objects.create_user(username, f'{username}@example.com', 'pw', role='employee',
+                                        first_name=first_name, last_name=last_name, city=city)
+        profile = EmployeeProfile.objects.create(user=user, bio=bio, hourly_rate=Decimal('20.00'))
+        profile.skills.add(*skills)
+        return profile
+
+    def found(self, text):
+        return list(search_profiles(text).values_list('pk', flat=True))
+
+    def test_prefixes_match_whole_words(self):
+        # The 'simple' config does not stem; prefix queries stand in for it
+        self.assertEqual(self.found('lond'), [self.plumber.pk])
+        self.assertEqual(self.found('Mario'), [self.plumber.pk])
+        self.assertCountEqual(self.found('ROSS leed'), [self.plumber.pk, self.painter.pk])
+        self.assertEqual(self.found('carpentry'), [])
+        self.assertEqual(self.found('?!'), [])
+
+    def test_skills_and_names_rank_above_the_bio(self):
+        self.assertEqual(self.found('plumb'), [self.plumber.pk, self.painter.pk])
+
+    def test_lookup_uses_the_gin_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = search_profiles('plumb').explain()
+        self.assertIn('employee_search_gin', plan, msg=plan)
+
+    def test_documents_follow_searched_fields(self):
+        self.painter.bio = 'Hangs wallpaper.'
+        self.painter.save()
+        self.assertEqual(self.found('wallpaper'), [self.painter.pk])
+        self.painter.skills.add(Skill.objects.create(name='Tiling'))
+        self.assertEqual(self.found('tiling'), [self.painter.pk])
+        user = self.painter.user
+        user.city = 'York'
+        user.save(update_fields=['city'])
+        self.assertEqual(self.found('york'), [self.painter.pk])
+
+    def test_other_changes_leave_the_documents_alone(self):
+        profile = EmployeeProfile.objects.get(pk=self.plumber.pk)
+        profile.is_verified = True
+        with CaptureQueriesContext(connection) as queries:
+            apply_rating_change(profile.user_id, 5, 1)
+            profile.save(update_fields=['is_verified'])
+            profile.user.save(update_fields=['last_login'])
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertFalse([sql for sql in updates if 'search_document' in sql])
+        self.assertEqual(self.found('mario'), [self.plumber.pk])
+
+
+class ImportEmployeesTests(TestCase):
+
+    def setUp(self):
+        PlatformStats.reconcile()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def run_import(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        out, err = StringIO(), StringIO()
+        call_command('import_employees', path, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def skills(self, username):
+        return sorted(EmployeeProfile.objects.get(user__username=username).skills.values_list('name', flat=True))
+
+    def assertStatsMatchTables(self):
+        stats = PlatformStats.objects.get(pk=PlatformStats.ROW_ID)
+        self.assertEqual({field: getattr(stats, field) for field in PlatformStats.compute()}, PlatformStats.compute())
+
+    def test_creates_updates_and_reports_failures(self):
+        User.objects.create_user('boss', 'boss@example.com', 'pw', role='admin')
+        out, err = self.run_import('first.csv', (
+            'username,city,hourly_rate,is_verified,skills\n'
+            'ann,Leeds,20,true,Trade: Plumbing; Tiling\n'
+            'bob,York,abc,,\n'
+            'cat,Hull,15,false,\n'
+            'ann,Leeds,25,,\n'
+            'boss,Leeds,30,,\n'
+        ))
+        self.assertIn('2 created, 0 updated, 3 failed', out)
+        self.assertIn('row 3: hourly_rate', err)
+        self.assertIn("row 5: username 'ann' repeats an earlier row", err)
+        self.assertIn("row 6: 'boss' is an existing admin account", err)
+        ann = EmployeeProfile.objects.get(user__username='ann')
+        self.assertEqual((ann.hourly_rate, ann.daily_rate, ann.is_verified),
+                         (Decimal('20.00'), Decimal('160.00'), True))
+        self.assertEqual(self.skills('ann'), ['Plumbing', 'Tiling'])
+        self.assertEqual(Skill.objects.get(name='Plumbing').category, 'Trade')
+        stats = PlatformStats.objects.get(pk=PlatformStats.ROW_ID)
+        self.assertEqual((stats.users_employee, stats.pending_verifications), (2, 1))
+        self.assertStatsMatchTables()
+
+        out, err = self.run_import('second.json', json.dumps([
+            {'username': 'ann', 'skills': ['Roofing'], 'is_verified': False},
+            {'username': 'dan', 'skills': [], 'is_verified': True},
+        ]))
+        self.assertIn('1 created, 1 updated, 0 failed', out)
+        self.assertEqual(self.skills('ann'), ['Roofing'])  # replaced, not added to
+        self.assertEqual(User.objects.get(username='ann').city, 'Leeds')  # not a column: left alone
+        stats = PlatformStats.objects.get(pk=PlatformStats.ROW_ID)
+        self.assertEqual((stats.users_employee, stats.pending_verifications), (3, 2))
+        self.assertStatsMatchTables()
+
+    def test_blank_header_cells_are_reported(self):
+        with self.assertRaisesMessage(CommandError, 'blank column name(s) at position(s) 2, 4'):
+            self.run_import('blank.csv', 'username,,city, \nann,x,Leeds,y\n')
+        self.assertFalse(User.objects.exists())
+
+    def test_unknown_columns_are_named(self):
+        with self.assertRaisesMessage(CommandError, "Unknown column(s): 'cty'."):
+            self.run_import('typo.csv', 'username,cty\nann,Leeds\n')
+
+    def test_cells_past_the_header_fail_their_row(self):
+        out, err = self.run_import('wide.csv', 'username,city\nann,Leeds\nbob,York,extra\n')
+        self.assertIn('1 created, 0 updated, 1 failed', out)
+        self.assertIn('row 3: 1 more cell(s) than the header has columns', err)
+
+    def test_json_keys_missing_from_the_first_record_are_reported(self):
+        out, err = self.run_import('late.jsonl', '\n'.join(json.dumps(record) for record in (
+            {'username': 'ann'},
+            {'username': 'bob', 'city': 'York', 'bogus': 1},
+            {'username': 'cat', 'city': 'Hull'},
+        )))
+        self.assertIn('3 created', out)
+        self.assertIn("row 2: ignoring key(s) 'bogus', 'city' missing from the first record", err)
+        self.assertEqual(err.count('ignoring'), 1)
+        self.assertEqual(User.objects.get(username='bob').city, '')
+
+
+class RenamingStorage(FileSystemStorage):
+    """Keeps deleted names taken for a while, as eventually consistent storages can."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.deleted = set()
+
+    def delete(self, name):
+        self.deleted.add(name)
+        super().delete(name)
+
+    def get_available_name(self, name, max_length=None):
+        if name in self.deleted:
+            root, ext = os.path.splitext(name)
+            name = f'{root}_v2{ext}'
+        return super().get_available_name(name, max_length)
+
+
+class StripMetadataTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = RenamingStorage(location=directory.name)
+
+    def store_photo(self, name):
+        exif = Image.Exif()
+        exif[images.ORIENTATION] = 6
+        out = io.BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(out, 'JPEG', exif=exif)
+        self.storage._save(name, ContentFile(out.getvalue()))
+
+    def test_field_follows_the_name_the_storage_picked(self):
+        self.store_photo('profile_pics/ann.jpg')
+        user = User.objects.create_user('ann', 'ann@example.com', 'pw', profile_picture='profile_pics/ann.jpg')
+        written, stripped = images.strip_and_build(User, 'profile_picture', 'profile_pics/ann.jpg',
+                                                   storage=self.storage, pk=user.pk)
+        self.assertEqual((written, stripped), (len(images.VARIANTS), True))
+        user.refresh_from_db()
+        self.assertEqual(user.profile_picture.name, 'profile_pics/ann_v2.jpg')
+        with self.storage.open(user.profile_picture.name) as f:
+            image = Image.open(f)
+            self.assertFalse(image.getexif())
+            self.assertEqual(image.size, (20, 40))  # rotated upright
+        for variant in images.VARIANTS:
+            self.assertTrue(self.storage.exists(images.variant_name(user.profile_picture.name, variant)))
 
-# Create your tests here.
+    def test_clean_files_are_left_alone(self):
+        out = io.BytesIO()
+        Image.new('RGB', (8, 8)).save(out, 'PNG')
+        self.storage._save('profile_pics/bob.png', ContentFile(out.getvalue()))
+        self.assertIsNone(images.strip_metadata('profile_pics/bob.png', self.storage))
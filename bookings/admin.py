@@ -1,5 +1,25 @@
-from django.contrib import admin
-from .models import Booking, Review, WorkProof
+from django.contrib import admin, messages
+from .models import Booking, Review, WorkProof, OutboxMessage
+from .workflow import TRANSITIONS, TransitionError, transition
+
+
+def _transition_action(action):
+    def run(modeladmin, request, queryset):
+        done = skipped = 0
+        for pk in queryset.values_list('pk', flat=True):
+            try:
+                transition(pk, action)  # staff with change permission act on any booking
+                done += 1
+            except TransitionError:
+                skipped += 1
+        modeladmin.message_user(request, f"{action.capitalize()}: {done} booking(s) updated.", messages.SUCCESS)
+        if skipped:
+            modeladmin.message_user(
+                request, f"{skipped} booking(s) skipped: not in a state that allows '{action}'.", messages.WARNING)
+    run.__name__ = f'{action}_bookings'
+    run.short_description = f"{action.capitalize()} selected bookings"
+    run.allowed_permissions = ('change',)  # view-only staff must not move bookings or their counters
+    return run
 
 
 @admin.register(Booking)
@@ -9,6 +29,9 @@ class BookingAdmin(admin.ModelAdmin):
     list_filter = ('status', 'duration_type')
     search_fields = ('title', 'customer__username', 'employee__username')
     filter_horizontal = ('skills_required',)
+    # Status only moves through the state machine (bookings.workflow), which keeps the counters right
+    readonly_fields = ('status',)
+    actions = [_transition_action(action) for action in TRANSITIONS]
 
 
 @admin.register(Review)
@@ -21,3 +44,10 @@ class ReviewAdmin(admin.ModelAdmin):
 class WorkProofAdmin(admin.ModelAdmin):
     list_display = ('booking', 'uploaded_by', 'created_at')
     list_filter = ('created_at',)
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'last_error')
@@ -0,0 +1,331 @@
+"""
+Read-only JSON API for the mobile app.
+
+Every endpoint answers conditional GETs. The ETag is computed before the view
+runs, from version stamps that are cheap to read:
+
+* employee list and match results: a stamp replaced on every committed
+  employee change (``employee_profiles_changed``);
+* employee profile: the profile's ``card_version``, replaced whenever the
+  profile, its user, skills, rating or completed job count change;
+* booking list: a per-user stamp, replaced when any of the user's bookings
+  is saved or deleted;
+* booking detail: the booking's ``updated_at`` plus a per-booking stamp,
+  replaced when its review or work proofs are saved or deleted, or a proof's
+  image variants are built.
+
+Stamps are random tokens in the shared cache, never counters: a flushed
+cache or another process starts from a fresh token, which can cost a 200
+but never stands for different data.
+
+A matching ``If-None-Match`` is answered with 304 before the results are
+queried or serialized. ``?fields=a,b`` selects the fields to return, and
+related rows (skills, review, work proofs) are only loaded when asked for;
+an unknown field is a 400, sent without an ETag.
+"""
+import hashlib
+import uuid
+
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from django.views.decorators.vary import vary_on_cookie
+
+from accounts.images import variant_url
+from accounts.models import EmployeeProfile
+from accounts.signals import employee_profiles_changed
+from .models import Booking, Review, WorkProof
+from .pagination import paginate_queryset
+from .views import BOOKING_KEYS, BOOKING_PAGE_SIZE, _paginate, bookings_visible_to, search_employees
+
+STAMP_KEY = 'api:stamp:%s'
+EMPLOYEES_STAMP = 'employees'
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def _money(value):
+    return float(value) if value is not None else None
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+def _user(user):
+    return {'id': user.pk, 'username': user.username, 'name': user.get_full_name() or user.username}
+
+
+# name -> (getter, related lookups it needs). Employees are EmployeeProfile instances with user loaded.
+EMPLOYEE_FIELDS = {
+    'id': (lambda p: p.user_id, ()),
+    'username': (lambda p: p.user.username, ()),
+    'name': (lambda p: p.user.get_full_name() or p.user.username, ()),
+    'city': (lambda p: p.user.city, ()),
+    'avatar': (lambda p: variant_url(p.user.profile_picture, 'avatar') or None, ()),
+    'bio': (lambda p: p.bio, ()),
+    'skills': (lambda p: [s.name for s in p.skills.all()], ('skills',)),
+    'hourly_rate': (lambda p: _money(p.hourly_rate), ()),
+    'daily_rate': (lambda p: _money(p.daily_rate), ()),
+    'monthly_rate': (lambda p: _money(p.monthly_rate), ()),
+    'availability': (lambda p: p.availability, ()),
+    'experience_years': (lambda p: p.experience_years, ()),
+    'is_verified': (lambda p: p.is_verified, ()),
+    'avg_rating': (lambda p: _money(p.avg_rating), ()),
+    'rating_count': (lambda p: p.rating_count, ()),
+    'bookings_completed': (lambda p: p.total_jobs, ()),
+}
+EMPLOYEE_LIST_DEFAULT = ('id', 'name', 'city', 'avatar', 'skills', 'hourly_rate', 'avg_rating', 'is_verified')
+
+BOOKING_FIELDS = {
+    'id': (lambda b: b.pk, ()),
+    'title': (lambda b: b.title, ()),
+    'description': (lambda b: b.description, ()),
+    'status': (lambda b: b.status, ()),
+    'duration_type': (lambda b: b.duration_type, ()),
+    'duration_value': (lambda b: b.duration_value, ()),
+    'rate_applied': (lambda b: _money(b.rate_applied), ()),
+    'total_cost': (lambda b: _money(b.total_cost), ()),
+    'start_date': (lambda b: _date(b.start_date), ()),
+    'end_date': (lambda b: _date(b.end_date), ()),
+    'location': (lambda b: b.location, ()),
+    'created_at': (lambda b: b.created_at.isoformat(), ()),
+    'updated_at': (lambda b: b.updated_at.isoformat(), ()),
+    'customer': (lambda b: _user(b.customer), ()),
+    'employee': (lambda b: _user(b.employee), ()),
+    'skills': (lambda b: [s.name for s in b.skills_required.all()], ('skills_required',)),
+}
+BOOKING_DETAIL_FIELDS = {
+    **BOOKING_FIELDS,
+    'review': (lambda b: _review(b), ()),
+    'work_proofs': (lambda b: [
+        {'id': proof.pk, 'description': proof.description, 'created_at': proof.created_at.isoformat(),
+         'image': variant_url(proof.image, 'card') or None, 'image_full': variant_url(proof.image, 'full') or None}
+        for proof in b.work_proofs.all()
+    ], ('work_proofs',)),
+}
+BOOKING_LIST_DEFAULT = ('id', 'title', 'status', 'total_cost', 'created_at', 'updated_at', 'customer', 'employee')
+
+
+def _review(booking):
+    review = getattr(booking, 'review', None)
+    if review is None:
+        return None
+    return {'rating': review.rating, 'comment': review.comment, 'created_at': review.created_at.isoformat()}
+
+
+def requested_fields(request, available, default=None):
+    """Fields named in ``?fields=`` (validated), else ``default`` (None = all of them)."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(default or available)
+    fields = list(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in available]
+    if unknown or not fields:
+        raise InvalidFields(f"Unknown field(s): {', '.join(unknown) or '(none)'}. "
+                            f"Available: {', '.join(available)}.")
+    return fields
+
+
+def _prefetches(fields, available):
+    return sorted({lookup for field in fields for lookup in available[field][1]})
+
+
+def _serialize(obj, fields, available):
+    return {field: available[field][0](obj) for field in fields}
+
+
+def _etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _query_key(request):
+    """The query string, order-independent, as part of an ETag."""
+    return sorted((key, request.GET.getlist(key)) for key in request.GET)
+
+
+def api_view(etag_func, available):
+    """
+    GET-only, login-required JSON endpoint with ETag-based conditional responses.
+
+    ``available`` is the endpoint's field table: a request with an invalid
+    ``?fields=`` gets no ETag, so its 400 can never be answered with a 304.
+    """
+    def checked_etag(request, *args, **kwargs):
+        try:
+            requested_fields(request, available)
+        except InvalidFields:
+            return None
+        return etag_func(request, *args, **kwargs)
+
+    def decorator(view):
+        view = condition(etag_func=checked_etag)(view)
+        view = cache_control(private=True, no_cache=True)(view)  # clients may keep it, but must revalidate
+        return login_required(require_GET(vary_on_cookie(view)))
+    return decorator
+
+
+def _bad_request(exc):
+    return JsonResponse({'error': str(exc)}, status=400)
+
+
+# Version stamps
+
+def _stamp(name):
+    key = STAMP_KEY % name
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def _replace_stamps(*names):
+    cache.set_many({STAMP_KEY % name: uuid.uuid4().hex for name in names}, timeout=None)
+
+
+def replace_stamps_on_commit(*names):
+    """Retire the stamps ``names`` once the current transaction commits."""
+    transaction.on_commit(lambda: _replace_stamps(*names))
+
+
+def _booking_list_stamp(user_id):
+    return f'bookings:{user_id}'  # 'bookings:all' for the admins' list
+
+
+def _booking_detail_stamp(booking_id):
+    return f'booking:{booking_id}'
+
+
+@receiver(employee_profiles_changed)
+def employees_changed(sender, **kwargs):
+    replace_stamps_on_commit(EMPLOYEES_STAMP)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    """Retire the booking lists of both parties (and the admins')."""
+    replace_stamps_on_commit(*[_booking_list_stamp(key) for key in (instance.customer_id, instance.employee_id, 'all')])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=WorkProof)
+@receiver(post_delete, sender=WorkProof)
+def booking_detail_changed(sender, instance, **kwargs):
+    """A review or work proof changed: the booking's detail changes without touching its row."""
+    replace_stamps_on_commit(_booking_detail_stamp(instance.booking_id))
+
+
+def proof_variants_built(proof_id):
+    """The proof's image URLs now point at its variants (called from the image worker)."""
+    booking_id = WorkProof.objects.filter(pk=proof_id).values_list('booking_id', flat=True).first()
+    if booking_id is not None:
+        _replace_stamps(_booking_detail_stamp(booking_id))
+
+
+# Employees
+
+def _employee_list_etag(request):
+    return _etag('employees', _stamp(EMPLOYEES_STAMP), _query_key(request))
+
+
+@api_view(_employee_list_etag, EMPLOYEE_FIELDS)
+def employee_list_api(request):
+    """
+    Employee list and match results, as on /employees/ (same q, lat, lng,
+    radius_km and cursor parameters), plus each result's score or distance.
+    """
+    try:
+        fields = requested_fields(request, EMPLOYEE_FIELDS, EMPLOYEE_LIST_DEFAULT)
+    except InvalidFields as exc:
+        return _bad_request(exc)
+    page = search_employees(request)[3]
+    prefetch_related_objects([item['profile'] for item in page], *_prefetches(fields, EMPLOYEE_FIELDS))
+    results = []
+    for item in page:
+        result = _serialize(item['profile'], fields, EMPLOYEE_FIELDS)
+        if 'distance_km' in item:
+            result['distance_km'] = round(item['distance_km'], 2)
+        elif item.get('score') is not None:
+            result['score'] = item['score']
+        results.append(result)
+    return JsonResponse({'results': results, 'next_cursor': page.next_cursor})
+
+
+def _employee_etag(request, pk):
+    version = EmployeeProfile.objects.filter(user_id=pk, user__role='employee').values_list(
+        'card_version', flat=True).first()
+    return _etag('employee', pk, version, request.GET.get('fields')) if version else None
+
+
+@api_view(_employee_etag, EMPLOYEE_FIELDS)
+def employee_detail_api(request, pk):
+    """An employee's public profile (``pk`` is the user id, as on /accounts/employee/<pk>/)."""
+    try:
+        fields = requested_fields(request, EMPLOYEE_FIELDS)
+    except InvalidFields as exc:
+        return _bad_request(exc)
+    qs = EmployeeProfile.objects.select_related('user').prefetch_related(*_prefetches(fields, EMPLOYEE_FIELDS))
+    profile = get_object_or_404(qs, user_id=pk, user__role='employee')
+    return JsonResponse(_serialize(profile, fields, EMPLOYEE_FIELDS))
+
+
+# Bookings
+
+def _booking_list_etag(request):
+    user = request.user
+    stamp = _stamp(_booking_list_stamp(user.pk if user.is_customer or user.is_employee else 'all'))
+    return _etag('bookings', user.pk, stamp, _query_key(request))
+
+
+@api_view(_booking_list_etag, BOOKING_FIELDS)
+def booking_list_api(request):
+    """The user's bookings, newest first (all bookings for admins); ``?cursor=`` pages."""
+    try:
+        fields = requested_fields(request, BOOKING_FIELDS, BOOKING_LIST_DEFAULT)
+    except InvalidFields as exc:
+        return _bad_request(exc)
+    bookings = bookings_visible_to(request.user).select_related('customer', 'employee')
+    page = _paginate(request, paginate_queryset, bookings, BOOKING_KEYS, page_size=BOOKING_PAGE_SIZE)
+    prefetch_related_objects(page.items, *_prefetches(fields, BOOKING_FIELDS))
+    return JsonResponse({
+        'results': [_serialize(booking, fields, BOOKING_FIELDS) for booking in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
+def _can_view(user, customer_id, employee_id):
+    return user.pk in (customer_id, employee_id) or user.is_admin_user
+
+
+def _booking_etag(request, pk):
+    row = Booking.objects.filter(pk=pk).values_list('customer_id', 'employee_id', 'updated_at').first()
+    if row is None or not _can_view(request.user, row[0], row[1]):
+        return None  # let the view answer 404/403
+    return _etag('booking', pk, row[2], _stamp(_booking_detail_stamp(pk)), request.GET.get('fields'))
+
+
+@api_view(_booking_etag, BOOKING_DETAIL_FIELDS)
+def booking_detail_api(request, pk):
+    """One booking with its review and work proofs; for its customer, its employee and admins."""
+    try:
+        fields = requested_fields(request, BOOKING_DETAIL_FIELDS)
+    except InvalidFields as exc:
+        return _bad_request(exc)
+    qs = Booking.objects.select_related('customer', 'employee', 'review').prefetch_related(
+        *_prefetches(fields, BOOKING_DETAIL_FIELDS))
+    booking = get_object_or_404(qs, pk=pk)
+    if not _can_view(request.user, booking.customer_id, booking.employee_id):
+        return JsonResponse({'error': 'Not allowed.'}, status=403)
+    return JsonResponse(_serialize(booking, fields, BOOKING_DETAIL_FIELDS))
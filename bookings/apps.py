@@ -7,3 +7,7 @@ class BookingsConfig(AppConfig):
 
     def ready(self):
         import bookings.signals  # noqa: F401
+        import bookings.index  # noqa: F401
+        import bookings.cards  # noqa: F401
+        import bookings.page_cache  # noqa: F401
+        import bookings.api  # noqa: F401
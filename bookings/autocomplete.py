@@ -0,0 +1,223 @@
+"""
+In-memory autocomplete for the search box.
+
+Suggests skill names, cities and employee names of available employees. Every
+word of a term is indexed in a sorted key list, so prefix lookups are a
+``bisect`` plus a short scan; a trigram index backs a typo-tolerant fallback
+when there are too few prefix hits. Terms are reference-counted per profile,
+which lets the index follow ``bookings.index``'s change log and patch only the
+profiles that changed instead of reloading everything.
+"""
+import bisect
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from accounts.models import EmployeeProfile
+from .index import changes_since, current_generation
+
+KIND_ORDER = {'skill': 0, 'city': 1, 'name': 2}
+SCAN_LIMIT = 256  # prefix entries examined per query
+FUZZY_CANDIDATES = 50  # trigram candidates checked with edit distance
+COMMON_GRAM = 2000  # trigrams shared by more terms than this carry no signal
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+
+def trigrams(text):
+    padded = f'  {text}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein distance between a and b, or limit + 1 if it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if prev2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+def max_typos(query):
+    if len(query) < 3:
+        return 0
+    return 1 if len(query) <= 5 else 2
+
+
+class AutocompleteIndex:
+    """Reference-counted suggestion terms with prefix and trigram lookups."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.generation = None
+        self._reset()
+
+    def _reset(self):
+        self.labels = {}  # (kind, norm) -> display label
+        self.counts = Counter()  # (kind, norm) -> number of employees contributing it
+        self.keys = []  # sorted (word-suffix, kind, norm)
+        self.grams = defaultdict(set)  # trigram -> {(kind, norm)}
+        self.contributions = {}  # profile id -> [(kind, label), ...]
+
+    # -- maintenance ----------------------------------------------------
+
+    def _add_term(self, kind, label):
+        norm = normalize(label)
+        if not norm:
+            return
+        term = (kind, norm)
+        self.counts[term] += 1
+        if self.counts[term] > 1:
+            return
+        self.labels[term] = label
+        for key in self._word_keys(norm):
+            bisect.insort(self.keys, (key, kind, norm))
+        for gram in trigrams(norm):
+            self.grams[gram].add(term)
+
+    def _remove_term(self, kind, label):
+        norm = normalize(label)
+        term = (kind, norm)
+        if self.counts[term] <= 0:
+            return
+        self.counts[term] -= 1
+        if self.counts[term]:
+            return
+        del self.counts[term]
+        del self.labels[term]
+        for key in self._word_keys(norm):
+            i = bisect.bisect_left(self.keys, (key, kind, norm))
+            if i < len(self.keys) and self.keys[i] == (key, kind, norm):
+                del self.keys[i]
+        for gram in trigrams(norm):
+            self.grams[gram].discard(term)
+            if not self.grams[gram]:
+                del self.grams[gram]
+
+    @staticmethod
+    def _word_keys(norm):
+        """The term itself plus the suffix starting at each later word."""
+        keys = [norm]
+        for i, ch in enumerate(norm):
+            if ch == ' ':
+                keys.append(norm[i + 1:])
+        return keys
+
+    def _load(self, profile_ids=None):
+        """{profile id: [(kind, label), ...]} for available employees."""
+        qs = EmployeeProfile.objects.filter(availability='available')
+        if profile_ids is not None:
+            qs = qs.filter(pk__in=profile_ids)
+        terms = {}
+        for pk, first, last, username, city in qs.values_list(
+                'pk', 'user__first_name', 'user__last_name', 'user__username', 'user__city'):
+            name = f'{first} {last}'.strip() or username
+            terms[pk] = [('name', name)] + ([('city', city)] if city else [])
+        pairs = EmployeeProfile.skills.through.objects.filter(employeeprofile__in=qs.values('pk'))
+        for pk, skill in pairs.values_list('employeeprofile_id', 'skill__name'):
+            if pk in terms:
+                terms[pk].append(('skill', skill))
+        return terms
+
+    def _set_contribution(self, profile_id, terms):
+        for kind, label in self.contributions.pop(profile_id, []):
+            self._remove_term(kind, label)
+        if terms:
+            self.contributions[profile_id] = terms
+            for kind, label in terms:
+                self._add_term(kind, label)
+
+    def build(self):
+        generation = current_generation()
+        terms = self._load()
+        with self._lock:
+            self._reset()
+            for profile_id, profile_terms in terms.items():
+                self._set_contribution(profile_id, profile_terms)
+            self.generation = generation
+
+    def patch(self, profile_ids):
+        """Re-read ``profile_ids``; profiles gone or no longer available drop out."""
+        terms = self._load(profile_ids)
+        with self._lock:
+            for profile_id in profile_ids:
+                self._set_contribution(profile_id, terms.get(profile_id))
+
+    def ensure_fresh(self):
+        shared = current_generation()
+        with self._lock:
+            if self.generation is None:
+                self.build()
+            elif self.generation != shared:
+                changes = changes_since(self.generation, shared)
+                if changes is None:
+                    self.build()
+                else:
+                    changed, deleted = changes
+                    self.patch(changed | deleted)
+                    self.generation = shared
+
+    # -- queries --------------------------------------------------------
+
+    def _suggestion(self, term):
+        kind, _ = term
+        return {'label': self.labels[term], 'kind': kind, 'count': self.counts[term]}
+
+    def _rank(self, terms):
+        return sorted(terms, key=lambda t: (-self.counts[t], KIND_ORDER[t[0]], t[1]))
+
+    def suggest(self, query, limit=8):
+        """Up to ``limit`` suggestions for ``query``, prefix hits first, then fuzzy hits."""
+        norm = normalize(query)
+        if not norm:
+            return []
+        self.ensure_fresh()
+        with self._lock:
+            found = {}
+            i = bisect.bisect_left(self.keys, (norm,))
+            for key, kind, term_norm in self.keys[i:i + SCAN_LIMIT]:
+                if not key.startswith(norm):
+                    break
+                found[(kind, term_norm)] = None
+            results = self._rank(found)[:limit]
+
+            typos = max_typos(norm)
+            if len(results) < limit and typos:
+                shared = Counter()
+                for gram in trigrams(norm):
+                    postings = self.grams.get(gram, ())
+                    if len(postings) > COMMON_GRAM:
+                        continue
+                    for term in postings:
+                        if term not in found:
+                            shared[term] += 1
+                fuzzy = []
+                for term, _ in shared.most_common(FUZZY_CANDIDATES):
+                    # Compare against prefixes of each word of the term that are
+                    # about as long as the query (one character shorter or longer)
+                    distance = min(
+                        edit_distance(norm, key[:length], typos)
+                        for key in self._word_keys(term[1])
+                        for length in (len(norm) - 1, len(norm), len(norm) + 1)
+                    )
+                    if distance <= typos:
+                        fuzzy.append((distance, term))
+                fuzzy.sort(key=lambda x: (x[0], -self.counts[x[1]], x[1][1]))
+                results += [term for _, term in fuzzy][:limit - len(results)]
+            return [self._suggestion(term) for term in results]
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,78 @@
+"""
+Cached employee card fragments.
+
+The per-profile parts of the employee cards on the home page and the employee
+list (avatar, name, city, skill badges, stars, rates) are rendered once and
+cached under the profile's ``card_version``, which is replaced whenever
+``employee_profiles_changed`` reports a change to the profile, its user or its
+skills. ``attach_cards`` fetches every card of a page with one ``get_many``,
+renders only the misses and stores them with one ``set_many``. Parts that
+depend on the request (match score, distance, the Hire link) stay in the page
+template.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.dispatch import receiver
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from accounts.models import EmployeeProfile
+from accounts.signals import employee_profiles_changed
+
+# Bump when the card templates change, so fragments rendered from the old markup are not served
+TEMPLATE_VERSION = 3
+CARD_TIMEOUT = 24 * 3600  # superseded versions simply expire
+
+CARD_TEMPLATES = {
+    'home': 'bookings/_card_home.html',
+    'list_head': 'bookings/_card_list_head.html',
+    'list_body': 'bookings/_card_list_body.html',
+}
+
+
+def card_key(profile, variant):
+    return f'employee_card:{TEMPLATE_VERSION}:{variant}:{profile.pk}:{profile.card_version.hex}'
+
+
+def attach_cards(profiles, *variants):
+    """
+    Set ``profile.cards`` ({variant: html}) on each profile: one cache
+    round-trip for the page, rendering and storing only the misses.
+    """
+    profiles = list(profiles)
+    keys = {(profile.pk, variant): card_key(profile, variant) for profile in profiles for variant in variants}
+    cached = cache.get_many(list(keys.values()))
+
+    misses = [profile for profile in profiles
+              if any(keys[profile.pk, variant] not in cached for variant in variants)]
+    # Skills are only needed to render a card, so only misses load them
+    prefetch_related_objects(misses, 'skills')
+    rendered = {}
+    for variant in variants:
+        template = get_template(CARD_TEMPLATES[variant])
+        for profile in misses:
+            key = keys[profile.pk, variant]
+            if key not in cached:
+                rendered[key] = template.render({'profile': profile})
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+
+    cached.update(rendered)
+    for profile in profiles:
+        profile.cards = {variant: mark_safe(cached[keys[profile.pk, variant]]) for variant in variants}
+    return profiles
+
+
+@receiver(employee_profiles_changed)
+def replace_card_versions(sender, profile_ids, deleted=False, **kwargs):
+    """A new version stamp retires every cached card of the changed profiles."""
+    if deleted:
+        return
+    profiles = EmployeeProfile.objects.all()
+    if profile_ids is not None:
+        profiles = profiles.filter(pk__in=profile_ids)
+    # A fresh UUID rather than a counter: a concurrent full save() that writes
+    # back the version it loaded must not recreate a key already in use
+    profiles.update(card_version=uuid.uuid4())
@@ -1,14 +1,10 @@
 from django import forms
 from .models import Booking, Review, WorkProof
-from accounts.models import Skill
+from accounts.forms import SkillMultipleChoiceField
 
 
 class BookingForm(forms.ModelForm):
-    skills_required = forms.ModelMultipleChoiceField(
-        queryset=Skill.objects.all(),
-        widget=forms.CheckboxSelectMultiple,
-        required=False,
-    )
+    skills_required = SkillMultipleChoiceField()
 
     class Meta:
         model = Booking
@@ -49,3 +45,14 @@ class SearchForm(forms.Form):
             'placeholder': 'Search by skill, location, or name…',
         }),
     )
+    # Customer location (filled in by the browser) and optional "within N km" mode
+    lat = forms.FloatField(required=False, min_value=-90, max_value=90, widget=forms.HiddenInput)
+    lng = forms.FloatField(required=False, min_value=-180, max_value=180, widget=forms.HiddenInput)
+    radius_km = forms.TypedChoiceField(
+        required=False,
+        coerce=int,
+        empty_value=None,
+        choices=[('', 'Any distance'), (5, 'Within 5 km'), (10, 'Within 10 km'),
+                 (25, 'Within 25 km'), (50, 'Within 50 km')],
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
@@ -0,0 +1,100 @@
+"""
+Uniform latitude/longitude grid used to prefilter proximity matching.
+
+Rows with coordinates are bucketed into square cells of ``cell_deg`` degrees
+and kept sorted by cell code, so the rows in any block of cells around a point
+are found with a few ``searchsorted`` calls instead of a haversine over the
+whole workforce. Queries return a superset of the rows within the radius;
+callers still compute exact distances for that (small) superset.
+"""
+import math
+
+import numpy as np
+
+from .matching import EARTH_RADIUS_KM
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+DEFAULT_CELL_DEG = 0.25  # ~28 km of latitude per cell
+
+
+class GeoGrid:
+    """Cell index over parallel latitude/longitude arrays (NaN = no location)."""
+
+    def __init__(self, latitudes, longitudes, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.n_lng_cells = int(math.ceil(360 / cell_deg))
+        located = np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))
+        codes = self._codes(latitudes[located], longitudes[located])
+        order = np.argsort(codes, kind='stable')
+        self.codes = codes[order]
+        self.rows = located[order]
+
+    def _lat_cell(self, lat):
+        return np.floor((np.clip(lat, -90, 90) + 90) / self.cell_deg).astype(np.int64)
+
+    def _lng_cell(self, lng):
+        return np.floor(((lng + 180) % 360) / self.cell_deg).astype(np.int64) % self.n_lng_cells
+
+    def _codes(self, latitudes, longitudes):
+        return self._lat_cell(latitudes) * self.n_lng_cells + self._lng_cell(longitudes)
+
+    def rows_within(self, lat, lng, radius_km):
+        """Row indices in the cells that may hold points within ``radius_km`` of (lat, lng)."""
+        radius_deg = radius_km / KM_PER_DEGREE
+        lat_span = int(math.ceil(radius_deg / self.cell_deg))
+        # Largest longitude offset that can still be within the radius, taken at
+        # the most poleward latitude in range (from the haversine formula)
+        widest = math.radians(min(90.0, abs(lat) + radius_deg))
+        ratio = math.sin(radius_km / (2 * EARTH_RADIUS_KM)) / max(math.cos(widest), 1e-12)
+        if ratio >= 1:
+            lng_span = self.n_lng_cells
+        else:
+            lng_span = int(math.ceil(math.degrees(2 * math.asin(ratio)) / self.cell_deg))
+
+        lat_cell = int(self._lat_cell(lat))
+        lng_cell = int(self._lng_cell(lng))
+        max_lat_cell = int(self._lat_cell(90))
+        if 2 * lng_span + 1 >= self.n_lng_cells:
+            lng_ranges = [(0, self.n_lng_cells - 1)]
+        else:
+            lo, hi = lng_cell - lng_span, lng_cell + lng_span
+            if lo < 0:
+                lng_ranges = [(0, hi), (lo % self.n_lng_cells, self.n_lng_cells - 1)]
+            elif hi >= self.n_lng_cells:
+                lng_ranges = [(lo, self.n_lng_cells - 1), (0, hi % self.n_lng_cells)]
+            else:
+                lng_ranges = [(lo, hi)]
+
+        slices = []
+        for row in range(max(0, lat_cell - lat_span), min(max_lat_cell, lat_cell + lat_span) + 1):
+            base = row * self.n_lng_cells
+            for lo, hi in lng_ranges:
+                start = np.searchsorted(self.codes, base + lo, side='left')
+                stop = np.searchsorted(self.codes, base + hi, side='right')
+                if stop > start:
+                    slices.append(self.rows[start:stop])
+        if not slices:
+            return np.arange(0)
+        return np.sort(np.concatenate(slices))
+
+    def restrict(self, rows):
+        """A view of this grid that answers in positions of the sorted subset ``rows``."""
+        return RestrictedGeoGrid(self, rows)
+
+
+class RestrictedGeoGrid:
+    """GeoGrid over a subset of rows, reusing the parent's cell index."""
+
+    def __init__(self, parent, rows):
+        self.parent = parent
+        self.rows = rows
+
+    def rows_within(self, lat, lng, radius_km):
+        near = self.parent.rows_within(lat, lng, radius_km)
+        if not len(near) or not len(self.rows):
+            return np.arange(0)
+        positions = np.minimum(np.searchsorted(self.rows, near), len(self.rows) - 1)
+        return positions[self.rows[positions] == near]
+
+    def restrict(self, rows):
+        return RestrictedGeoGrid(self.parent, self.rows[rows])
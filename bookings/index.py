@@ -0,0 +1,248 @@
+"""
+In-process matching index.
+
+Each worker keeps an array-backed snapshot of every EmployeeProfile (skills,
+rating, coordinates, availability, verification) so ``rank_employees`` can
+score the workforce without reading it from PostgreSQL on every request.
+
+Invalidation is driven by ``accounts.signals.employee_profiles_changed``: the
+writing worker bumps a generation counter in the shared cache and records the
+changed profile ids under that generation. Every worker compares its local
+generation with the shared one before serving a request and, when behind,
+re-reads just the changed rows. If part of the change log has expired the
+index is rebuilt from scratch.
+"""
+import threading
+import time
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import receiver
+
+from accounts.models import EmployeeProfile
+from accounts.signals import employee_profiles_changed
+from .geo import GeoGrid
+from .matching import CandidateSet, SCORING_FIELDS
+
+GENERATION_KEY = 'matching_index:generation'
+CHANGES_KEY = 'matching_index:changes:%d'
+CHANGES_TTL = 60 * 60  # workers further behind than this rebuild fully
+MAX_CATCH_UP = 500  # generations; past this a rebuild is cheaper than replaying
+
+INDEX_FIELDS = SCORING_FIELDS + ('availability', 'is_verified')
+AVAILABILITY_CODES = {key: code for code, (key, _) in enumerate(EmployeeProfile.AVAILABILITY_CHOICES)}
+
+# Compact the arrays once this share of rows are tombstones
+COMPACT_RATIO = 0.25
+
+
+def _same(a, b):
+    """Float equality where NaN (no location) equals NaN."""
+    return a == b or (np.isnan(a) and np.isnan(b))
+
+
+def current_generation():
+    return cache.get(GENERATION_KEY, 0)
+
+
+def publish_change(profile_ids, deleted=False):
+    """Bump the shared generation and log which profiles changed."""
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    generation = cache.incr(GENERATION_KEY)
+    cache.set(CHANGES_KEY % generation, (profile_ids, deleted), CHANGES_TTL)
+    return generation
+
+
+def changes_since(generation, shared=None):
+    """
+    Profiles changed between ``generation`` and the shared generation, as
+    ``(changed_ids, deleted_ids)``, or None when the log cannot tell (entries
+    expired, a change covered every profile, or the counter was reset) and
+    the caller should rebuild from scratch.
+    """
+    shared = current_generation() if shared is None else shared
+    behind = range(generation + 1, shared + 1)
+    if not 0 < len(behind) <= MAX_CATCH_UP:
+        return None
+    changes = cache.get_many([CHANGES_KEY % g for g in behind])
+    if len(changes) != len(behind):
+        return None
+    profile_ids, deleted = set(), set()
+    for ids, was_deleted in changes.values():
+        if ids is None:
+            return None
+        (deleted if was_deleted else profile_ids).update(ids)
+    return profile_ids, deleted
+
+
+class MatchingIndex:
+    """Array-backed snapshot of the workforce, patched incrementally."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.candidates = None
+        self.availability = None
+        self.verified = None
+        self.alive = None
+        self.row_of = {}
+        self.generation = None
+        self.stats_counters = {'hits': 0, 'misses': 0, 'refreshes': 0, 'rebuilds': 0, 'patched_rows': 0}
+        self.last_build_seconds = None
+
+    # -- building -------------------------------------------------------
+
+    def _load(self, profile_ids=None):
+        qs = EmployeeProfile.objects.all()
+        pairs = EmployeeProfile.skills.through.objects.all()
+        if profile_ids is not None:
+            qs = qs.filter(pk__in=profile_ids)
+            pairs = pairs.filter(employeeprofile_id__in=profile_ids)
+        rows = list(qs.order_by('pk').values_list(*INDEX_FIELDS))
+        return rows, list(pairs.values_list('employeeprofile_id', 'skill_id'))
+
+    def build(self):
+        """(Re)load the full snapshot."""
+        started = time.perf_counter()
+        generation = current_generation()
+        rows, pairs = self._load()
+        candidates = CandidateSet.from_rows(rows, pairs)
+        candidates.grid = GeoGrid(candidates.latitudes, candidates.longitudes)
+        with self._lock:
+            self.candidates = candidates
+            self.availability = np.fromiter(
+                (AVAILABILITY_CODES.get(r[4], -1) for r in rows), dtype=np.int8, count=len(rows))
+            self.verified = np.fromiter((r[5] for r in rows), dtype=bool, count=len(rows))
+            self.alive = np.ones(len(rows), dtype=bool)
+            self.row_of = {int(pk): i for i, pk in enumerate(candidates.ids)}
+            self.generation = generation
+        self.last_build_seconds = time.perf_counter() - started
+
+    def _append_rows(self, n):
+        c = self.candidates
+        c.ids = np.concatenate([c.ids, np.zeros(n, dtype=np.int64)])
+        c.ratings = np.concatenate([c.ratings, np.zeros(n)])
+        c.latitudes = np.concatenate([c.latitudes, np.full(n, np.nan)])
+        c.longitudes = np.concatenate([c.longitudes, np.full(n, np.nan)])
+        c.skills.append_rows(n)
+        self.availability = np.concatenate([self.availability, np.full(n, -1, dtype=np.int8)])
+        self.verified = np.concatenate([self.verified, np.zeros(n, dtype=bool)])
+        self.alive = np.concatenate([self.alive, np.zeros(n, dtype=bool)])
+
+    def patch(self, profile_ids):
+        """Re-read ``profile_ids`` from the database and update their rows in place."""
+        profile_ids = set(profile_ids)
+        rows, pairs = self._load(profile_ids)
+        skills_of = {}
+        for pid, sid in pairs:
+            skills_of.setdefault(pid, []).append(sid)
+
+        with self._lock:
+            new = [r for r in rows if r[0] not in self.row_of]
+            if new:
+                start = len(self.candidates)
+                self._append_rows(len(new))
+                for offset, r in enumerate(new):
+                    self.row_of[r[0]] = start + offset
+            c = self.candidates
+            moved = bool(new)
+            for r in rows:
+                i = self.row_of[r[0]]
+                lat = np.nan if r[2] is None else r[2]
+                lng = np.nan if r[3] is None else r[3]
+                moved = moved or not (_same(c.latitudes[i], lat) and _same(c.longitudes[i], lng))
+                c.ids[i] = r[0]
+                c.ratings[i] = float(r[1])
+                c.latitudes[i] = lat
+                c.longitudes[i] = lng
+                c.skills.set_row(i, skills_of.get(r[0], []))
+                self.availability[i] = AVAILABILITY_CODES.get(r[4], -1)
+                self.verified[i] = r[5]
+                self.alive[i] = True
+            if moved:
+                c.grid = None  # rebuilt lazily by select()
+            # Anything requested but no longer in the database was deleted
+            for pid in profile_ids - {r[0] for r in rows}:
+                self.remove(pid)
+            self.stats_counters['patched_rows'] += len(profile_ids)
+
+    def remove(self, profile_id):
+        with self._lock:
+            i = self.row_of.pop(profile_id, None)
+            if i is not None:
+                self.alive[i] = False
+            if len(self.alive) and (~self.alive).sum() > COMPACT_RATIO * len(self.alive):
+                self._compact()
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive)
+        self.candidates = self.candidates.take(keep)
+        self.candidates.grid = None
+        self.availability = self.availability[keep]
+        self.verified = self.verified[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.row_of = {int(pk): i for i, pk in enumerate(self.candidates.ids)}
+
+    # -- serving --------------------------------------------------------
+
+    def ensure_fresh(self):
+        """Build on first use, catch up with other workers' changes, count the outcome."""
+        shared = current_generation()
+        with self._lock:
+            if self.candidates is None:
+                self.stats_counters['misses'] += 1
+                self.build()
+                return
+            if self.generation == shared:
+                self.stats_counters['hits'] += 1
+                return
+            changes = changes_since(self.generation, shared)
+            if changes is None:
+                # Change log expired or unusable: start over
+                self.stats_counters['rebuilds'] += 1
+                self.build()
+                return
+            profile_ids, deleted = changes
+            for pid in deleted - profile_ids:
+                self.remove(pid)
+            if profile_ids:
+                self.patch(profile_ids)
+            self.generation = shared
+            self.stats_counters['refreshes'] += 1
+
+    def select(self, availability=None, verified=None):
+        """
+        CandidateSet for the live rows matching the filters.
+
+        Callers get their own copy, so later patches cannot change it mid-request.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            mask = self.alive.copy()
+            if availability:
+                mask &= self.availability == AVAILABILITY_CODES.get(availability, -2)
+            if verified is not None:
+                mask &= self.verified == verified
+            if self.candidates.grid is None:
+                self.candidates.grid = GeoGrid(self.candidates.latitudes, self.candidates.longitudes)
+            return self.candidates.take(np.flatnonzero(mask))
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.stats_counters,
+                'rows': int(self.alive.sum()) if self.alive is not None else 0,
+                'generation': self.generation,
+                'shared_generation': current_generation(),
+                'skills': len(self.candidates.skills.columns) if self.candidates is not None else 0,
+                'last_build_seconds': self.last_build_seconds,
+            }
+
+
+matching_index = MatchingIndex()
+
+
+@receiver(employee_profiles_changed)
+def publish_profile_change(sender, profile_ids, deleted=False, **kwargs):
+    """Record the change once the writing transaction commits."""
+    transaction.on_commit(lambda: publish_change(profile_ids, deleted))
@@ -0,0 +1,201 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from accounts.models import EmployeeProfile, Skill, User
+from bookings.autocomplete import autocomplete_index
+from bookings.services import (
+    calculate_booking_cost, nearby_employees, rank_employees, rank_employees_batch, smart_search,
+)
+from bookings.views import employee_list_view
+from dashboard.views import admin_dashboard_view
+
+SEARCH_TERMS = ['plumb', 'electrical london', 'clean', 'web dev', 'kochi', 'garden', 'photo', 'driving']
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency percentiles and query counts of the hot paths (matching, search, "
+        "pricing, pages). Optionally save the results as a baseline or compare against one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3,
+                            help="Untimed calls per scenario (index builds, caches).")
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--only', nargs='*', default=None, help="Scenario names to run.")
+        parser.add_argument('--save', metavar='PATH', help="Write the results to a baseline JSON file.")
+        parser.add_argument('--compare', metavar='PATH', help="Diff the results against a baseline JSON file.")
+        parser.add_argument('--fail-over', type=float, default=None, metavar='PCT',
+                            help="With --compare, fail when a p95 regresses by more than PCT percent.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        scenarios = self.scenarios()
+        if options['only']:
+            unknown = set(options['only']) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}. "
+                                   f"Choose from: {', '.join(scenarios)}")
+            scenarios = {name: fn for name, fn in scenarios.items() if name in options['only']}
+
+        results = {}
+        for name, make_call in scenarios.items():
+            calls = [make_call() for _ in range(options['warmup'] + options['iterations'])]
+            for call in calls[:options['warmup']]:
+                call()
+            results[name] = self.measure(calls[options['warmup']:])
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['results']
+        self.report(results, baseline)
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump({'meta': self.meta(options), 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['save']}"))
+
+        if baseline and options['fail_over'] is not None:
+            regressed = [
+                name for name, row in results.items()
+                if name in baseline and baseline[name]['p95_ms']
+                and (row['p95_ms'] / baseline[name]['p95_ms'] - 1) * 100 > options['fail_over']
+            ]
+            if regressed:
+                raise CommandError(f"p95 regressed by more than {options['fail_over']}%: {', '.join(regressed)}")
+
+    def measure(self, calls):
+        timings, queries = [], []
+        for call in calls:
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+        timings.sort()
+        return {
+            'n': len(timings),
+            'p50_ms': round(_percentile(timings, 50), 3),
+            'p95_ms': round(_percentile(timings, 95), 3),
+            'p99_ms': round(_percentile(timings, 99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': round(statistics.fmean(queries), 2),
+        }
+
+    def meta(self, options):
+        return {
+            'employees': EmployeeProfile.objects.count(),
+            'skills': Skill.objects.count(),
+            'iterations': options['iterations'],
+            'seed': options['seed'],
+            'vendor': connection.vendor,
+        }
+
+    def report(self, results, baseline=None):
+        header = f"{'scenario':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'queries':>9}"
+        if baseline:
+            header += f"{'Δp50':>9}{'Δp95':>9}{'Δqueries':>10}"
+        self.stdout.write(header)
+        for name, row in results.items():
+            line = (f"{name:<24}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+                    f"{row['mean_ms']:>10.2f}{row['queries']:>9.1f}")
+            if baseline and name in baseline:
+                old = baseline[name]
+                line += (f"{self._delta(row['p50_ms'], old['p50_ms']):>9}"
+                         f"{self._delta(row['p95_ms'], old['p95_ms']):>9}"
+                         f"{row['queries'] - old['queries']:>+10.1f}")
+            self.stdout.write(line)
+
+    @staticmethod
+    def _delta(new, old):
+        if not old:
+            return '-'
+        return f"{(new / old - 1) * 100:+.0f}%"
+
+    # -- scenarios ----------------------------------------------------------
+    # Each entry returns a zero-argument call with freshly drawn inputs, so the
+    # same seed always replays the same sequence of requests.
+
+    def scenarios(self):
+        skill_ids = list(Skill.objects.values_list('pk', flat=True))
+        points = list(
+            EmployeeProfile.objects.filter(latitude__isnull=False)
+            .values_list('latitude', 'longitude')[:1000]
+        ) or [(51.507, -0.128)]
+        profiles = list(EmployeeProfile.objects.order_by('pk')[:200])
+        admin = User(username='benchmark', role='admin')
+        factory = RequestFactory()
+        rng = self.rng
+
+        def skills(k=3):
+            return rng.sample(skill_ids, min(k, len(skill_ids)))
+
+        def point():
+            lat, lng = rng.choice(points)
+            return lat + rng.uniform(-0.05, 0.05), lng + rng.uniform(-0.05, 0.05)
+
+        def rank():
+            required, (lat, lng) = skills(), point()
+            return lambda: rank_employees(required, lat, lng)
+
+        def rank_sql():
+            call = rank()
+
+            def run():
+                with override_settings(MATCHING_ENGINE='sql'):
+                    return call()
+            return run
+
+        def nearby():
+            lat, lng = point()
+            return lambda: nearby_employees(lat, lng, radius_km=10)
+
+        def batch():
+            job_requests = [dict(zip(('lat', 'lng'), point()), skills=skills()) for _ in range(100)]
+            return lambda: rank_employees_batch(job_requests, limit=5)
+
+        def search():
+            term = rng.choice(SEARCH_TERMS)
+            return lambda: list(smart_search(term)[:24])
+
+        def suggest():
+            term = rng.choice(SEARCH_TERMS)[:rng.randint(2, 5)]
+            return lambda: autocomplete_index.suggest(term)
+
+        def pricing():
+            profile = rng.choice(profiles) if profiles else EmployeeProfile(hourly_rate=20)
+            duration = rng.choice(['hourly', 'daily', 'monthly'])
+            return lambda: calculate_booking_cost(profile, duration, rng.randint(1, 8))
+
+        def page(view, path):
+            def make():
+                request = factory.get(path)
+                request.user = admin
+                return lambda: view(request)
+            return make
+
+        return {
+            'rank_employees': rank,
+            'rank_employees_sql': rank_sql,
+            'nearby_employees': nearby,
+            'rank_employees_batch': batch,
+            'smart_search': search,
+            'autocomplete': suggest,
+            'calculate_booking_cost': pricing,
+            'employee_list_page': page(employee_list_view, '/employees/'),
+            'admin_dashboard_page': page(admin_dashboard_view, '/dashboard/'),
+        }
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import EmployeeProfile
+from bookings.ratings import drifted, rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute every employee's rating totals and average from their reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report profiles that drifted; exit non-zero if there are any.")
+
+    def handle(self, *args, **options):
+        stale = list(drifted().values_list('pk', 'rating_sum', 'rating_count', 'avg_rating')[:20])
+        total = drifted().count() if stale else 0
+        for pk, rating_sum, rating_count, avg_rating in stale:
+            self.stdout.write(f"  profile {pk}: sum={rating_sum} count={rating_count} avg={avg_rating}")
+        if options['check']:
+            if total:
+                raise CommandError(f"{total} profile(s) drifted from their reviews.")
+            self.stdout.write(self.style.SUCCESS("Rating aggregates match the reviews."))
+            return
+        if total:
+            rebuild_ratings(EmployeeProfile.objects.filter(pk__in=drifted().values('pk')))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} drifted profile(s)."))
@@ -0,0 +1,304 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from time import monotonic
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts import reference
+from accounts.models import CustomerProfile, EmployeeProfile, Skill, User
+from accounts.search import update_search_documents
+from accounts.signals import notify_profiles_changed
+from bookings.models import Booking, Review
+from bookings.ratings import rebuild_ratings
+from dashboard import fraud, rollup
+from dashboard.models import PlatformStats
+from dashboard.signals import stats_paused
+
+USERNAME_PREFIX = 'synth_'
+PASSWORD = 'synthetic'
+
+# (city, latitude, longitude): employees and customers cluster around these
+CITIES = [
+    ('London', 51.507, -0.128), ('Manchester', 53.480, -2.243), ('Birmingham', 52.486, -1.890),
+    ('Dublin', 53.349, -6.260), ('Paris', 48.857, 2.352), ('Berlin', 52.520, 13.405),
+    ('Madrid', 40.417, -3.704), ('New York', 40.713, -74.006), ('Chicago', 41.878, -87.630),
+    ('Toronto', 43.653, -79.383), ('Mumbai', 19.076, 72.878), ('Bangalore', 12.972, 77.595),
+    ('Kochi', 9.931, 76.267), ('Dubai', 25.205, 55.271), ('Singapore', 1.352, 103.820),
+    ('Sydney', -33.869, 151.209), ('Cape Town', -33.925, 18.424), ('Sao Paulo', -23.551, -46.633),
+]
+CITY_SPREAD_DEG = 0.15  # std. deviation of the jitter around a city centre (~15 km)
+
+SKILL_BASES = [
+    ('Plumbing', 'Trades'), ('Electrical', 'Trades'), ('Carpentry', 'Trades'), ('Painting', 'Trades'),
+    ('Roofing', 'Trades'), ('Tiling', 'Trades'), ('Welding', 'Trades'), ('Masonry', 'Trades'),
+    ('Cleaning', 'Home'), ('Landscaping', 'Home'), ('Moving', 'Home'), ('Cooking', 'Home'),
+    ('Babysitting', 'Home'), ('Pet Care', 'Home'), ('Laundry', 'Home'), ('Gardening', 'Home'),
+    ('Web Development', 'Tech'), ('App Development', 'Tech'), ('IT Support', 'Tech'),
+    ('Network Setup', 'Tech'), ('Data Entry', 'Office'), ('Bookkeeping', 'Office'),
+    ('Translation', 'Office'), ('Copywriting', 'Office'), ('Graphic Design', 'Creative'),
+    ('Photography', 'Creative'), ('Video Editing', 'Creative'), ('Music Tuition', 'Creative'),
+    ('Driving', 'Logistics'), ('Delivery', 'Logistics'), ('Warehousing', 'Logistics'),
+    ('Tutoring', 'Education'), ('Fitness Coaching', 'Health'), ('Elderly Care', 'Health'),
+]
+SKILL_QUALIFIERS = [
+    '', 'Residential', 'Commercial', 'Emergency', 'Industrial', 'Advanced', 'Eco', 'Luxury',
+    'Budget', 'Weekend', 'Night', 'Certified', 'Express', 'Heritage', 'Smart', 'Mobile',
+]
+FIRST_NAMES = [
+    'Aarav', 'Ada', 'Amir', 'Anna', 'Ben', 'Chloe', 'Diego', 'Elena', 'Fatima', 'Grace', 'Hana',
+    'Ivan', 'Jack', 'Julia', 'Kofi', 'Lena', 'Liam', 'Maya', 'Noah', 'Olga', 'Priya', 'Rahul',
+    'Sara', 'Tom', 'Uma', 'Victor', 'Wei', 'Yusuf', 'Zara', 'Anjali', 'Rohan', 'Sofia',
+]
+LAST_NAMES = [
+    'Abraham', 'Brown', 'Chen', 'Das', 'Evans', 'Fernandes', 'Garcia', 'Haddad', 'Ito', 'Joseph',
+    'Khan', 'Lopez', 'Menon', 'Nair', 'Okafor', 'Patel', 'Quinn', 'Rossi', 'Smith', 'Thomas',
+    'Usman', 'Varghese', 'Walker', 'Xu', 'Yamamoto', 'Zhou', 'Kurian', 'Mathew', 'Pillai',
+]
+# Weighted status mix of historical bookings
+STATUS_WEIGHTS = [
+    ('completed', 60), ('cancelled', 8), ('rejected', 7), ('pending', 10),
+    ('accepted', 8), ('in_progress', 7),
+]
+
+
+@contextmanager
+def _explicit_timestamps(model, *field_names):
+    """Let bulk_create keep the given auto_now/auto_now_add values instead of 'now'."""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, (auto_now, auto_now_add) in zip(fields, saved):
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _skill_names(count):
+    """``count`` distinct skill names built from the base skills and qualifiers."""
+    names = []
+    for qualifier in SKILL_QUALIFIERS:
+        for base, category in SKILL_BASES:
+            names.append((f'{qualifier} {base}'.strip(), category))
+    n = 2
+    while len(names) < count:
+        names += [(f'{base} Level {n}', category) for base, category in SKILL_BASES]
+        n += 1
+    return names[:count]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a deterministic synthetic dataset (employees, customers, skills, bookings, "
+        "reviews) with bulk inserts, for benchmarking at realistic scale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100_000)
+        parser.add_argument('--customers', type=int, default=20_000)
+        parser.add_argument('--skills', type=int, default=2_000)
+        parser.add_argument('--bookings', type=int, default=1_000_000)
+        parser.add_argument('--skills-per-employee', type=int, default=5,
+                            help="Maximum skills per employee (at least 1).")
+        parser.add_argument('--review-ratio', type=float, default=0.7,
+                            help="Share of completed bookings that get a review.")
+        parser.add_argument('--days', type=int, default=365,
+                            help="Bookings are spread over this many days up to today.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--clear', action='store_true',
+                            help="Delete previously seeded synthetic users (and their data) first.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.started = monotonic()
+        self.batch_size = options['batch_size']
+        if options['clear']:
+            with stats_paused():
+                self.clear()
+        elif User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError("Synthetic data already exists; pass --clear to replace it.")
+
+        skill_ids = self.seed_skills(options['skills'])
+        employees = self.seed_employees(options['employees'], skill_ids, options['skills_per_employee'])
+        customers = self.seed_customers(options['customers'])
+        self.seed_bookings(options['bookings'], employees, customers, skill_ids,
+                           options['review_ratio'], options['days'])
+        self.refresh_aggregates()
+        notify_profiles_changed(None)
+        self.stdout.write(self.style.SUCCESS("Synthetic dataset ready."))
+
+    def log(self, message):
+        self.stdout.write(f"  [{monotonic() - self.started:7.1f}s] {message}")
+
+    def batches(self, iterable):
+        batch = []
+        for item in iterable:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def clear(self):
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        synthetic = Q(customer__in=users) | Q(employee__in=users)
+        Review.objects.filter(booking__in=Booking.objects.filter(synthetic)).delete()
+        Booking.skills_required.through.objects.filter(booking__in=Booking.objects.filter(synthetic)).delete()
+        Booking.objects.filter(synthetic).delete()
+        EmployeeProfile.skills.through.objects.filter(employeeprofile__user__in=users).delete()
+        deleted, _ = users.delete()
+        self.log(f"Cleared {deleted} synthetic rows.")
+
+    def seed_skills(self, count):
+        names = _skill_names(count)
+        Skill.objects.bulk_create(
+            [Skill(name=name, category=category) for name, category in names],
+            batch_size=self.batch_size, ignore_conflicts=True,
+        )
+        reference.invalidate('skills')  # bulk_create sends no post_save
+        ids = list(Skill.objects.filter(name__in=[n for n, _ in names]).order_by('pk').values_list('pk', flat=True))
+        self.log(f"{len(ids)} skills")
+        return ids
+
+    def _user(self, role, n, city):
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        return User(
+            username=f'{USERNAME_PREFIX}{role}_{n}', first_name=first, last_name=last,
+            role=role, city=city, password=self.password,
+        )
+
+    def _location(self):
+        city, lat, lng = self.rng.choice(CITIES)
+        return city, lat + self.rng.gauss(0, CITY_SPREAD_DEG), lng + self.rng.gauss(0, CITY_SPREAD_DEG)
+
+    @property
+    def password(self):
+        if not hasattr(self, '_password'):
+            self._password = make_password(PASSWORD)  # hashing is slow; do it once
+        return self._password
+
+    def seed_employees(self, count, skill_ids, max_skills):
+        # Skill popularity follows a long tail, like real marketplaces
+        weights = [1 / (rank + 1) for rank in range(len(skill_ids))]
+        employees = []  # (user id, profile id, hourly rate, city)
+        for batch in self.batches(range(count)):
+            with transaction.atomic():
+                locations = [self._location() for _ in batch]
+                users = User.objects.bulk_create(
+                    [self._user('employee', n, city) for n, (city, _, _) in zip(batch, locations)])
+                profiles = []
+                for user, (_, lat, lng) in zip(users, locations):
+                    hourly = Decimal(self.rng.randint(10, 80))
+                    has_location = self.rng.random() > 0.05
+                    profiles.append(EmployeeProfile(
+                        user=user,
+                        bio=f"{user.first_name} has {self.rng.randint(0, 25)} years of hands-on experience.",
+                        hourly_rate=hourly, daily_rate=hourly * 8, monthly_rate=hourly * 160,
+                        availability=self.rng.choices(['available', 'busy', 'offline'], [70, 20, 10])[0],
+                        experience_years=self.rng.randint(0, 25),
+                        is_verified=self.rng.random() < 0.6,
+                        latitude=lat if has_location else None,
+                        longitude=lng if has_location else None,
+                    ))
+                profiles = EmployeeProfile.objects.bulk_create(profiles)
+                links = []
+                for profile in profiles:
+                    chosen = set(self.rng.choices(skill_ids, weights, k=self.rng.randint(1, max_skills)))
+                    links += [EmployeeProfile.skills.through(employeeprofile_id=profile.pk, skill_id=sid)
+                              for sid in chosen]
+                EmployeeProfile.skills.through.objects.bulk_create(links)
+            employees += [(u.pk, p.pk, p.hourly_rate, u.city) for u, p in zip(users, profiles)]
+            self.log(f"{len(employees)} employees")
+        return employees
+
+    def seed_customers(self, count):
+        customers = []
+        for batch in self.batches(range(count)):
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    [self._user('customer', n, self._location()[0]) for n in batch])
+                CustomerProfile.objects.bulk_create([CustomerProfile(user=u) for u in users])
+            customers += [u.pk for u in users]
+        self.log(f"{len(customers)} customers")
+        return customers
+
+    def seed_bookings(self, count, employees, customers, skill_ids, review_ratio, days):
+        if not count:
+            return
+        if not employees or not customers:
+            raise CommandError("Bookings need at least one employee and one customer.")
+        end = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        statuses, status_weights = zip(*STATUS_WEIGHTS)
+        multipliers = {'hourly': 1, 'daily': 8, 'monthly': 160}
+        created = 0
+        with _explicit_timestamps(Booking, 'created_at', 'updated_at'), \
+                _explicit_timestamps(Review, 'created_at'):
+            for batch in self.batches(range(count)):
+                bookings = []
+                for n in batch:
+                    employee_id, _, hourly, city = self.rng.choice(employees)
+                    duration_type = self.rng.choices(['hourly', 'daily', 'monthly'], [70, 25, 5])[0]
+                    duration_value = self.rng.randint(1, 8 if duration_type == 'hourly' else 5)
+                    rate = hourly * multipliers[duration_type]
+                    created_at = end - timedelta(seconds=self.rng.randint(0, days * 86400))
+                    bookings.append(Booking(
+                        customer_id=self.rng.choice(customers), employee_id=employee_id, employee_city=city,
+                        title=f"Synthetic job #{n}",
+                        duration_type=duration_type, duration_value=duration_value,
+                        rate_applied=rate, total_cost=rate * duration_value,
+                        status=self.rng.choices(statuses, status_weights)[0],
+                        start_date=created_at.date(),
+                        created_at=created_at, updated_at=created_at,
+                    ))
+                with transaction.atomic():
+                    bookings = Booking.objects.bulk_create(bookings)
+                    Booking.skills_required.through.objects.bulk_create([
+                        Booking.skills_required.through(booking_id=b.pk, skill_id=self.rng.choice(skill_ids))
+                        for b in bookings
+                    ], ignore_conflicts=True)
+                    Review.objects.bulk_create([
+                        Review(
+                            booking_id=b.pk, reviewer_id=b.customer_id,
+                            rating=self.rng.choices([1, 2, 3, 4, 5], [4, 6, 15, 35, 40])[0],
+                            created_at=b.created_at + timedelta(days=1),
+                        )
+                        for b in bookings
+                        if b.status == 'completed' and self.rng.random() < review_ratio
+                    ])
+                created += len(bookings)
+                self.log(f"{created} bookings")
+
+    def refresh_aggregates(self):
+        """Set rating totals, job counts and search documents with set-based UPDATEs."""
+        if connection.vendor == 'postgresql':
+            # The tables just grew by orders of magnitude; without fresh statistics
+            # the planner picks nested loops for the correlated subqueries below
+            with connection.cursor() as cursor:
+                for model in (Booking, Review, EmployeeProfile):
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        rebuild_ratings()
+        completed = (
+            Booking.objects.filter(employee=OuterRef('user_id'), status='completed')
+            .order_by().values('employee').annotate(n=Count('pk')).values('n')
+        )
+        profiles = EmployeeProfile.objects.filter(user__username__startswith=USERNAME_PREFIX)
+        profiles.update(total_jobs=Coalesce(Subquery(completed, output_field=IntegerField()), Value(0)))
+        self.log("ratings and job counts updated")
+        ids = list(profiles.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(ids), self.batch_size):
+            update_search_documents(ids[start:start + self.batch_size])
+        self.log("search documents updated")
+        PlatformStats.reconcile()
+        fraud.rebuild()
+        rollup.backfill(chunk_size=self.batch_size)
+        self.log("dashboard stats, fraud counters and daily rollup rebuilt")
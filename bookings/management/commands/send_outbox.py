@@ -0,0 +1,37 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from bookings.outbox import MAX_ATTEMPTS, deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the outbox in batches (runs until stopped unless --once)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help="Failed sends before a message is dead-lettered.")
+        parser.add_argument('--once', action='store_true', help="Drain what is due, then exit.")
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        try:
+            while True:
+                # open() is a no-op while the connection is alive, so one
+                # connection is reused across batches
+                connection.open()
+                sent, retried, dead = deliver_batch(connection, options['batch_size'], options['max_attempts'])
+                if sent or retried or dead:
+                    self.stdout.write(f"sent {sent}, retrying {retried}, dead {dead}")
+                if sent + retried + dead < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
@@ -0,0 +1,316 @@
+"""
+Vectorised scoring for the AI Matching Engine.
+
+Employee rows are loaded column-wise (ids, ratings, coordinates) and skills are
+encoded as a packed bitset per employee, so the weighted match score can be
+computed for the whole workforce with a handful of NumPy array operations
+instead of one Python loop iteration (and one skills query) per profile.
+"""
+import numpy as np
+
+from accounts.models import EmployeeProfile, Skill
+
+SKILL_WEIGHT = 0.50
+RATING_WEIGHT = 0.30
+PROXIMITY_WEIGHT = 0.20
+
+# Columns loaded per employee, in the order CandidateSet.from_rows expects
+SCORING_FIELDS = ('pk', 'avg_rating', 'latitude', 'longitude')
+
+EARTH_RADIUS_KM = 6371
+NEUTRAL_PROXIMITY = 0.5  # used when either side has no location
+
+
+def _skill_ids(required_skills):
+    """Normalise a list of Skill instances / ids into a set of ids."""
+    return {s.id if isinstance(s, Skill) else int(s) for s in (required_skills or [])}
+
+
+class SkillBitset:
+    """
+    Packed skill membership matrix: one row per employee, one bit per skill.
+
+    ``columns`` maps a skill id to its bit position. Rows are stored as
+    ``uint64`` words so 2,000 skills cost 32 words (256 bytes) per employee.
+    """
+
+    def __init__(self, n_rows, columns=None):
+        self.columns = dict(columns or {})
+        n_words = max(1, -(-len(self.columns) // 64))
+        self.words = np.zeros((n_rows, n_words), dtype=np.uint64)
+
+    @classmethod
+    def from_pairs(cls, n_rows, rows, skill_ids):
+        """Build from parallel (row index, skill id) arrays."""
+        columns = {sid: col for col, sid in enumerate(sorted(set(skill_ids)))}
+        bitset = cls(n_rows, columns)
+        if len(rows):
+            cols = np.fromiter((columns[s] for s in skill_ids), dtype=np.int64, count=len(skill_ids))
+            np.bitwise_or.at(
+                bitset.words,
+                (np.asarray(rows, dtype=np.int64), cols // 64),
+                np.left_shift(np.uint64(1), (cols % 64).astype(np.uint64)),
+            )
+        return bitset
+
+    def take(self, rows):
+        """A new bitset restricted to ``rows`` (with a copy of the column mapping)."""
+        bitset = SkillBitset.__new__(SkillBitset)
+        bitset.columns = dict(self.columns)
+        bitset.words = self.words[rows]
+        return bitset
+
+    def append_rows(self, n):
+        """Add ``n`` empty rows at the end."""
+        self.words = np.vstack([self.words, np.zeros((n, self.words.shape[1]), dtype=np.uint64)])
+
+    def set_row(self, row, skill_ids):
+        """Replace the skills of ``row``, allocating columns for unseen skills."""
+        for sid in skill_ids:
+            if sid not in self.columns:
+                self.columns[sid] = len(self.columns)
+        n_words = -(-len(self.columns) // 64)
+        if n_words > self.words.shape[1]:
+            extra = np.zeros((len(self.words), n_words - self.words.shape[1]), dtype=np.uint64)
+            self.words = np.hstack([self.words, extra])
+        self.words[row] = 0
+        for sid in skill_ids:
+            col = self.columns[sid]
+            self.words[row, col // 64] |= np.uint64(1) << np.uint64(col % 64)
+
+    def has_skill(self, skill_id):
+        """Boolean column: which rows have ``skill_id``."""
+        col = self.columns.get(skill_id)
+        if col is None:
+            return np.zeros(len(self.words), dtype=bool)
+        word = self.words[:, col // 64]
+        return (word >> np.uint64(col % 64)) & np.uint64(1) == 1
+
+    def overlap(self, skill_ids):
+        """Number of ``skill_ids`` each row has."""
+        counts = np.zeros(len(self.words), dtype=np.int32)
+        for sid in skill_ids:
+            counts += self.has_skill(sid)
+        return counts
+
+
+class CandidateSet:
+    """Column-oriented snapshot of the employee fields used for scoring."""
+
+    def __init__(self, ids, ratings, latitudes, longitudes, skills, grid=None):
+        self.ids = ids
+        self.ratings = ratings
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.skills = skills
+        # Optional bookings.geo.GeoGrid over these rows for proximity prefiltering
+        self.grid = grid
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_queryset(cls, qs):
+        """Load only the scoring columns for ``qs`` (two queries in total)."""
+        rows = list(qs.order_by('pk').values_list(*SCORING_FIELDS))
+        pairs = list(
+            EmployeeProfile.skills.through.objects
+            .filter(employeeprofile__in=qs.values('pk'))
+            .values_list('employeeprofile_id', 'skill_id')
+        )
+        return cls.from_rows(rows, pairs)
+
+    @classmethod
+    def from_rows(cls, rows, pairs):
+        """
+        Build from ``SCORING_FIELDS`` tuples (sorted by pk, extra trailing
+        columns are ignored) and (profile id, skill id) pairs.
+        """
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        ratings = np.fromiter((float(r[1]) for r in rows), dtype=np.float64, count=len(rows))
+        latitudes = np.fromiter(
+            (np.nan if r[2] is None else r[2] for r in rows), dtype=np.float64, count=len(rows))
+        longitudes = np.fromiter(
+            (np.nan if r[3] is None else r[3] for r in rows), dtype=np.float64, count=len(rows))
+
+        pair_ids = np.fromiter((p[0] for p in pairs), dtype=np.int64, count=len(pairs))
+        positions = np.minimum(np.searchsorted(ids, pair_ids), max(len(ids) - 1, 0))
+        # Drop pairs for profiles that appeared between the two queries
+        known = (ids[positions] == pair_ids) if len(ids) else np.zeros(len(pairs), dtype=bool)
+        skills = SkillBitset.from_pairs(
+            len(ids), positions[known], [p[1] for p, ok in zip(pairs, known) if ok])
+        return cls(ids, ratings, latitudes, longitudes, skills)
+
+    def take(self, rows):
+        """A new CandidateSet restricted to ``rows``."""
+        return CandidateSet(
+            self.ids[rows], self.ratings[rows], self.latitudes[rows],
+            self.longitudes[rows], self.skills.take(rows),
+            grid=self.grid.restrict(rows) if self.grid is not None else None,
+        )
+
+    def skill_scores(self, required_ids):
+        """0-1 share of the required skills each employee has."""
+        if not required_ids:
+            return np.ones(len(self), dtype=np.float64)
+        return self.skills.overlap(required_ids) / len(required_ids)
+
+    def rating_scores(self):
+        """0-1 score normalised from 0-5 star rating."""
+        return self.ratings / 5.0
+
+    def distances_km(self, customer_lat, customer_lng, rows=None):
+        """Haversine distance from the customer; NaN where the employee has no location."""
+        latitudes = self.latitudes if rows is None else self.latitudes[rows]
+        longitudes = self.longitudes if rows is None else self.longitudes[rows]
+        lat1 = np.radians(customer_lat)
+        lat2 = np.radians(latitudes)
+        dlat = lat2 - lat1
+        dlng = np.radians(longitudes - customer_lng)
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+        return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    def proximity_scores(self, customer_lat=None, customer_lng=None, max_km=50):
+        """0-1 score: 1 = same location, 0 = >= max_km away, 0.5 when location is unknown."""
+        if customer_lat is None or customer_lng is None:
+            return np.full(len(self), NEUTRAL_PROXIMITY)
+        if self.grid is None:
+            distance = self.distances_km(customer_lat, customer_lng)
+            scores = np.maximum(0, 1 - distance / max_km)
+            return np.where(np.isnan(distance), NEUTRAL_PROXIMITY, scores)
+        # Everyone outside the surrounding cells is >= max_km away and scores 0,
+        # so haversine only runs for the nearby rows.
+        scores = np.where(np.isnan(self.latitudes) | np.isnan(self.longitudes), NEUTRAL_PROXIMITY, 0.0)
+        near = self.grid.rows_within(customer_lat, customer_lng, max_km)
+        if len(near):
+            distance = self.distances_km(customer_lat, customer_lng, near)
+            scores[near] = np.maximum(0, 1 - distance / max_km)
+        return scores
+
+    def nearest(self, customer_lat, customer_lng, radius_km, limit=None, after=None):
+        """
+        (rows, distances) of employees within ``radius_km``, nearest first.
+
+        Ties are broken by ascending id; rows without a location are skipped.
+        ``after`` is a (distance, id) keyset cursor to continue from.
+        """
+        if self.grid is not None:
+            rows = self.grid.rows_within(customer_lat, customer_lng, radius_km)
+        else:
+            rows = np.arange(len(self))
+        distance = self.distances_km(customer_lat, customer_lng, rows)
+        keep = distance <= radius_km  # NaN compares False
+        if after is not None:
+            after_distance, after_id = after
+            ids = self.ids[rows]
+            keep &= (distance > after_distance) | ((distance == after_distance) & (ids > after_id))
+        rows, distance = rows[keep], distance[keep]
+        order = np.lexsort((self.ids[rows], distance))[:limit]
+        return rows[order], distance[order]
+
+    def score(self, required_skills=None, customer_lat=None, customer_lng=None):
+        """Return (total, skill, rating, proximity) score arrays."""
+        s_score = self.skill_scores(_skill_ids(required_skills))
+        r_score = self.rating_scores()
+        p_score = self.proximity_scores(customer_lat, customer_lng)
+        total = np.round(s_score * SKILL_WEIGHT + r_score * RATING_WEIGHT + p_score * PROXIMITY_WEIGHT, 4)
+        return total, s_score, r_score, p_score
+
+
+def score_batch(candidates, job_requests, chunk_size=16):
+    """
+    Score many requests against the same candidates as request x employee matrices.
+
+    ``job_requests`` is a list of (required_skills, customer_lat, customer_lng)
+    tuples. Requests are processed ``chunk_size`` at a time to bound memory;
+    for each chunk this yields ``(start, total, skill, proximity)`` where the
+    matrices have one row per request (rating scores are the same for every
+    request: ``candidates.rating_scores()``). Scores equal those of
+    ``CandidateSet.score`` for the same request.
+    """
+    r_score = candidates.rating_scores()
+    for start in range(0, len(job_requests), chunk_size):
+        chunk = job_requests[start:start + chunk_size]
+        required = [_skill_ids(skills) for skills, _, _ in chunk]
+
+        # Skill overlap for the whole chunk as one matrix product: employees x
+        # distinct skills (has it) times distinct skills x requests (wants it)
+        wanted = sorted(set().union(*required))
+        column = {sid: j for j, sid in enumerate(wanted)}
+        # (float32 keeps the matrix small and is exact for these small counts)
+        has = np.zeros((len(candidates), len(wanted)), dtype=np.float32)
+        for sid, j in column.items():
+            has[:, j] = candidates.skills.has_skill(sid)
+        wants = np.zeros((len(wanted), len(chunk)), dtype=np.float32)
+        for i, ids in enumerate(required):
+            wants[[column[sid] for sid in ids], i] = 1
+        sizes = np.array([len(ids) for ids in required], dtype=np.float64)
+        s_score = (has @ wants).T.astype(np.float64) / np.maximum(sizes, 1)[:, None]
+        s_score[sizes == 0] = 1.0
+
+        p_score = np.vstack([candidates.proximity_scores(lat, lng) for _, lat, lng in chunk])
+        total = np.round(s_score * SKILL_WEIGHT + r_score * RATING_WEIGHT + p_score * PROXIMITY_WEIGHT, 4)
+        yield start, total, s_score, p_score
+
+
+def top_k(scores, ids, limit, after=None):
+    """
+    Indices of the ``limit`` best scores, best first.
+
+    Uses ``argpartition`` so only the winners are fully sorted; ties are broken
+    by ascending id to keep the order stable between calls. ``after`` is a
+    (score, id) keyset cursor: only rows ranked strictly below it are returned.
+    """
+    if after is None:
+        eligible = np.arange(len(scores))
+    else:
+        after_score, after_id = after
+        eligible = np.flatnonzero((scores < after_score) | ((scores == after_score) & (ids > after_id)))
+    n = len(eligible)
+    if limit is not None and limit <= 0:
+        return np.arange(0)
+    if limit is None or limit >= n:
+        candidates = eligible
+    else:
+        candidates = eligible[np.argpartition(-scores[eligible], limit - 1)[:limit]]
+        # Pull in anything tied with the cut-off so the id tie-break is exact
+        cutoff = scores[candidates].min()
+        candidates = np.union1d(candidates, eligible[scores[eligible] == cutoff])
+    order = np.lexsort((ids[candidates], -scores[candidates]))
+    return candidates[order][:limit]
+
+
+def hydrate(profile_ids):
+    """Fetch the winning profiles (with user and skills) keyed by pk."""
+    return (
+        EmployeeProfile.objects
+        .select_related('user')
+        .prefetch_related('skills')
+        .in_bulk(list(profile_ids))
+    )
+
+
+def build_results(candidates, rows, total, s_score, r_score, p_score, profiles=None):
+    """
+    Turn the winning rows back into the ``rank_employees`` result dicts.
+
+    ``profiles`` ({pk: EmployeeProfile}) skips the lookup when the caller has
+    already hydrated them.
+    """
+    if profiles is None:
+        profiles = hydrate(int(candidates.ids[i]) for i in rows)
+    results = []
+    for i in rows:
+        profile = profiles.get(int(candidates.ids[i]))
+        if profile is None:  # deleted since the snapshot was taken
+            continue
+        results.append({
+            'profile': profile,
+            'score': float(total[i]),
+            'breakdown': {
+                'skill': round(float(s_score[i]), 2),
+                'rating': round(float(r_score[i]), 2),
+                'proximity': round(float(p_score[i]), 2),
+            },
+        })
+    return results
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without blocking writes to large tables
+    atomic = False
+
+    dependencies = [
+        ('bookings', '0003_outbox_coalescing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='booking_customer_recent'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['employee', '-created_at', '-id'], name='booking_employee_recent'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['-created_at', '-id'], name='booking_recent'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['employee', 'status'], name='booking_employee_status'),
+        ),
+            # The composite indexes above lead with these columns
+        migrations.AlterField(
+            model_name='booking',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='bookings_as_customer', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='employee',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='bookings_as_employee', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-17 16:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_employee_city(apps, schema_editor):
+    # Existing bookings take their employee's current city, as the rollup counted them so far
+    Booking = apps.get_model('bookings', 'Booking')
+    User = apps.get_model('accounts', 'User')
+    Booking.objects.update(employee_city=Subquery(User.objects.filter(pk=OuterRef('employee_id')).values('city')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_employeeprofile_card_version'),
+        ('bookings', '0005_outbox_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='employee_city',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(populate_employee_city, migrations.RunPython.noop),
+    ]
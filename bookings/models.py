@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
@@ -19,11 +20,14 @@ class Booking(models.Model):
         ('cancelled', 'Cancelled'),
     )
 
+    # Indexed by the composite indexes in Meta, which lead with these columns
     customer = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings_as_customer'
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings_as_customer',
+        db_index=False,
     )
     employee = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings_as_employee'
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings_as_employee',
+        db_index=False,
     )
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -36,15 +40,39 @@ class Booking(models.Model):
     start_date = models.DateField(null=True, blank=True)
     end_date = models.DateField(null=True, blank=True)
     location = models.CharField(max_length=255, blank=True)
+    # The employee's city when the booking was made: the daily rollup counts
+    # the booking under it, so a later move does not shift its history
+    employee_city = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Booking list pages: newest first per customer/employee (or overall for
+            # admins), matching the (created_at, pk) keyset used to paginate them
+            models.Index(fields=['customer', '-created_at', '-id'], name='booking_customer_recent'),
+            models.Index(fields=['employee', '-created_at', '-id'], name='booking_employee_recent'),
+            models.Index(fields=['-created_at', '-id'], name='booking_recent'),
+            # An employee's bookings in one status (e.g. completed jobs on the profile)
+            models.Index(fields=['employee', 'status'], name='booking_employee_status'),
+        ]
 
     def __str__(self):
         return f"Booking #{self.pk}: {self.title} ({self.get_status_display()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so saves that don't change it can be told apart
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    @property
+    def status_changed(self):
+        """True unless the status still matches what was loaded (or last saved)."""
+        return getattr(self, '_loaded_status', None) != self.status
+
     def calculate_cost(self):
         """Pricing Engine: Rate × Duration."""
         if self.employee and hasattr(self.employee, 'employee_profile'):
@@ -61,7 +89,13 @@ class Booking(models.Model):
     def save(self, *args, **kwargs):
         if not self.total_cost:
             self.calculate_cost()
-        super().save(*args, **kwargs)
+        if self._state.adding and not self.employee_city and self.employee_id:
+            self.employee_city = self.employee.city
+        # The post_save handlers write outbox rows; the atomic block makes them
+        # commit or roll back with this save even when the caller is in autocommit
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_status = self.status
 
 
 class Review(models.Model):
@@ -79,11 +113,27 @@ class Review(models.Model):
     def __str__(self):
         return f"Review for Booking #{self.booking.pk} – {self.rating}★"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = instance.__dict__.get('rating')
+        return instance
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update the employee's average rating
-        if hasattr(self.booking.employee, 'employee_profile'):
-            self.booking.employee.employee_profile.update_rating()
+        from .ratings import apply_rating_change, recount_employee
+        adding = self._state.adding
+        previous = getattr(self, '_loaded_rating', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Keep the employee's running rating totals in step (one UPDATE)
+            employee_id = self.booking.employee_id
+            if adding:
+                apply_rating_change(employee_id, self.rating, 1)
+            elif previous is not None:
+                apply_rating_change(employee_id, self.rating - previous, 0)
+            else:  # old rating unknown: recount this employee
+                recount_employee(employee_id)
+        self._loaded_rating = self.rating
 
 
 class WorkProof(models.Model):
@@ -99,3 +149,42 @@ class WorkProof(models.Model):
 
     def __str__(self):
         return f"WorkProof for Booking #{self.booking.pk}"
+
+
+class OutboxMessage(models.Model):
+    """
+    Outgoing email. Rows are written in the same transaction as the change
+    that triggers them and delivered by ``manage.py send_outbox``.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),  # claimed for delivery; new notifications start another message
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    recipients = models.JSONField(default=list)
+    # Coalescing: at most one pending message per key; ``items`` holds the
+    # latest subject/body per notified object (one entry per booking, say)
+    key = models.CharField(max_length=100, null=True, blank=True)
+    items = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status__in=['pending', 'sending']),
+                         name='outbox_due'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='pending'),
+                                    name='outbox_pending_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.recipients)} ({self.get_status_display()})"
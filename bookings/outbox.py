@@ -0,0 +1,164 @@
+"""
+Transactional email outbox.
+
+Signal handlers call ``enqueue_email``, which only inserts an OutboxMessage
+row: it commits or rolls back together with the booking/review change that
+caused it, and the request never waits on SMTP. ``manage.py send_outbox``
+claims due rows in batches, sends them over one reused mail connection
+outside any transaction and records each result as it goes, retrying failures
+with exponential backoff and marking a message dead after too many attempts.
+
+``queue_notification`` coalesces: notifications about the same object for the
+same recipient share one pending message that is held back for
+``NOTIFICATION_COALESCE_SECONDS``, and later updates replace its content, so
+only the latest state is sent. Recipients with ``email_digest`` set get one
+message per ``NOTIFICATION_DIGEST_SECONDS`` listing everything that changed.
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+BACKOFF_BASE = 30  # seconds before the first retry
+BACKOFF_MAX = 6 * 3600
+MAX_ATTEMPTS = 8
+# A claimed message whose result is not recorded by then (the worker died) is sent again
+SEND_LEASE = timedelta(minutes=10)
+DUE_STATUSES = ('pending', 'sending')
+
+
+def enqueue_email(subject, body, recipients):
+    """Queue an email for the outbox worker; blank recipients are dropped."""
+    recipients = [r for r in recipients if r]
+    if not recipients:
+        return None
+    return OutboxMessage.objects.create(subject=subject[:255], body=body, recipients=recipients)
+
+
+def _render(items):
+    """Subject and body for a coalesced message's items (latest first)."""
+    entries = sorted(items.values(), key=lambda e: e['at'], reverse=True)
+    if len(entries) == 1:
+        return entries[0]['subject'], entries[0]['body']
+    subject = f"[JobMate] {len(entries)} updates on your bookings"
+    body = '\n\n'.join(f"• {e['subject']}\n{e['body']}" for e in entries)
+    return subject, f"Here is what changed since our last email:\n\n{body}"
+
+
+def queue_notification(user, item_key, subject, body):
+    """
+    Queue a coalesced notification about ``item_key`` (e.g. ``'booking:12'``) for ``user``.
+
+    A pending message for the same recipient and item (or the recipient's
+    digest) is updated in place instead of adding another email. When that
+    row is locked, e.g. while a worker claims it for delivery, a new message
+    is queued instead of waiting for the lock. A pending row for the same key
+    that another transaction inserted and has not committed yet cannot be
+    skipped: the insert waits on the unique constraint until that transaction
+    ends, then updates the committed row (or keeps its own if it rolled back).
+    """
+    if not user.email:
+        return None
+    if user.email_digest:
+        key, window = f'digest:{user.pk}', settings.NOTIFICATION_DIGEST_SECONDS
+    else:
+        key, window = f'{item_key}:user:{user.pk}', settings.NOTIFICATION_COALESCE_SECONDS
+    entry = {'subject': subject, 'body': body, 'at': timezone.now().isoformat()}
+    new_message = {
+        'items': {item_key: entry}, 'subject': subject[:255], 'body': body, 'recipients': [user.email],
+        'next_attempt_at': timezone.now() + timedelta(seconds=window),
+    }
+    for _ in range(2):
+        with transaction.atomic():
+            message = (
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(key=key, status='pending').first()
+            )
+            if message is not None:
+                message.items[item_key] = entry
+                message.subject, message.body = _render(message.items)
+                message.subject = message.subject[:255]
+                message.recipients = [user.email]
+                message.save(update_fields=['items', 'subject', 'body', 'recipients'])
+                return message
+            try:
+                # The partial unique constraint on pending keys fails the insert
+                # when the pending row exists but was locked, or a concurrent
+                # insert committed first (after waiting for it); the second
+                # pass then tries to update that row
+                with transaction.atomic():
+                    return OutboxMessage.objects.create(key=key, **new_message)
+            except IntegrityError:
+                continue
+    # The pending row is still locked: send this one on its own (no key, so not coalesced)
+    return OutboxMessage.objects.create(**new_message)
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts`` (exponential, capped, with jitter)."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim_batch(batch_size=50, lease=SEND_LEASE):
+    """
+    Claim up to ``batch_size`` due messages for delivery, in one short transaction.
+
+    Rows are picked with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several
+    workers never claim the same message, then moved to ``sending``: later
+    notifications start a new message instead of changing one already on its
+    way. A claimed message is not due again until ``lease`` has passed, which
+    is how the messages of a worker that died mid-batch get sent after all.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status__in=DUE_STATUSES, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in batch]).update(
+            status='sending', attempts=F('attempts') + 1, next_attempt_at=now + lease)
+    for message in batch:
+        message.attempts += 1
+    return batch
+
+
+def deliver_batch(connection, batch_size=50, max_attempts=MAX_ATTEMPTS):
+    """
+    Send up to ``batch_size`` due messages over the open mail ``connection``.
+
+    Messages are claimed first (``claim_batch``) and sent outside any
+    transaction, and each result is written as soon as it is known, so a
+    crash or database error part-way resends at most the messages whose
+    result was not recorded. Returns ``(sent, retried, dead)`` counts.
+    """
+    sent = retried = dead = 0
+    for message in claim_batch(batch_size):
+        try:
+            EmailMessage(
+                message.subject, message.body, settings.DEFAULT_FROM_EMAIL,
+                message.recipients, connection=connection,
+            ).send()
+        except Exception as exc:
+            error = f'{type(exc).__name__}: {exc}'[:2000]
+            if message.attempts >= max_attempts:
+                result = {'status': 'dead', 'last_error': error}
+                dead += 1
+            else:
+                # Stays 'sending': a retry is delivered as it was claimed
+                result = {'next_attempt_at': timezone.now() + backoff(message.attempts), 'last_error': error}
+                retried += 1
+            # The connection may be broken; the next send reopens it
+            connection.close()
+        else:
+            result = {'status': 'sent', 'sent_at': timezone.now(), 'last_error': ''}
+            sent += 1
+        OutboxMessage.objects.filter(pk=message.pk).update(**result)
+    return sent, retried, dead
@@ -0,0 +1,112 @@
+"""
+Response cache for pages that every anonymous visitor sees the same way.
+
+``cache_anonymous_page`` stores rendered responses under a key built from the
+request (e.g. the normalised search query). An entry is fresh for
+``PAGE_CACHE_SECONDS`` and, after that or once employee profiles change, stale
+for up to ``PAGE_CACHE_STALE_SECONDS`` more. Stale entries are still served
+while exactly one worker, the one that wins a ``cache.add`` lock, rebuilds the
+page. Requests with nothing to serve wait briefly for that rebuild instead of
+all rendering it at once. Logged-in users and requests carrying flash
+messages always get a fresh render.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from accounts.signals import employee_profiles_changed
+
+GENERATION_KEY = 'page_cache:generation'
+LOCK_TIMEOUT = 30  # seconds; a crashed rebuild frees the lock after this
+WAIT_TIMEOUT = 2.0  # seconds a request with nothing to serve waits for another worker's rebuild
+WAIT_INTERVAL = 0.05
+
+
+def _bump_generation():
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    cache.incr(GENERATION_KEY)
+
+
+@receiver(employee_profiles_changed)
+def profiles_changed(sender, **kwargs):
+    """Mark every cached page stale (it is rebuilt on its next request)."""
+    # After commit: a rebuild racing the writer must not store old data as current
+    transaction.on_commit(_bump_generation)
+
+
+def _store(key, response, generation):
+    entry = {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'built_at': time.time(),
+        'generation': generation,
+    }
+    cache.set(key, entry, settings.PAGE_CACHE_SECONDS + settings.PAGE_CACHE_STALE_SECONDS)
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def _from_entry(entry, state):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['X-Page-Cache'] = state
+    return response
+
+
+def cache_anonymous_page(name, key_parts):
+    """
+    Cache the decorated view's responses for anonymous GET requests under
+    ``name`` and ``key_parts(request)`` (a tuple of strings, or None for a
+    request that should not be cached).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                    or len(messages.get_messages(request))):
+                return view(request, *args, **kwargs)
+            parts = key_parts(request)
+            if parts is None:
+                return view(request, *args, **kwargs)
+
+            digest = hashlib.md5('\x1f'.join(parts).encode()).hexdigest()
+            key = f'page_cache:{name}:{digest}'
+            lock_key = f'{key}:lock'
+            found = cache.get_many([key, GENERATION_KEY])
+            entry, generation = found.get(key), found.get(GENERATION_KEY, 0)
+
+            if entry is not None:
+                fresh = (entry['generation'] == generation
+                         and time.time() - entry['built_at'] < settings.PAGE_CACHE_SECONDS)
+                if fresh:
+                    return _from_entry(entry, 'hit')
+                if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+                    return _from_entry(entry, 'stale')  # someone else is already rebuilding it
+            elif not cache.add(lock_key, 1, LOCK_TIMEOUT):
+                # Cold entry being built by another worker: wait for it rather than pile on
+                deadline = time.monotonic() + WAIT_TIMEOUT
+                while time.monotonic() < deadline:
+                    time.sleep(WAIT_INTERVAL)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        return _from_entry(entry, 'hit')
+                return view(request, *args, **kwargs)
+
+            try:
+                response = view(request, *args, **kwargs)
+                if _cacheable(response):
+                    _store(key, response, generation)
+            finally:
+                cache.delete(lock_key)
+            response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,158 @@
+"""
+Keyset (cursor) pagination.
+
+A page is addressed by an opaque cursor holding the sort key of the last row
+already shown, so the next page is a plain indexed range scan: no OFFSET (which
+re-reads every skipped row) and no COUNT(*). Sort keys must end in a unique
+column (the pk) to keep the order total.
+"""
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe token for a tuple of sort-key values."""
+    payload = json.dumps([_dump(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Inverse of ``encode_cursor``; ``types`` converts each value back."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise InvalidCursor(cursor)
+        return [convert(value) for convert, value in zip(types, values)]
+    # ArithmeticError: Decimal('x') raises InvalidOperation, int(1e400) OverflowError
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, ArithmeticError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def _datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise InvalidCursor(value)
+    return parsed
+
+
+def _decimal(value):
+    parsed = Decimal(value)
+    if not parsed.is_finite():
+        raise InvalidCursor(value)
+    return parsed
+
+
+def _float(value):
+    parsed = float(value)
+    if not math.isfinite(parsed):
+        raise InvalidCursor(value)
+    return parsed
+
+
+# Converters for decode_cursor / SortKey
+DATETIME = _datetime
+DECIMAL = _decimal
+FLOAT = _float
+INT = int
+
+
+class SortKey:
+    """One column of a keyset ordering."""
+
+    def __init__(self, field, descending=False, type=INT):
+        self.field = field
+        self.descending = descending
+        self.type = type
+
+    @property
+    def order_by(self):
+        return f'-{self.field}' if self.descending else self.field
+
+    def after(self, value):
+        return Q(**{f"{self.field}__{'lt' if self.descending else 'gt'}": value})
+
+
+def keyset_filter(keys, values):
+    """Rows strictly after ``values`` in the order given by ``keys``."""
+    condition = Q()
+    for i, key in enumerate(keys):
+        equal = Q(**{k.field: v for k, v in zip(keys[:i], values[:i])})
+        condition |= equal & key.after(values[i])
+    return condition
+
+
+class Page:
+    """A slice of results plus the cursor of the page after it (None on the last page)."""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def next_query(self, params, param='cursor'):
+        """The query string ``params`` (a QueryDict) with the cursor swapped for the next page's."""
+        params = params.copy()
+        params[param] = self.next_cursor
+        return params.urlencode()
+
+
+def paginate_queryset(qs, keys, cursor=None, page_size=25):
+    """
+    Page of ``qs`` ordered by ``keys`` (a list of SortKey), starting after
+    ``cursor``. Raises InvalidCursor for a malformed cursor.
+    """
+    qs = qs.order_by(*[key.order_by for key in keys])
+    if cursor:
+        values = decode_cursor(cursor, [key.type for key in keys])
+        qs = qs.filter(keyset_filter(keys, values))
+    rows = list(qs[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([getattr(rows[-1], key.field) for key in keys])
+    return Page(rows, next_cursor)
+
+
+def paginate_results(fetch, sort_value, types, cursor=None, page_size=25):
+    """
+    Keyset pagination for ranked result lists that are not querysets (e.g.
+    ``rank_employees``). ``fetch(after, limit)`` returns up to ``limit``
+    results following the decoded cursor values ``after`` (None for the first
+    page); ``sort_value(result)`` gives a result's sort-key tuple.
+    """
+    after = decode_cursor(cursor, types) if cursor else None
+    results = fetch(after, page_size + 1)
+    next_cursor = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        next_cursor = encode_cursor(sort_value(results[-1]))
+    return Page(results, next_cursor)
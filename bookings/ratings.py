@@ -0,0 +1,81 @@
+"""
+Running rating aggregates.
+
+``EmployeeProfile.rating_sum`` / ``rating_count`` are adjusted with ``F()``
+expressions whenever a review is created, edited or deleted, and
+``avg_rating`` is derived from them in the same UPDATE, so posting a review
+costs one single-row update no matter how many reviews the employee has.
+``rebuild_ratings`` recomputes everything from the reviews (``manage.py
+rebuild_ratings``) to repair or detect drift.
+"""
+from django.db.models import Count, DecimalField, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from accounts.models import EmployeeProfile
+from accounts.signals import notify_profiles_changed
+from .models import Review
+
+RATING_FIELDS = ('rating_sum', 'rating_count', 'avg_rating')
+
+
+def average_expression(rating_sum, rating_count):
+    """avg_rating from sum/count expressions (0 when there are no reviews)."""
+    return Cast(rating_sum, FloatField()) / Greatest(rating_count, Value(1))
+
+
+def apply_rating_change(employee_id, sum_delta, count_delta):
+    """Adjust the rating totals of the employee with user pk ``employee_id``."""
+    if not sum_delta and not count_delta:
+        return
+    rating_sum = F('rating_sum') + sum_delta
+    rating_count = F('rating_count') + count_delta
+    profiles = EmployeeProfile.objects.filter(user_id=employee_id)
+    # Every SET expression sees the old row, so the average uses the new totals explicitly
+    profiles.update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        avg_rating=average_expression(rating_sum, rating_count),
+    )
+    notify_profiles_changed(profiles.values_list('pk', flat=True), fields=RATING_FIELDS)
+
+
+def _review_totals():
+    reviews = Review.objects.filter(booking__employee=OuterRef('user_id')).order_by().values('booking__employee')
+    rating_sum = Coalesce(Subquery(reviews.annotate(s=Sum('rating')).values('s'), output_field=IntegerField()), 0)
+    rating_count = Coalesce(Subquery(reviews.annotate(n=Count('pk')).values('n'), output_field=IntegerField()), 0)
+    return rating_sum, rating_count
+
+
+def drifted(queryset=None):
+    """Profiles whose stored totals or average disagree with their reviews."""
+    qs = EmployeeProfile.objects.all() if queryset is None else queryset
+    rating_sum, rating_count = _review_totals()
+    return qs.alias(
+        expected_sum=rating_sum,
+        expected_count=rating_count,
+    ).alias(
+        # Rounded the way storing it in avg_rating rounds it
+        expected_avg=Cast(average_expression(F('expected_sum'), F('expected_count')),
+                          DecimalField(max_digits=3, decimal_places=2)),
+    ).filter(
+        ~Q(rating_sum=F('expected_sum')) | ~Q(rating_count=F('expected_count'))
+        | ~Q(avg_rating=F('expected_avg'))
+    )
+
+
+def rebuild_ratings(queryset=None):
+    """Recompute totals and averages from the reviews with one UPDATE; returns rows updated."""
+    qs = EmployeeProfile.objects.all() if queryset is None else queryset
+    rating_sum, rating_count = _review_totals()
+    updated = qs.update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        avg_rating=average_expression(rating_sum, rating_count),
+    )
+    notify_profiles_changed(None if queryset is None else qs.values_list('pk', flat=True), fields=RATING_FIELDS)
+    return updated
+
+
+def recount_employee(employee_id):
+    """``rebuild_ratings`` for the employee with user pk ``employee_id``."""
+    return rebuild_ratings(EmployeeProfile.objects.filter(user_id=employee_id))
@@ -8,83 +8,117 @@ The match_score is calculated from:
 
 This is structured so a real ML model can replace the scoring logic later.
 """
-import math
-from django.db.models import Q
-from accounts.models import EmployeeProfile, Skill
-
-
-def _skill_score(employee_profile, required_skills):
-    """Return 0-1 score based on skill tag overlap."""
-    if not required_skills:
-        return 1.0
-    emp_skills = set(employee_profile.skills.values_list('id', flat=True))
-    req_skills = set(s.id if isinstance(s, Skill) else s for s in required_skills)
-    if not req_skills:
-        return 1.0
-    overlap = emp_skills & req_skills
-    return len(overlap) / len(req_skills)
-
-
-def _rating_score(employee_profile):
-    """Return 0-1 score normalised from 0-5 star rating."""
-    return float(employee_profile.avg_rating) / 5.0
-
-
-def _proximity_score(employee_profile, customer_lat=None, customer_lng=None, max_km=50):
-    """Return 0-1 score based on haversine distance. 1 = same location, 0 = >= max_km away."""
-    if (
-        customer_lat is None
-        or customer_lng is None
-        or employee_profile.latitude is None
-        or employee_profile.longitude is None
-    ):
-        return 0.5  # neutral when location data is missing
-
-    R = 6371  # Earth radius in km
-    lat1, lat2 = math.radians(customer_lat), math.radians(employee_profile.latitude)
-    dlat = lat2 - lat1
-    dlng = math.radians(employee_profile.longitude - customer_lng)
-    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
-    distance = R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return max(0, 1 - distance / max_km)
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from accounts.models import EmployeeProfile
+from accounts.search import search_profiles
+from .index import matching_index
+from .matching import top_k, build_results, hydrate, score_batch
+from .sql_matching import rank_employees_sql
 
 
 def rank_employees(required_skills=None, customer_lat=None, customer_lng=None,
-                   availability='available', limit=20):
+                   availability='available', limit=20, after=None):
     """
     Rank available employees by match score.
 
     Returns a list of dicts:
         [{"profile": EmployeeProfile, "score": float, "breakdown": {...}}, ...]
 
-    Replace the weighted-sum logic here with a trained ML model for
+    The engine is chosen by ``settings.MATCHING_ENGINE``:
+
+    - ``'index'`` (default): candidates come from the in-process matching index
+      (``bookings.index``) and are scored all at once with NumPy (see
+      ``bookings.matching``); only the top ``limit`` rows are loaded back as
+      ``EmployeeProfile`` objects.
+    - ``'sql'``: the score is computed, ordered and limited inside the database
+      (see ``bookings.sql_matching``).
+
+    ``after`` is a (score, profile pk) keyset cursor: only employees ranked
+    after it are returned, which is how result pages are fetched.
+
+    Replace the weighted-sum logic there with a trained ML model for
     production-grade recommendation accuracy.
     """
-    qs = EmployeeProfile.objects.select_related('user').prefetch_related('skills')
-    if availability:
-        qs = qs.filter(availability=availability)
+    engine = settings.MATCHING_ENGINE
+    if engine == 'sql':
+        return rank_employees_sql(required_skills, customer_lat, customer_lng, availability, limit, after)
+    if engine != 'index':
+        raise ImproperlyConfigured(f"Unknown MATCHING_ENGINE {engine!r}; use 'index' or 'sql'.")
 
-    results = []
-    for profile in qs:
-        s_score = _skill_score(profile, required_skills or [])
-        r_score = _rating_score(profile)
-        p_score = _proximity_score(profile, customer_lat, customer_lng)
+    candidates = matching_index.select(availability=availability)
+    if not len(candidates):
+        return []
+    total, s_score, r_score, p_score = candidates.score(required_skills, customer_lat, customer_lng)
+    rows = top_k(total, candidates.ids, limit, after)
+    return build_results(candidates, rows, total, s_score, r_score, p_score)
 
-        # Weighted sum – adjust weights or swap with ML model
-        match_score = round(s_score * 0.50 + r_score * 0.30 + p_score * 0.20, 4)
 
-        results.append({
-            'profile': profile,
-            'score': match_score,
-            'breakdown': {
-                'skill': round(s_score, 2),
-                'rating': round(r_score, 2),
-                'proximity': round(p_score, 2),
-            },
-        })
+def rank_employees_batch(job_requests, availability='available', limit=5, max_per_employee=None):
+    """
+    Rank employees for many job requests at once.
+
+    ``job_requests`` is a list of dicts with optional ``skills`` (Skill
+    instances or ids), ``lat`` and ``lng``. Returns one ``rank_employees``-style
+    result list per request, in the same order.
 
-    results.sort(key=lambda x: x['score'], reverse=True)
-    return results[:limit]
+    The candidates are read once from the matching index and scored as a
+    request x employee matrix (see ``bookings.matching.score_batch``); all
+    winning profiles are loaded with a single query. Always uses the index,
+    whatever ``MATCHING_ENGINE`` says.
+
+    With ``max_per_employee``, no employee is returned for more than that many
+    requests of the batch: requests are served in order, and an employee who
+    has reached the cap is skipped for the requests after it.
+    """
+    candidates = matching_index.select(availability=availability)
+    if not len(candidates) or not job_requests:
+        return [[] for _ in job_requests]
+    r_score = candidates.rating_scores()
+    assigned = np.zeros(len(candidates), dtype=np.int64)
+    winners = []  # (rows, total, skill, proximity) per request
+    requests = [(r.get('skills'), r.get('lat'), r.get('lng')) for r in job_requests]
+    for _, total, s_score, p_score in score_batch(candidates, requests):
+        for i in range(len(total)):
+            scores = total[i]
+            if max_per_employee is not None:
+                exhausted = assigned >= max_per_employee
+                scores = np.where(exhausted, -np.inf, scores)
+            rows = top_k(scores, candidates.ids, limit)
+            if max_per_employee is not None:
+                rows = rows[~exhausted[rows]]
+                assigned[rows] += 1
+            winners.append((rows, total[i], s_score[i], p_score[i]))
+
+    profiles = hydrate({int(candidates.ids[i]) for rows, _, _, _ in winners for i in rows})
+    return [
+        build_results(candidates, rows, total, s_score, r_score, p_score, profiles=profiles)
+        for rows, total, s_score, p_score in winners
+    ]
+
+
+def nearby_employees(customer_lat, customer_lng, radius_km=10, availability='available', limit=20,
+                     after=None):
+    """
+    Employees within ``radius_km`` of the customer, nearest first.
+
+    Only the grid cells around the customer are examined, so the cost depends
+    on local density rather than on the size of the whole workforce. ``after``
+    is a (distance_km, profile pk) keyset cursor.
+
+    Returns a list of dicts:
+        [{"profile": EmployeeProfile, "distance_km": float}, ...]
+    """
+    candidates = matching_index.select(availability=availability)
+    rows, distances = candidates.nearest(customer_lat, customer_lng, radius_km, limit, after)
+    profiles = hydrate(int(candidates.ids[i]) for i in rows)
+    results = []
+    for i, distance in zip(rows, distances):
+        profile = profiles.get(int(candidates.ids[i]))
+        if profile is not None:
+            results.append({'profile': profile, 'distance_km': float(distance)})
+    return results
 
 
 def calculate_booking_cost(employee_profile, duration_type, duration_value):
@@ -100,28 +134,15 @@ def calculate_booking_cost(employee_profile, duration_type, duration_value):
 
 def smart_search(query_text):
     """
-    NLP-style search using Django Q objects.
-    Searches employees by skill name, bio, city, and username.
-    Ready to be replaced with a real NLP / vector-search backend.
+    Full-text search over employees' skills, names, city and bio.
+
+    Backed by the ``search_document`` tsvector and its GIN index (see
+    ``accounts.search``), so query cost does not grow with the number of
+    words typed. Results are ordered by relevance. Ready to be replaced with
+    a real NLP / vector-search backend.
     """
     if not query_text:
         return EmployeeProfile.objects.none()
 
-    tokens = query_text.strip().split()
-    q = Q()
-    for token in tokens:
-        q |= (
-            Q(skills__name__icontains=token)
-            | Q(bio__icontains=token)
-            | Q(user__city__icontains=token)
-            | Q(user__first_name__icontains=token)
-            | Q(user__last_name__icontains=token)
-            | Q(user__username__icontains=token)
-        )
-    return (
-        EmployeeProfile.objects
-        .filter(q, availability='available')
-        .select_related('user')
-        .prefetch_related('skills')
-        .distinct()
-    )
+    qs = EmployeeProfile.objects.filter(availability='available')
+    return search_profiles(query_text, qs).select_related('user').prefetch_related('skills')
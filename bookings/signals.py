@@ -1,15 +1,19 @@
 """Signals for notification system – fires on booking status changes."""
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
 
-from .models import Booking, Review
+from accounts import images
+from .api import proof_variants_built
+from .models import Booking, Review, WorkProof
+from .outbox import queue_notification
+from .ratings import apply_rating_change
 
 
 @receiver(post_save, sender=Booking)
 def booking_status_notification(sender, instance, created, **kwargs):
-    """Send email/log when a booking is created or its status changes."""
+    """Queue an email when a booking is created or its status changes."""
+    if not created and not instance.status_changed:
+        return  # e.g. an edit of the description: nothing to tell anyone
     if created:
         subject = f"[JobMate] New Booking Request: {instance.title}"
         message = (
@@ -27,27 +31,31 @@ def booking_status_notification(sender, instance, created, **kwargs):
             f"Check your dashboard for details."
         )
 
-    recipients = [instance.customer.email, instance.employee.email]
-    recipients = [r for r in recipients if r]  # filter blanks
-
-    try:
-        if recipients:
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipients, fail_silently=True)
-    except Exception:
-        pass  # graceful degradation – log in production
+    # Written to the outbox inside Booking.save's transaction and coalesced per
+    # (recipient, booking); `manage.py send_outbox` delivers it
+    for recipient in (instance.customer, instance.employee):
+        queue_notification(recipient, f'booking:{instance.pk}', subject, message)
 
 
 @receiver(post_save, sender=Review)
 def review_notification(sender, instance, created, **kwargs):
-    """Notify employee when a review is posted."""
+    """Notify employee when a review is posted (inside Review.save's transaction)."""
     if created:
-        employee = instance.booking.employee
-        if employee.email:
-            send_mail(
-                f"[JobMate] New {instance.rating}★ Review",
-                f"You received a review for \"{instance.booking.title}\":\n\n"
-                f"\"{instance.comment}\"\n\nRating: {instance.rating}/5",
-                settings.DEFAULT_FROM_EMAIL,
-                [employee.email],
-                fail_silently=True,
-            )
+        queue_notification(
+            instance.booking.employee,
+            f'review:{instance.pk}',
+            f"[JobMate] New {instance.rating}★ Review",
+            f"You received a review for \"{instance.booking.title}\":\n\n"
+            f"\"{instance.comment}\"\n\nRating: {instance.rating}/5",
+        )
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    """Take a deleted review out of the employee's rating totals."""
+    employee_id = Booking.objects.filter(pk=instance.booking_id).values_list('employee_id', flat=True).first()
+    if employee_id is not None:
+        apply_rating_change(employee_id, -instance.rating, -1)
+
+
+images.track(WorkProof, 'image', on_built=proof_variants_built)  # the API's booking detail ETag
@@ -1,3 +1,616 @@
-from django.test import TestCase
+"""
+Tests for the booking state machine, the running rating totals and EXPLAIN
+regression tests for the hot queries.
 
-# Create your tests here.
+The workflow tests check that ``transition()`` applies each status change
+once, even when two requests race, and keeps the completion counters right.
+The rating tests compare the incrementally kept totals with a fresh
+aggregate of the reviews after every kind of review change, and the outbox
+tests cover claiming, retries, dead-lettering, rolling back with the
+change that queued a message and coalescing notifications. The API tests
+check conditional GETs, sparse fields and the error answers.
+
+Each EXPLAIN test builds a query the way its view does and EXPLAINs it against a
+small seeded dataset with sequential scans switched off. The planner then only
+falls back to a ``Seq Scan`` when no index can serve the query at all, so a
+dropped index or a query change that stops matching one fails here instead of
+showing up as a slow page on the full dataset.
+
+    python manage.py test bookings
+"""
+import threading
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import Permission
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Avg, Count
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomerProfile, EmployeeProfile, User
+from dashboard.models import DailyBookingStats, FraudCounter
+from .models import Booking, OutboxMessage, Review
+from .outbox import (
+    BACKOFF_BASE, DUE_STATUSES, MAX_ATTEMPTS, SEND_LEASE, claim_batch, deliver_batch, enqueue_email, queue_notification,
+)
+from .pagination import InvalidCursor, encode_cursor, keyset_filter, paginate_queryset
+from .ratings import drifted
+from .workflow import NotAllowed, StaleTransition, available_actions, transition
+from .views import BOOKING_KEYS, BOOKING_PAGE_SIZE, HOME_PAGE_SIZE, TOP_RATED_KEYS
+
+
+def _create_booking(status='pending'):
+    """A customer, an employee with profiles, and a booking between them in ``status``."""
+    n = User.objects.count()
+    customer = User.objects.create_user(f'customer{n}', f'customer{n}@example.com', 'pw', role='customer')
+    employee = User.objects.create_user(f'employee{n}', f'employee{n}@example.com', 'pw', role='employee')
+    CustomerProfile.objects.create(user=customer)
+    EmployeeProfile.objects.create(user=employee, hourly_rate=Decimal('20.00'))
+    booking = Booking.objects.create(customer=customer, employee=employee, title='Fix the sink', duration_value=3)
+    if status != 'pending':
+        Booking.objects.filter(pk=booking.pk).update(status=status)
+        booking.refresh_from_db()
+    return booking
+
+
+class WorkflowTests(TestCase):
+
+    def setUp(self):
+        self.booking = _create_booking()
+        self.customer, self.employee = self.booking.customer, self.booking.employee
+
+    def test_employee_walks_a_booking_to_completion(self):
+        for action, status in (('accept', 'accepted'), ('start', 'in_progress'), ('complete', 'completed')):
+            self.assertEqual(transition(self.booking.pk, action, self.employee).status, status)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'completed')
+
+    def test_action_from_the_wrong_status_is_stale(self):
+        with self.assertRaises(StaleTransition) as caught:
+            transition(self.booking.pk, 'complete', self.employee)
+        self.assertFalse(caught.exception.already_done)
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).status, 'pending')
+
+    def test_repeated_action_is_stale_and_already_done(self):
+        transition(self.booking.pk, 'accept', self.employee)
+        with self.assertRaises(StaleTransition) as caught:
+            transition(self.booking.pk, 'accept', self.employee)
+        self.assertTrue(caught.exception.already_done)
+
+    def test_cancel_only_from_open_statuses(self):
+        for status in ('pending', 'accepted', 'in_progress'):
+            booking = _create_booking(status)
+            self.assertEqual(transition(booking.pk, 'cancel', booking.customer).status, 'cancelled')
+        for status in ('completed', 'rejected', 'cancelled'):
+            booking = _create_booking(status)
+            with self.assertRaises(StaleTransition):
+                transition(booking.pk, 'cancel', booking.customer)
+            self.assertEqual(Booking.objects.get(pk=booking.pk).status, status)
+
+    def test_only_the_booking_employee_runs_job_actions(self):
+        other = _create_booking().employee
+        admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+        for user in (self.customer, other, admin):
+            with self.assertRaises(NotAllowed):
+                transition(self.booking.pk, 'accept', user)
+        self.assertEqual(available_actions(admin, self.booking), [])
+        self.assertEqual(available_actions(self.customer, self.booking), ['cancel'])
+        self.assertEqual(available_actions(self.employee, self.booking), ['accept', 'reject', 'cancel'])
+
+    def test_admin_gets_403_on_the_action_view(self):
+        admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('booking_action', args=[self.booking.pk, 'accept']))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).status, 'pending')
+
+    def test_admin_bulk_actions_need_change_permission(self):
+        staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename='view_booking'))
+        self.client.force_login(staff)
+        changelist = reverse('admin:bookings_booking_changelist')
+        data = {'action': 'accept_bookings', '_selected_action': [self.booking.pk]}
+        self.client.post(changelist, data)
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).status, 'pending')
+
+        staff.user_permissions.add(Permission.objects.get(codename='change_booking'))
+        self.client.post(changelist, data)
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).status, 'accepted')
+
+    def test_completion_adds_to_the_stored_counters(self):
+        # Counters changed behind the loaded objects' backs must be added to, not overwritten
+        EmployeeProfile.objects.filter(user=self.employee).update(total_jobs=4)
+        CustomerProfile.objects.filter(user=self.customer).update(total_bookings=2, total_spent=Decimal('100.00'))
+        Booking.objects.filter(pk=self.booking.pk).update(status='in_progress')
+        transition(self.booking.pk, 'complete', self.employee)
+        self.assertEqual(EmployeeProfile.objects.get(user=self.employee).total_jobs, 5)
+        customer = CustomerProfile.objects.get(user=self.customer)
+        self.assertEqual(customer.total_bookings, 3)
+        self.assertEqual(customer.total_spent, Decimal('160.00'))  # 3 hours at 20.00
+
+    def test_stale_completion_leaves_counters_alone(self):
+        Booking.objects.filter(pk=self.booking.pk).update(status='in_progress')
+        transition(self.booking.pk, 'complete', self.employee)
+        with self.assertRaises(StaleTransition):
+            transition(self.booking.pk, 'complete', self.employee)
+        self.assertEqual(EmployeeProfile.objects.get(user=self.employee).total_jobs, 1)
+        self.assertEqual(CustomerProfile.objects.get(user=self.customer).total_bookings, 1)
+
+
+class RatingTests(TestCase):
+
+    def setUp(self):
+        self.first = _create_booking('completed')
+        self.employee = self.first.employee
+        self.second = Booking.objects.create(customer=self.first.customer, employee=self.employee,
+                                             title='Paint the fence', duration_value=1, status='completed')
+
+    def assertTotalsMatchReviews(self):
+        profile = EmployeeProfile.objects.get(user=self.employee)
+        expected = Review.objects.filter(booking__employee=self.employee).aggregate(avg=Avg('rating'), n=Count('pk'))
+        self.assertEqual(profile.rating_count, expected['n'])
+        self.assertEqual(profile.avg_rating, round(Decimal(expected['avg'] or 0), 2))
+        self.assertFalse(drifted().exists())
+
+    def review(self, booking, rating):
+        return Review.objects.create(booking=booking, reviewer=booking.customer, rating=rating)
+
+    def test_create_and_edit(self):
+        review = self.review(self.first, 5)
+        self.assertTotalsMatchReviews()
+        self.review(self.second, 2)
+        self.assertTotalsMatchReviews()
+        review.rating = 4
+        review.save()
+        self.assertTotalsMatchReviews()
+        review.save()  # unchanged rating
+        self.assertTotalsMatchReviews()
+
+    def test_rerate_a_loaded_review_and_one_loaded_without_its_rating(self):
+        self.review(self.first, 1)
+        self.review(self.second, 3)
+        review = Review.objects.get(booking=self.first)
+        review.rating = 5
+        review.save()
+        self.assertTotalsMatchReviews()
+        review = Review.objects.only('pk', 'booking').get(booking=self.second)  # old rating unknown: recounted
+        review.rating = 4
+        review.save()
+        self.assertTotalsMatchReviews()
+        self.assertEqual(EmployeeProfile.objects.get(user=self.employee).avg_rating, Decimal('4.50'))
+
+    def test_delete_review_and_its_booking(self):
+        self.review(self.first, 5)
+        review = self.review(self.second, 2)
+        review.delete()
+        self.assertTotalsMatchReviews()
+        self.first.delete()  # cascades to its review
+        self.assertTotalsMatchReviews()
+        profile = EmployeeProfile.objects.get(user=self.employee)
+        self.assertEqual((profile.rating_sum, profile.rating_count, profile.avg_rating), (0, 0, Decimal('0.00')))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'row locks are checked on PostgreSQL')
+class WorkflowRaceTests(TransactionTestCase):
+
+    def test_concurrent_completions_apply_once(self):
+        booking = _create_booking('in_progress')
+        barrier = threading.Barrier(2)
+        outcomes = []
+
+        def complete():
+            barrier.wait()
+            try:
+                transition(booking.pk, 'complete', booking.employee)
+                outcomes.append('completed')
+            except StaleTransition as exc:
+                outcomes.append('already done' if exc.already_done else 'stale')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=complete) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes), ['already done', 'completed'])
+        self.assertEqual(EmployeeProfile.objects.get(user=booking.employee).total_jobs, 1)
+        self.assertEqual(CustomerProfile.objects.get(user=booking.customer).total_bookings, 1)
+
+
+class FailingConnection:
+    """A mail connection whose every send fails."""
+
+    def send_messages(self, messages):
+        raise OSError('connection refused')
+
+    def close(self):
+        pass
+
+
+class OutboxDeliveryTests(TestCase):
+
+    def setUp(self):
+        self.message = enqueue_email('Hello', 'Body', ['someone@example.com'])
+
+    def make_due(self):
+        OutboxMessage.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claimed_message_is_not_claimed_again_until_the_lease_expires(self):
+        before = timezone.now()
+        self.assertEqual([m.pk for m in claim_batch()], [self.message.pk])
+        message = OutboxMessage.objects.get(pk=self.message.pk)
+        self.assertEqual((message.status, message.attempts), ('sending', 1))
+        self.assertGreaterEqual(message.next_attempt_at, before + SEND_LEASE)
+        self.assertEqual(claim_batch(), [])
+        self.make_due()  # the claiming worker died and its lease ran out
+        self.assertEqual([(m.pk, m.attempts) for m in claim_batch()], [(self.message.pk, 2)])
+
+    def test_sent_messages_are_recorded(self):
+        enqueue_email('Second', 'Body', ['other@example.com'])
+        connection = mail.get_connection('django.core.mail.backends.locmem.EmailBackend')
+        self.assertEqual(deliver_batch(connection), (2, 0, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(set(OutboxMessage.objects.values_list('status', flat=True)), {'sent'})
+        self.assertEqual(deliver_batch(connection), (0, 0, 0))
+
+    def test_failed_send_stays_sending_with_a_backoff(self):
+        before = timezone.now()
+        self.assertEqual(deliver_batch(FailingConnection()), (0, 1, 0))
+        message = OutboxMessage.objects.get(pk=self.message.pk)
+        self.assertEqual((message.status, message.attempts), ('sending', 1))
+        self.assertIn('OSError: connection refused', message.last_error)
+        self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=BACKOFF_BASE / 2))
+        self.assertLess(message.next_attempt_at, before + SEND_LEASE)
+        self.assertEqual(deliver_batch(FailingConnection()), (0, 0, 0))  # not due yet
+
+    def test_message_is_dead_after_max_attempts(self):
+        for _ in range(MAX_ATTEMPTS - 1):
+            self.assertEqual(deliver_batch(FailingConnection()), (0, 1, 0))
+            self.make_due()
+        self.assertEqual(deliver_batch(FailingConnection()), (0, 0, 1))
+        message = OutboxMessage.objects.get(pk=self.message.pk)
+        self.assertEqual((message.status, message.attempts), ('dead', MAX_ATTEMPTS))
+        self.make_due()
+        self.assertEqual(claim_batch(), [])
+
+    def test_outbox_rows_roll_back_with_a_failed_booking_save(self):
+        booking = _create_booking()
+        self.assertEqual(OutboxMessage.objects.filter(key__startswith=f'booking:{booking.pk}:').count(), 2)
+        messages, bookings = OutboxMessage.objects.count(), Booking.objects.count()
+
+        def fail(**kwargs):
+            raise RuntimeError('save failed after the outbox insert')
+
+        post_save.connect(fail, sender=Booking, dispatch_uid='fail_booking_save')
+        try:
+            with self.assertRaises(RuntimeError):
+                Booking.objects.create(customer=booking.customer, employee=booking.employee,
+                                       title='Never saved', duration_value=1)
+        finally:
+            post_save.disconnect(sender=Booking, dispatch_uid='fail_booking_save')
+        self.assertEqual((OutboxMessage.objects.count(), Booking.objects.count()), (messages, bookings))
+
+
+class NotificationCoalescingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        cls.digest_user = User.objects.create_user('bob', 'bob@example.com', 'pw', email_digest=True)
+
+    def test_updates_within_the_window_share_one_message(self):
+        first = queue_notification(self.user, 'booking:1', 'Accepted', 'Booking 1 was accepted.')
+        second = queue_notification(self.user, 'booking:1', 'Started', 'Booking 1 was started.')
+        self.assertEqual(first.pk, second.pk)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.subject, message.body), ('Started', 'Booking 1 was started.'))
+        self.assertGreater(message.next_attempt_at, timezone.now())  # held back for the window
+
+    def test_other_objects_get_their_own_message(self):
+        queue_notification(self.user, 'booking:1', 'Accepted', 'Booking 1 was accepted.')
+        queue_notification(self.user, 'booking:2', 'Accepted', 'Booking 2 was accepted.')
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+
+    def test_digest_users_get_one_message(self):
+        queue_notification(self.digest_user, 'booking:1', 'Accepted', 'Booking 1 was accepted.')
+        queue_notification(self.digest_user, 'booking:2', 'Cancelled', 'Booking 2 was cancelled.')
+        queue_notification(self.digest_user, 'booking:1', 'Started', 'Booking 1 was started.')
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.key, f'digest:{self.digest_user.pk}')
+        self.assertEqual(message.subject, '[JobMate] 2 updates on your bookings')
+        self.assertIn('Booking 1 was started.', message.body)
+        self.assertIn('Booking 2 was cancelled.', message.body)
+        self.assertNotIn('Booking 1 was accepted.', message.body)
+
+    def test_claimed_message_is_not_changed(self):
+        claimed = queue_notification(self.user, 'booking:1', 'Accepted', 'Booking 1 was accepted.')
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        claim_batch()
+        later = queue_notification(self.user, 'booking:1', 'Started', 'Booking 1 was started.')
+        self.assertNotEqual(later.pk, claimed.pk)
+        self.assertEqual(OutboxMessage.objects.get(pk=claimed.pk).subject, 'Accepted')
+
+    def test_users_without_email_are_skipped(self):
+        user = User.objects.create_user('carol', '', 'pw')
+        self.assertIsNone(queue_notification(user, 'booking:1', 'Accepted', 'Booking 1 was accepted.'))
+        self.assertFalse(OutboxMessage.objects.exists())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'row locks are checked on PostgreSQL')
+class NotificationLockTests(TransactionTestCase):
+
+    def test_locked_pending_message_gets_a_new_message(self):
+        user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        pending = queue_notification(user, 'booking:1', 'Accepted', 'Booking 1 was accepted.')
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    OutboxMessage.objects.select_for_update().get(pk=pending.pk)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            message = queue_notification(user, 'booking:1', 'Started', 'Booking 1 was started.')
+        finally:
+            release.set()
+            thread.join()
+        self.assertNotEqual(message.pk, pending.pk)
+        self.assertIsNone(message.key)  # sent on its own, not coalesced
+        self.assertEqual(OutboxMessage.objects.get(pk=pending.pk).subject, 'Accepted')
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        self.booking = _create_booking('completed')
+        self.customer, self.employee = self.booking.customer, self.booking.employee
+        self.client.force_login(self.customer)
+
+    def get(self, name, *args, etag=None, **params):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(reverse(name, args=args), params, headers=headers)
+
+    def assertRevalidates(self, name, *args, **params):
+        """The endpoint answers 200 with an ETag, then 304 to that ETag; returns the ETag."""
+        response = self.get(name, *args, **params)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.get(name, *args, etag=etag, **params).status_code, 304)
+        return etag
+
+    def test_every_endpoint_answers_304(self):
+        self.assertRevalidates('api_employee_list')
+        self.assertRevalidates('api_employee_detail', self.employee.pk)
+        self.assertRevalidates('api_booking_list')
+        self.assertRevalidates('api_booking_detail', self.booking.pk)
+
+    def test_etag_changes_with_the_fields(self):
+        etag = self.assertRevalidates('api_booking_detail', self.booking.pk)
+        self.assertEqual(self.get('api_booking_detail', self.booking.pk, etag=etag, fields='id').status_code, 200)
+
+    def test_booking_etags_change_when_the_booking_is_saved(self):
+        detail = self.assertRevalidates('api_booking_detail', self.booking.pk)
+        listing = self.assertRevalidates('api_booking_list')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.description = 'Bring a wrench'
+            self.booking.save()
+        self.assertEqual(self.get('api_booking_detail', self.booking.pk, etag=detail).status_code, 200)
+        self.assertEqual(self.get('api_booking_list', etag=listing).status_code, 200)
+
+    def test_booking_etag_changes_when_its_review_is_edited(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(booking=self.booking, reviewer=self.customer, rating=3)
+        etag = self.assertRevalidates('api_booking_detail', self.booking.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            review.comment = 'Great work'
+            review.save()
+        response = self.get('api_booking_detail', self.booking.pk, etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['review']['comment'], 'Great work')
+
+    def test_sparse_fields(self):
+        response = self.get('api_booking_detail', self.booking.pk, fields='id,status, id')
+        self.assertEqual(response.json(), {'id': self.booking.pk, 'status': 'completed'})
+        results = self.get('api_booking_list', fields='title').json()['results']
+        self.assertEqual(results, [{'title': 'Fix the sink'}])
+        employee = self.get('api_employee_detail', self.employee.pk, fields='username,skills').json()
+        self.assertEqual(employee, {'username': self.employee.username, 'skills': []})
+
+    def test_invalid_fields_get_400_without_an_etag(self):
+        etag = self.assertRevalidates('api_booking_detail', self.booking.pk)
+        for name, args in (('api_employee_list', ()), ('api_employee_detail', (self.employee.pk,)),
+                           ('api_booking_list', ()), ('api_booking_detail', (self.booking.pk,))):
+            with self.subTest(name=name):
+                response = self.get(name, *args, fields='bogus')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.has_header('ETag'))
+                self.assertIn('bogus', response.json()['error'])
+        # Replaying any ETag, even the valid request's, still gets the 400
+        self.assertEqual(self.get('api_booking_detail', self.booking.pk, etag=etag, fields='bogus').status_code, 400)
+        self.assertEqual(self.get('api_booking_detail', self.booking.pk, etag='*', fields='bogus').status_code, 400)
+
+    def test_other_users_get_403_and_missing_objects_404(self):
+        self.client.force_login(_create_booking().customer)
+        response = self.get('api_booking_detail', self.booking.pk)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(self.get('api_booking_detail', 0).status_code, 404)
+        self.assertEqual(self.get('api_employee_detail', self.customer.pk).status_code, 404)
+        self.assertEqual(self.get('api_employee_detail', 0).status_code, 404)
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.get('api_booking_list').status_code, 302)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.booking = _create_booking()
+        # Seven bookings sharing one created_at, so only the pk orders them
+        for n in range(6):
+            Booking.objects.create(customer=cls.booking.customer, employee=cls.booking.employee,
+                                   title=f'Job {n}', duration_value=1)
+        Booking.objects.update(created_at=cls.booking.created_at)
+        EmployeeProfile.objects.update(avg_rating=Decimal('4.50'))
+
+    def pages(self, qs, keys, page_size):
+        """Page through ``qs`` to the end; returns the pks of each page."""
+        pages, cursor = [], None
+        while True:
+            page = paginate_queryset(qs, keys, cursor, page_size=page_size)
+            pages.append([row.pk for row in page])
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_equal_sort_keys_page_in_a_stable_order(self):
+        everything = list(_ordered(Booking.objects.all(), BOOKING_KEYS).values_list('pk', flat=True))
+        self.assertEqual(everything, sorted(everything, reverse=True))
+        for page_size in (1, 2, 3, 7, 8):
+            with self.subTest(page_size=page_size):
+                pages = self.pages(Booking.objects.all(), BOOKING_KEYS, page_size)
+                self.assertEqual([pk for page in pages for pk in page], everything)
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+        # Seven rows in pages of seven: the first page is also the last
+        self.assertEqual(len(self.pages(Booking.objects.all(), BOOKING_KEYS, 7)), 1)
+
+    def test_decimal_keys_with_ties(self):
+        for n in range(4):
+            user = User.objects.create_user(f'tied{n}', f'tied{n}@example.com', 'pw', role='employee')
+            EmployeeProfile.objects.create(user=user, avg_rating=Decimal('4.50'))
+        profiles = EmployeeProfile.objects.all()
+        everything = list(_ordered(profiles, TOP_RATED_KEYS).values_list('pk', flat=True))
+        self.assertEqual([pk for page in self.pages(profiles, TOP_RATED_KEYS, 2) for pk in page], everything)
+
+    def test_garbage_cursors_are_invalid(self):
+        for cursor in (
+            'garbage', '!!!', 'e30', encode_cursor(['x', 1]), encode_cursor([1]),
+            encode_cursor(['2026-13-45T00:00:00', 1]), encode_cursor([self.booking.created_at, 'x']),
+            encode_cursor([self.booking.created_at, 1e400]), encode_cursor([None, None]),
+        ):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginate_queryset(Booking.objects.all(), BOOKING_KEYS, cursor)
+        for cursor in (encode_cursor(['abc', 1]), encode_cursor(['NaN', 1]), encode_cursor(['Infinity', 1])):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginate_queryset(EmployeeProfile.objects.all(), TOP_RATED_KEYS, cursor)
+
+    def test_views_fall_back_to_the_first_page(self):
+        self.client.force_login(self.booking.customer)
+        first = self.client.get(reverse('booking_list'))
+        for cursor in ('garbage', encode_cursor(['abc', 1]), encode_cursor([self.booking.created_at, 1e400])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('booking_list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([b.pk for b in response.context['page']], [b.pk for b in first.context['page']])
+        for params in ({'cursor': encode_cursor([1e400, 1])}, {'q': 'fix', 'cursor': encode_cursor(['x', 1])}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('employee_list'), params).status_code, 200)
+
+    def test_home_page_cache_ignores_cursors(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.assertEqual(self.client.get(reverse('home'))['X-Page-Cache'], 'miss')
+        # Malformed cursors are the first page and share its entry
+        for cursor in ('garbage', encode_cursor(['abc', 1]), encode_cursor([1e400, 1])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(reverse('home'), {'cursor': cursor})['X-Page-Cache'], 'hit')
+        # Valid ones, whatever values they carry, are rendered every time
+        response = self.client.get(reverse('home'), {'cursor': encode_cursor(['4.50', 1])})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Page-Cache', response)
+
+
+def _ordered(qs, keys):
+    return qs.order_by(*[key.order_by for key in keys])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are checked on PostgreSQL')
+class HotQueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Also ANALYZEs the tables, so the plans are costed on real statistics
+        call_command('seed_synthetic', employees=300, customers=100, skills=40, bookings=3000,
+                     batch_size=1000, stdout=StringIO())
+        cls.customer = User.objects.filter(role='customer', bookings_as_customer__isnull=False).first()
+        cls.employee = User.objects.filter(role='employee', bookings_as_employee__isnull=False).first()
+        cls.last_booking = Booking.objects.order_by('-created_at', '-pk')[BOOKING_PAGE_SIZE]
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, qs, *index_names):
+        """The plan scans ``qs``'s table through one of ``index_names``, never sequentially."""
+        plan = qs.explain()
+        table = qs.model._meta.db_table
+        self.assertNotIn(f'Seq Scan on {table}', plan, msg=f'\n{plan}')
+        self.assertTrue(any(name in plan for name in index_names),
+                        msg=f'expected one of {index_names}:\n{plan}')
+
+    def booking_page(self, qs, after=None):
+        qs = _ordered(qs.select_related('customer', 'employee'), BOOKING_KEYS)
+        if after is not None:
+            qs = qs.filter(keyset_filter(BOOKING_KEYS, [after.created_at, after.pk]))
+        return qs[:BOOKING_PAGE_SIZE + 1]
+
+    def test_customer_booking_list(self):
+        bookings = Booking.objects.filter(customer=self.customer)
+        self.assertUsesIndex(self.booking_page(bookings), 'booking_customer_recent')
+        self.assertUsesIndex(self.booking_page(bookings, after=self.last_booking), 'booking_customer_recent')
+
+    def test_employee_booking_list(self):
+        # With few bookings per employee either employee-led index is a fine plan
+        bookings = Booking.objects.filter(employee=self.employee)
+        indexes = ('booking_employee_recent', 'booking_employee_status')
+        self.assertUsesIndex(self.booking_page(bookings), *indexes)
+        self.assertUsesIndex(self.booking_page(bookings, after=self.last_booking), *indexes)
+
+    def test_admin_booking_list_and_latest_bookings(self):
+        self.assertUsesIndex(self.booking_page(Booking.objects.all()), 'booking_recent')
+        self.assertUsesIndex(self.booking_page(Booking.objects.all(), after=self.last_booking), 'booking_recent')
+        latest = Booking.objects.select_related('customer', 'employee').order_by('-created_at')[:20]
+        self.assertUsesIndex(latest, 'booking_recent')
+
+    def test_employee_completed_count(self):
+        completed = self.employee.bookings_as_employee.filter(status='completed')
+        self.assertUsesIndex(completed, 'booking_employee_status')
+
+    def test_home_top_rated(self):
+        profiles = EmployeeProfile.objects.filter(availability='available').select_related('user')
+        self.assertUsesIndex(_ordered(profiles, TOP_RATED_KEYS)[:HOME_PAGE_SIZE + 1], 'employee_available_rating')
+
+    def test_unverified_employees(self):
+        unverified = EmployeeProfile.objects.filter(is_verified=False).select_related('user').order_by('pk')[:20]
+        self.assertUsesIndex(unverified, 'employee_unverified')
+
+    def test_fraud_flags(self):
+        flagged = FraudCounter.objects.filter(flagged=True).order_by('-cancelled_recent', '-rejected_recent')[:20]
+        self.assertUsesIndex(flagged, 'fraud_counter_flagged')
+
+    def test_rollup_series(self):
+        day = Booking.objects.values_list('created_at', flat=True).first().date()
+        series = DailyBookingStats.objects.filter(category='', city='', day__range=(day, day))
+        self.assertUsesIndex(series, 'daily_booking_stats_key')
+
+    def test_outbox_due_messages(self):
+        due = OutboxMessage.objects.filter(status__in=DUE_STATUSES, next_attempt_at__lte=timezone.now())
+        self.assertUsesIndex(due.order_by('next_attempt_at'), 'outbox_due')
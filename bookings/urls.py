@@ -1,13 +1,18 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home_view, name='home'),
     path('employees/', views.employee_list_view, name='employee_list'),
+    path('search/suggest/', views.autocomplete_view, name='search_suggest'),
     path('book/<int:employee_pk>/', views.create_booking_view, name='create_booking'),
     path('bookings/', views.booking_list_view, name='booking_list'),
     path('bookings/<int:pk>/', views.booking_detail_view, name='booking_detail'),
     path('bookings/<int:pk>/<str:action>/', views.booking_action_view, name='booking_action'),
     path('bookings/<int:booking_pk>/review/', views.add_review_view, name='add_review'),
     path('bookings/<int:booking_pk>/proof/', views.add_work_proof_view, name='add_work_proof'),
+    path('api/employees/', api.employee_list_api, name='api_employee_list'),
+    path('api/employees/<int:pk>/', api.employee_detail_api, name='api_employee_detail'),
+    path('api/bookings/', api.booking_list_api, name='api_booking_list'),
+    path('api/bookings/<int:pk>/', api.booking_detail_api, name='api_booking_detail'),
 ]
@@ -1,51 +1,164 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseForbidden
+from django.db import transaction
+from django.http import HttpResponseForbidden, JsonResponse, QueryDict
 
 from .models import Booking, Review, WorkProof
 from .forms import BookingForm, ReviewForm, WorkProofForm, SearchForm
-from .services import rank_employees, smart_search, calculate_booking_cost
+from .pagination import (
+    DATETIME, DECIMAL, FLOAT, INT, InvalidCursor, Page, SortKey, decode_cursor, paginate_queryset,
+    paginate_results,
+)
+from .autocomplete import autocomplete_index
+from .cards import attach_cards
+from .page_cache import cache_anonymous_page
+from .services import rank_employees, nearby_employees, smart_search, calculate_booking_cost
+from .workflow import InvalidAction, NotAllowed, StaleTransition, transition
 from accounts.models import User, EmployeeProfile
 
 
+HOME_PAGE_SIZE = 12
+EMPLOYEE_PAGE_SIZE = 24
+BOOKING_PAGE_SIZE = 25
+
+# Keyset orderings (see bookings.pagination); each ends in the pk to stay total
+TOP_RATED_KEYS = [SortKey('avg_rating', descending=True, type=DECIMAL), SortKey('pk')]
+SEARCH_KEYS = [SortKey('rank', descending=True, type=FLOAT), SortKey('pk')]
+BOOKING_KEYS = [SortKey('created_at', descending=True, type=DATETIME), SortKey('pk', descending=True)]
+
+
+def _paginate(request, paginate, *args, **kwargs):
+    """Run a paginator on ``?cursor=``; a malformed cursor falls back to the first page."""
+    cursor = request.GET.get('cursor') or None
+    try:
+        return paginate(*args, cursor=cursor, **kwargs)
+    except InvalidCursor:
+        return paginate(*args, cursor=None, **kwargs)
+
+
+def _pager_context(params, page):
+    """Template context for ``bookings/_pager.html``; links keep the other ``params`` (a QueryDict)."""
+    first = params.copy()
+    first.pop('cursor', None)
+    return {
+        'page': page,
+        'next_query': page.next_query(params) if page.has_next else None,
+        'first_query': first.urlencode() if params.get('cursor') else None,
+    }
+
+
+def _home_params(request):
+    """
+    The search terms (case and spacing aside) and the cursor, '' when it is
+    malformed: home pages differ by nothing else.
+    """
+    q = ' '.join(request.GET.get('q', '').split()).lower()
+    cursor = request.GET.get('cursor', '')
+    if cursor:
+        try:
+            decode_cursor(cursor, [key.type for key in (SEARCH_KEYS if q else TOP_RATED_KEYS)])
+        except InvalidCursor:
+            cursor = ''
+    return q, cursor
+
+
+def _home_cache_key(request):
+    """Only first pages are cached: any number of cursors decode, so each would take its own entry."""
+    q, cursor = _home_params(request)
+    return None if cursor else (q,)
+
+
+@cache_anonymous_page('home', _home_cache_key)
 def home_view(request):
     """Landing page with search and top-rated employees."""
-    form = SearchForm(request.GET or None)
-    employees = []
+    # Rendered from the normalised parameters alone, so a cached page never
+    # carries the first visitor's spelling of the query or any other parameters
+    q, cursor = _home_params(request)
+    params = QueryDict(mutable=True)
+    if q:
+        params['q'] = q
+    if cursor:
+        params['cursor'] = cursor
+    form = SearchForm(params or None)
     query = ''
     if form.is_valid():
         query = form.cleaned_data.get('q', '')
     if query:
-        profiles = smart_search(query)
+        page = _paginate(request, paginate_queryset, smart_search(query), SEARCH_KEYS,
+                         page_size=HOME_PAGE_SIZE)
     else:
-        profiles = EmployeeProfile.objects.filter(
+        qs = EmployeeProfile.objects.filter(
             availability='available'
-        ).select_related('user').prefetch_related('skills').order_by('-avg_rating')[:12]
+        ).select_related('user')
+        page = _paginate(request, paginate_queryset, qs, TOP_RATED_KEYS, page_size=HOME_PAGE_SIZE)
+    attach_cards(page, 'home')
     return render(request, 'bookings/home.html', {
         'form': form,
-        'profiles': profiles,
+        'profiles': page,
         'query': query,
+        **_pager_context(params, page),
     })
 
 
-@login_required
-def employee_list_view(request):
-    """Browse/search employees with AI matching."""
+def autocomplete_view(request):
+    """JSON suggestions (skills, cities, names) for the search box, typo tolerant."""
+    query = request.GET.get('q', '')[:100]
+    return JsonResponse({
+        'query': query,
+        'suggestions': autocomplete_index.suggest(query),
+    })
+
+
+def search_employees(request):
+    """
+    The employee list's results for ``request.GET`` (q, lat/lng, radius_km,
+    cursor): returns (form, query, radius_km or None, page of
+    {'profile', 'score', 'breakdown'} or {'profile', 'distance_km'} dicts).
+    """
     form = SearchForm(request.GET or None)
     query = ''
-    results = []
+    lat = lng = radius_km = None
     if form.is_valid():
         query = form.cleaned_data.get('q', '')
+        lat, lng = form.cleaned_data.get('lat'), form.cleaned_data.get('lng')
+        radius_km = form.cleaned_data.get('radius_km')
+    has_location = lat is not None and lng is not None
     if query:
-        profiles = smart_search(query)
-        results = [{'profile': p, 'score': None, 'breakdown': None} for p in profiles]
+        search_page = _paginate(request, paginate_queryset, smart_search(query), SEARCH_KEYS,
+                                page_size=EMPLOYEE_PAGE_SIZE)
+        page = Page(
+            [{'profile': p, 'score': None, 'breakdown': None} for p in search_page],
+            search_page.next_cursor,
+        )
+    elif has_location and radius_km:
+        page = _paginate(
+            request, paginate_results,
+            lambda after, limit: nearby_employees(lat, lng, radius_km=radius_km, limit=limit, after=after),
+            lambda item: (item['distance_km'], item['profile'].pk),
+            [FLOAT, INT], page_size=EMPLOYEE_PAGE_SIZE,
+        )
     else:
-        results = rank_employees()
+        page = _paginate(
+            request, paginate_results,
+            lambda after, limit: rank_employees(customer_lat=lat, customer_lng=lng, limit=limit, after=after),
+            lambda item: (item['score'], item['profile'].pk),
+            [FLOAT, INT], page_size=EMPLOYEE_PAGE_SIZE,
+        )
+    return form, query, radius_km if has_location else None, page
+
+
+@login_required
+def employee_list_view(request):
+    """Browse/search employees with AI matching."""
+    form, query, radius_km, page = search_employees(request)
+    attach_cards([item['profile'] for item in page], 'list_head', 'list_body')
     return render(request, 'bookings/employee_list.html', {
         'form': form,
-        'results': results,
+        'results': page,
         'query': query,
+        'radius_km': radius_km,
+        **_pager_context(request.GET, page),
     })
 
 
@@ -63,8 +176,9 @@ def create_booking_view(request, employee_pk):
             booking.customer = request.user
             booking.employee = employee_user
             booking.calculate_cost()
-            booking.save()
-            form.save_m2m()
+            with transaction.atomic():  # the daily rollup counts it on commit, skills included
+                booking.save()
+                form.save_m2m()
             messages.success(request, f'Booking created! Estimated cost: ${booking.total_cost}')
             return redirect('booking_detail', pk=booking.pk)
     else:
@@ -92,63 +206,44 @@ def booking_detail_view(request, pk):
     })
 
 
+def bookings_visible_to(user):
+    """Bookings ``user`` may list: their own as customer or employee, all for admins."""
+    if user.is_customer:
+        return Booking.objects.filter(customer=user)
+    if user.is_employee:
+        return Booking.objects.filter(employee=user)
+    return Booking.objects.all()
+
+
 @login_required
 def booking_list_view(request):
     """List bookings for the logged-in user."""
-    user = request.user
-    if user.is_customer:
-        bookings = Booking.objects.filter(customer=user)
-    elif user.is_employee:
-        bookings = Booking.objects.filter(employee=user)
-    else:
-        bookings = Booking.objects.all()
-    return render(request, 'bookings/booking_list.html', {'bookings': bookings})
+    bookings = bookings_visible_to(request.user).select_related('customer', 'employee')
+    page = _paginate(request, paginate_queryset, bookings, BOOKING_KEYS, page_size=BOOKING_PAGE_SIZE)
+    return render(request, 'bookings/booking_list.html', {
+        'bookings': page,
+        **_pager_context(request.GET, page),
+    })
 
 
 @login_required
 def booking_action_view(request, pk, action):
     """Employee accepts/rejects or marks booking in_progress/completed."""
-    booking = get_object_or_404(Booking, pk=pk)
-    allowed_actions = {
-        'accept': ('pending', 'accepted'),
-        'reject': ('pending', 'rejected'),
-        'start': ('accepted', 'in_progress'),
-        'complete': ('in_progress', 'completed'),
-        'cancel': (None, 'cancelled'),
-    }
-    if action not in allowed_actions:
+    get_object_or_404(Booking, pk=pk)
+    try:
+        booking = transition(pk, action, request.user)
+    except InvalidAction:
         return HttpResponseForbidden("Invalid action.")
-
-    required_status, new_status = allowed_actions[action]
-
-    # Validate permission
-    if action in ('accept', 'reject', 'start', 'complete'):
-        if request.user != booking.employee:
-            return HttpResponseForbidden()
-    if action == 'cancel':
-        if request.user != booking.customer and request.user != booking.employee:
-            return HttpResponseForbidden()
-
-    if required_status and booking.status != required_status:
-        messages.error(request, f"Cannot {action} a booking that is {booking.get_status_display()}.")
+    except NotAllowed:
+        return HttpResponseForbidden()
+    except StaleTransition as exc:
+        if exc.already_done:
+            messages.info(request, f"This booking is already {exc.booking.get_status_display()}.")
+        else:
+            messages.error(request, str(exc))
         return redirect('booking_detail', pk=pk)
 
-    booking.status = new_status
-    booking.save()
-
-    # Update employee stats on completion
-    if new_status == 'completed' and hasattr(booking.employee, 'employee_profile'):
-        ep = booking.employee.employee_profile
-        ep.total_jobs += 1
-        ep.save(update_fields=['total_jobs'])
-        # Update customer stats
-        if hasattr(booking.customer, 'customer_profile'):
-            cp = booking.customer.customer_profile
-            cp.total_bookings += 1
-            cp.total_spent += booking.total_cost
-            cp.save(update_fields=['total_bookings', 'total_spent'])
-
-    messages.success(request, f"Booking {action}ed successfully.")
+    messages.success(request, f"Booking is now {booking.get_status_display()}.")
     return redirect('booking_detail', pk=pk)
 
 
@@ -0,0 +1,107 @@
+"""
+Booking state machine.
+
+Every status change goes through ``transition()``: the booking row is locked
+with ``SELECT ... FOR UPDATE`` inside a transaction, the current status is
+checked against the action's allowed source states, and the completion
+counters are bumped with ``F()`` expressions. Two concurrent clicks on
+"Complete" therefore produce one transition and one counter increment; the
+loser gets ``StaleTransition`` and can tell the user what happened.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from accounts.models import CustomerProfile, EmployeeProfile
+from accounts.signals import notify_profiles_changed
+from .models import Booking
+
+# action -> (allowed current statuses, new status)
+TRANSITIONS = {
+    'accept': (('pending',), 'accepted'),
+    'reject': (('pending',), 'rejected'),
+    'start': (('accepted',), 'in_progress'),
+    'complete': (('in_progress',), 'completed'),
+    'cancel': (('pending', 'accepted', 'in_progress'), 'cancelled'),
+}
+EMPLOYEE_ACTIONS = {'accept', 'reject', 'start', 'complete'}
+
+
+class TransitionError(Exception):
+    pass
+
+
+class InvalidAction(TransitionError):
+    pass
+
+
+class NotAllowed(TransitionError):
+    pass
+
+
+class StaleTransition(TransitionError):
+    """The booking is no longer in a state the action applies to (often: someone else just did it)."""
+
+    def __init__(self, booking, action):
+        self.booking = booking
+        self.action = action
+        _, new_status = TRANSITIONS[action]
+        self.already_done = booking.status == new_status
+        super().__init__(f"Cannot {action} a booking that is {booking.get_status_display()}.")
+
+
+def can_perform(user, booking, action):
+    """
+    Whether ``user`` may run ``action`` on ``booking``: the employee runs the
+    job actions, either party may cancel. Admins act through the Django admin,
+    which calls ``transition`` without a user.
+    """
+    if action in EMPLOYEE_ACTIONS:
+        return user.pk == booking.employee_id
+    if action == 'cancel':
+        return user.pk in (booking.customer_id, booking.employee_id)
+    return False
+
+
+def available_actions(user, booking):
+    """Actions ``user`` could run on ``booking`` in its current state."""
+    return [
+        action for action, (sources, _) in TRANSITIONS.items()
+        if booking.status in sources and can_perform(user, booking, action)
+    ]
+
+
+def transition(booking_id, action, user=None):
+    """
+    Apply ``action`` to the booking atomically and return the updated booking.
+
+    ``user`` is checked with ``can_perform``. None skips the check, for system
+    callers and the admin's bulk actions (guarded by the admin's own
+    permissions). Raises InvalidAction, NotAllowed or StaleTransition.
+    """
+    if action not in TRANSITIONS:
+        raise InvalidAction(action)
+    sources, new_status = TRANSITIONS[action]
+    with transaction.atomic():
+        booking = (
+            Booking.objects.select_for_update(of=('self',))
+            .select_related('customer', 'employee')
+            .get(pk=booking_id)
+        )
+        if user is not None and not can_perform(user, booking, action):
+            raise NotAllowed(action)
+        if booking.status not in sources:
+            raise StaleTransition(booking, action)
+
+        booking.status = new_status
+        booking.save(update_fields=['status', 'updated_at'])  # post_save queues the notifications
+
+        if new_status == 'completed':
+            EmployeeProfile.objects.filter(user_id=booking.employee_id).update(total_jobs=F('total_jobs') + 1)
+            CustomerProfile.objects.filter(user_id=booking.customer_id).update(
+                total_bookings=F('total_bookings') + 1,
+                total_spent=F('total_spent') + booking.total_cost,
+            )
+            notify_profiles_changed(
+                EmployeeProfile.objects.filter(user_id=booking.employee_id).values_list('pk', flat=True),
+                fields={'total_jobs'})
+    return booking
@@ -1,3 +1,30 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import FraudCounter, PlatformStats
+
+
+@admin.register(PlatformStats)
+class PlatformStatsAdmin(admin.ModelAdmin):
+    """Read-only view of the dashboard counters (fix drift with `manage.py reconcile_stats`)."""
+    list_display = ('__str__', 'total_users', 'pending_verifications', 'total_bookings', 'completed_revenue')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(FraudCounter)
+class FraudCounterAdmin(admin.ModelAdmin):
+    list_display = ('customer', 'cancelled_total', 'rejected_total', 'cancelled_recent', 'rejected_recent',
+                    'flagged', 'updated_at')
+    list_filter = ('flagged',)
+    search_fields = ('customer__username', 'customer__email')
+    readonly_fields = [f.name for f in FraudCounter._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,158 @@
+"""
+Streaming exports of the booking history.
+
+Each dataset is one ``values_list`` query read through a server-side cursor
+(``iterator(chunk_size=...)``) and encoded row by row as CSV or NDJSON, so
+memory stays flat however many rows there are. Related data is joined in the
+same query: skill names come from a correlated ``StringAgg`` subquery rather
+than a ``GROUP BY`` over the whole table, which would have to finish before
+the first row could be sent. Output is buffered into chunks of about
+``CHUNK_BYTES`` and can be gzipped on the fly.
+
+Datasets:
+
+* ``bookings``: one row per booking with its customer, employee, review rating and skills.
+* ``reviews``: one row per review with its booking, reviewer and employee.
+* ``payouts``: one row per completed booking, i.e. what each employee earned
+  and when (there is no separate payout ledger).
+"""
+import csv
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import OuterRef, Subquery, TextField
+from django.utils import timezone
+
+from accounts.models import Skill
+from bookings.models import Booking, Review
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+CHUNK_ROWS = 2000  # rows fetched per server-side cursor round trip
+CHUNK_BYTES = 64 * 1024  # output buffered before it is yielded (and compressed)
+
+
+def _skill_names():
+    return Subquery(
+        Skill.objects.filter(booking=OuterRef('pk')).order_by().values('booking')
+        .annotate(names=StringAgg('name', delimiter='; ', order_by='name')).values('names'),
+        output_field=TextField(),
+    )
+
+
+def _bookings():
+    return Booking.objects.annotate(skills=_skill_names()), 'created_at', [
+        ('id', 'pk'), ('created_at', 'created_at'), ('updated_at', 'updated_at'), ('status', 'status'),
+        ('title', 'title'), ('duration_type', 'duration_type'), ('duration_value', 'duration_value'),
+        ('rate_applied', 'rate_applied'), ('total_cost', 'total_cost'), ('start_date', 'start_date'),
+        ('end_date', 'end_date'), ('location', 'location'),
+        ('customer_id', 'customer_id'), ('customer_username', 'customer__username'),
+        ('customer_email', 'customer__email'),
+        ('employee_id', 'employee_id'), ('employee_username', 'employee__username'),
+        ('employee_city', 'employee_city'),
+        ('review_rating', 'review__rating'), ('skills', 'skills'),
+    ]
+
+
+def _reviews():
+    return Review.objects.all(), 'created_at', [
+        ('id', 'pk'), ('created_at', 'created_at'), ('rating', 'rating'), ('comment', 'comment'),
+        ('booking_id', 'booking_id'), ('booking_status', 'booking__status'),
+        ('reviewer_id', 'reviewer_id'), ('reviewer_username', 'reviewer__username'),
+        ('employee_id', 'booking__employee_id'), ('employee_username', 'booking__employee__username'),
+    ]
+
+
+def _payouts():
+    # A completed booking is final, so updated_at is when it was completed
+    return Booking.objects.filter(status='completed'), 'updated_at', [
+        ('booking_id', 'pk'), ('completed_at', 'updated_at'),
+        ('employee_id', 'employee_id'), ('employee_username', 'employee__username'),
+        ('employee_email', 'employee__email'), ('customer_id', 'customer_id'),
+        ('duration_type', 'duration_type'), ('duration_value', 'duration_value'),
+        ('rate_applied', 'rate_applied'), ('amount', 'total_cost'),
+    ]
+
+
+DATASETS = {'bookings': _bookings, 'reviews': _reviews, 'payouts': _payouts}
+STATUS_FILTERS = {'bookings': 'status', 'reviews': 'booking__status'}  # payouts are all completed
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_rows(dataset, start=None, end=None, statuses=None):
+    """
+    (header, row iterator) for ``dataset``, oldest first. ``start``/``end`` are
+    inclusive dates on its timestamp; ``statuses`` filters booking status.
+    """
+    qs, stamp, columns = DATASETS[dataset]()
+    # Datetime bounds rather than __date lookups keep the range indexable (booking_recent for bookings)
+    if start:
+        qs = qs.filter(**{f'{stamp}__gte': _day_start(start)})
+    if end:
+        qs = qs.filter(**{f'{stamp}__lt': _day_start(end + timedelta(days=1))})
+    if statuses:
+        if dataset not in STATUS_FILTERS:
+            raise ValueError(f'{dataset} cannot be filtered by status.')
+        qs = qs.filter(**{f'{STATUS_FILTERS[dataset]}__in': statuses})
+    rows = qs.order_by(stamp, 'pk').values_list(*[path for _, path in columns])
+    return [name for name, _ in columns], rows.iterator(chunk_size=CHUNK_ROWS)
+
+
+# A cell starting with one of these runs as a formula when the CSV is opened in a spreadsheet
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _safe_cell(value):
+    """Prefix user-entered text that a spreadsheet would evaluate with ``'`` so it stays text."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Line:
+    """File-like object for csv.writer that hands back what is written."""
+
+    def write(self, value):
+        return value
+
+
+def _encoded(header, rows, fmt):
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([_safe_cell(value) for value in row])
+    else:
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            yield encoder.encode(dict(zip(header, row))) + '\n'
+
+
+def stream(header, rows, fmt='csv', compress=False):
+    """Encode rows as ``fmt``, yielding bytes in chunks of about ``CHUNK_BYTES``, gzipped if ``compress``."""
+    gzip = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+    buffer, size = [], 0
+    for line in _encoded(header, rows, fmt):
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = gzip.compress(chunk) if gzip else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if gzip:
+        chunk = gzip.compress(chunk) + gzip.flush()
+    if chunk:
+        yield chunk
+
+
+def filename(dataset, fmt, compress=False):
+    stamp = timezone.localdate().isoformat()
+    return f'{dataset}-{stamp}.{fmt}' + ('.gz' if compress else '')
@@ -0,0 +1,147 @@
+"""
+Fraud signals: per-customer cancellation and rejection counters.
+
+Every booking that becomes cancelled or rejected adds one to the customer's
+``FraudCounter`` totals and to a per-day ``FraudBucket``. The window counts
+are the sum of the buckets inside the last ``FRAUD_WINDOW_DAYS`` days, and
+``flagged`` is set when any count reaches its ``FRAUD_THRESHOLDS`` entry, so
+the dashboard reads the flagged set from a partial index instead of
+aggregating the booking history on each visit.
+
+Buckets fall out of the window as days pass: ``slide_window()`` (run daily by
+``manage.py refresh_fraud_signals``) deletes the expired ones and recounts the
+customers they belonged to. ``rebuild()`` recomputes everything from the
+bookings.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from bookings.models import Booking
+from .models import FraudBucket, FraudCounter
+
+# Booking status -> counter name
+STATUS_FIELDS = {'cancelled': 'cancelled', 'rejected': 'rejected'}
+
+
+def window_start(today=None):
+    """First day inside the sliding window."""
+    today = today or timezone.localdate()
+    return today - timedelta(days=settings.FRAUD_WINDOW_DAYS - 1)
+
+
+def flag_condition():
+    """Q matching counters at or over any configured threshold."""
+    condition = Q(pk__in=[])
+    for field, threshold in settings.FRAUD_THRESHOLDS.items():
+        if threshold is not None:
+            condition |= Q(**{f'{field}__gte': threshold})
+    return condition
+
+
+def flagged_customers(limit=None):
+    """Flagged counters (with their customer), most recent offenders first."""
+    qs = (
+        FraudCounter.objects.filter(flagged=True)
+        .select_related('customer')
+        .order_by('-cancelled_recent', '-rejected_recent', '-cancelled_total')
+    )
+    return qs[:limit] if limit else qs
+
+
+def _increment(model, lookup, deltas):
+    """Add ``deltas`` to the row matching ``lookup``, creating it if needed (only for increments)."""
+    updates = {field: F(field) + amount for field, amount in deltas.items()}
+    while True:
+        if model.objects.filter(**lookup).update(**updates) or all(amount < 0 for amount in deltas.values()):
+            # A decrement with no row: the customer is being deleted, or was never counted
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(**lookup, **{field: max(amount, 0) for field, amount in deltas.items()})
+            return
+        except IntegrityError:
+            continue  # created concurrently: update it instead
+
+
+def record(customer_id, status, sign=1, day=None):
+    """Count (sign=1) or uncount (sign=-1) a booking of ``customer_id`` ending in ``status``."""
+    field = STATUS_FIELDS.get(status)
+    if field is None:
+        return
+    day = day or timezone.localdate()
+    with transaction.atomic():
+        _increment(FraudCounter, {'customer_id': customer_id}, {f'{field}_total': sign})
+        if day >= window_start():
+            _increment(FraudBucket, {'customer_id': customer_id, 'day': day}, {field: sign})
+        refresh([customer_id])
+
+
+def refresh(customer_ids=None):
+    """Recount the window counts from the buckets and re-evaluate ``flagged`` (None = everyone)."""
+    counters = FraudCounter.objects.all()
+    if customer_ids is not None:
+        counters = counters.filter(customer_id__in=customer_ids)
+    buckets = FraudBucket.objects.filter(customer=OuterRef('customer_id'), day__gte=window_start()).order_by()
+
+    def window_sum(field):
+        total = buckets.values('customer').annotate(n=Sum(field)).values('n')
+        return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+    counters.update(cancelled_recent=window_sum('cancelled'), rejected_recent=window_sum('rejected'))
+    # Separate statements: the flag must see the counts written above
+    reflag(counters)
+
+
+def reflag(counters=None):
+    """Set ``flagged`` from the current thresholds, touching only rows whose flag changes."""
+    counters = FraudCounter.objects.all() if counters is None else counters
+    condition = flag_condition()
+    counters.filter(condition, flagged=False).update(flagged=True)
+    counters.exclude(condition).filter(flagged=True).update(flagged=False)
+
+
+def slide_window():
+    """Drop buckets that left the window and recount their customers; returns buckets removed."""
+    with transaction.atomic():
+        expired = FraudBucket.objects.filter(day__lt=window_start())
+        customer_ids = list(expired.values_list('customer_id', flat=True).distinct())
+        removed, _ = expired.delete()
+        refresh(customer_ids)
+        reflag()  # thresholds may have changed since the flags were last computed
+    return removed
+
+
+def rebuild(batch_size=5000):
+    """Recompute all counters and buckets from the bookings; returns the number of counters."""
+    signals = Booking.objects.filter(status__in=STATUS_FIELDS).order_by()
+    totals = signals.values('customer_id').annotate(
+        cancelled=Count('pk', filter=Q(status='cancelled')),
+        rejected=Count('pk', filter=Q(status='rejected')),
+    )
+    # A cancelled or rejected booking is final, so its updated_at is when that happened
+    daily = signals.filter(updated_at__date__gte=window_start()).values(
+        'customer_id', day=TruncDate('updated_at'),
+    ).annotate(
+        cancelled=Count('pk', filter=Q(status='cancelled')),
+        rejected=Count('pk', filter=Q(status='rejected')),
+    )
+    with transaction.atomic():
+        FraudBucket.objects.all().delete()
+        FraudCounter.objects.all().delete()
+        FraudCounter.objects.bulk_create(
+            (FraudCounter(customer_id=row['customer_id'], cancelled_total=row['cancelled'],
+                          rejected_total=row['rejected']) for row in totals.iterator()),
+            batch_size=batch_size,
+        )
+        FraudBucket.objects.bulk_create(
+            (FraudBucket(customer_id=row['customer_id'], day=row['day'], cancelled=row['cancelled'],
+                         rejected=row['rejected']) for row in daily.iterator()),
+            batch_size=batch_size,
+        )
+        refresh()
+    return FraudCounter.objects.count()
@@ -0,0 +1,343 @@
+"""
+Per-view request instrumentation.
+
+``InstrumentationMiddleware`` wraps every request with a database execute
+wrapper and records, per resolved view name, the number of queries, SQL time,
+template render time and total latency into fixed-bucket histograms. Render
+time comes from the ``InstrumentedDjangoTemplates`` backend, which only times
+templates rendered while a request is being recorded. Work done while a
+``StreamingHttpResponse`` is consumed (e.g. the exports) happens after the
+middleware has returned and is not counted. Queries whose fingerprint (the SQL with literals and
+IN lists collapsed) repeats within one request are tracked as likely N+1
+patterns. Requests that run more queries than ``QUERY_BUDGETS`` allows for the
+view log a warning naming the most repeated fingerprint.
+
+Histograms live in the worker process and are periodically copied to the
+default cache, so ``metrics()`` can merge what every worker has seen (with a
+shared cache backend). It backs ``/dashboard/metrics/requests/`` and
+``manage.py request_metrics``.
+"""
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('jobmate.instrumentation')
+
+# Upper bucket bounds; the last bucket is open-ended
+MS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+REPEAT_THRESHOLD = 3  # same fingerprint this often in one request = N+1 suspect
+MAX_FINGERPRINTS = 20  # repeated fingerprints kept per view
+FLUSH_INTERVAL = 10  # seconds between copies of this worker's data to the cache
+CACHE_TIMEOUT = 24 * 3600
+WORKERS_KEY = 'request_metrics:workers'
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+_recorder = ContextVar('request_recorder', default=None)
+
+
+def fingerprint(sql):
+    """SQL with literals and IN lists collapsed, so repeats of one query compare equal."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class Histogram:
+    """Counts per fixed bucket plus sum and max; mergeable across workers."""
+
+    def __init__(self, bounds, counts=None, total=0.0, maximum=0.0):
+        self.bounds = tuple(bounds)
+        self.counts = list(counts or [0] * (len(self.bounds) + 1))
+        self.total = total
+        self.maximum = maximum
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th percentile (max for the open bucket)."""
+        target = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else self.maximum
+        return 0
+
+    def summary(self):
+        count = self.count
+        return {
+            'mean': round(self.total / count, 2) if count else 0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': round(self.maximum, 2),
+        }
+
+    def to_dict(self):
+        return {'counts': self.counts, 'total': self.total, 'max': self.maximum}
+
+    @classmethod
+    def from_dict(cls, bounds, data):
+        return cls(bounds, data['counts'], data['total'], data['max'])
+
+
+class ViewStats:
+    """Histograms and N+1 suspects for one view."""
+
+    HISTOGRAMS = {'latency_ms': MS_BUCKETS, 'sql_ms': MS_BUCKETS,
+                  'template_ms': MS_BUCKETS, 'queries': COUNT_BUCKETS}
+
+    def __init__(self):
+        self.requests = 0
+        self.over_budget = 0
+        self.histograms = {name: Histogram(bounds) for name, bounds in self.HISTOGRAMS.items()}
+        self.repeated = {}  # fingerprint -> {'requests': n, 'max_repeats': n}
+
+    def add_repeated(self, sql, requests, max_repeats):
+        entry = self.repeated.setdefault(sql, {'requests': 0, 'max_repeats': 0})
+        entry['requests'] += requests
+        entry['max_repeats'] = max(entry['max_repeats'], max_repeats)
+        if len(self.repeated) > MAX_FINGERPRINTS:
+            rarest = min(self.repeated, key=lambda k: (self.repeated[k]['requests'], self.repeated[k]['max_repeats']))
+            del self.repeated[rarest]
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.over_budget += other.over_budget
+        for name, histogram in self.histograms.items():
+            histogram.merge(other.histograms[name])
+        for sql, entry in other.repeated.items():
+            self.add_repeated(sql, entry['requests'], entry['max_repeats'])
+
+    def summary(self):
+        return {
+            'requests': self.requests,
+            'over_budget': self.over_budget,
+            **{name: h.summary() for name, h in self.histograms.items()},
+            'repeated_queries': [
+                {'sql': sql, **entry}
+                for sql, entry in sorted(self.repeated.items(), key=lambda kv: -kv[1]['requests'])
+            ],
+        }
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'over_budget': self.over_budget,
+            'histograms': {name: h.to_dict() for name, h in self.histograms.items()},
+            'repeated': self.repeated,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.requests = data['requests']
+        stats.over_budget = data['over_budget']
+        stats.histograms = {
+            name: Histogram.from_dict(bounds, data['histograms'][name])
+            for name, bounds in cls.HISTOGRAMS.items()
+        }
+        stats.repeated = {sql: dict(entry) for sql, entry in data['repeated'].items()}
+        return stats
+
+
+class Registry:
+    """This worker's per-view statistics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.views = {}
+        self.worker_key = f'request_metrics:{socket.gethostname()}:{os.getpid()}'
+        self.last_flush = 0.0
+
+    def record(self, view_name, recorder, latency_ms, over_budget):
+        with self._lock:
+            stats = self.views.setdefault(view_name, ViewStats())
+            stats.requests += 1
+            stats.over_budget += over_budget
+            stats.histograms['latency_ms'].add(latency_ms)
+            stats.histograms['sql_ms'].add(recorder.sql_ms)
+            stats.histograms['template_ms'].add(recorder.template_ms)
+            stats.histograms['queries'].add(len(recorder.queries))
+            for sql, n in recorder.repeated():
+                stats.add_repeated(sql, 1, n)
+
+    def dump(self):
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self.views.items()}
+
+    def flush(self, force=False):
+        """Copy this worker's data to the cache (at most every FLUSH_INTERVAL seconds)."""
+        now = time.monotonic()
+        if not force and now - self.last_flush < FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+        cache.set(self.worker_key, self.dump(), CACHE_TIMEOUT)
+        workers = cache.get(WORKERS_KEY) or []
+        if self.worker_key not in workers:
+            cache.set(WORKERS_KEY, workers + [self.worker_key], CACHE_TIMEOUT)
+
+    def reset(self):
+        with self._lock:
+            self.views = {}
+        cache.delete_many(cache.get(WORKERS_KEY) or [])
+        cache.delete(WORKERS_KEY)
+
+
+registry = Registry()
+
+
+def metrics():
+    """Per-view summaries merged across all workers that reported to the cache."""
+    registry.flush(force=True)
+    merged = {}
+    workers = cache.get(WORKERS_KEY) or []
+    dumps = cache.get_many(workers)
+    for views in dumps.values():
+        for name, data in views.items():
+            stats = ViewStats.from_dict(data)
+            if name in merged:
+                merged[name].merge(stats)
+            else:
+                merged[name] = stats
+    return {
+        'workers': len(dumps),
+        'views': {name: merged[name].summary() for name in sorted(merged)},
+    }
+
+
+class QueryRecorder:
+    """Database execute wrapper collecting the fingerprint and duration of each query."""
+
+    def __init__(self):
+        self.queries = []  # (fingerprint, ms)
+        self.template_ms = 0.0
+        self.rendering = False  # inside a timed render: nested renders are already counted
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((fingerprint(sql), (time.perf_counter() - start) * 1000))
+
+    @property
+    def sql_ms(self):
+        return sum(ms for _, ms in self.queries)
+
+    def repeated(self):
+        """(fingerprint, times) for fingerprints run at least REPEAT_THRESHOLD times."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, n) for sql, n in counts.most_common() if n >= REPEAT_THRESHOLD]
+
+
+class TimedTemplate(Template):
+    """Backend template adding its render time to the current request's recorder."""
+
+    def render(self, context=None, request=None):
+        recorder = _recorder.get()
+        if recorder is None or recorder.rendering:
+            return super().render(context, request)
+        recorder.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            recorder.rendering = False
+            recorder.template_ms += (time.perf_counter() - start) * 1000
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend with ``TimedTemplate``s. Top-level renders
+    (render(), render_to_string()) go through the backend template; includes
+    and {% extends %} happen inside it.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def budget_for(view_name):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+class InstrumentationMiddleware:
+    """Record queries, SQL/template time and latency per view; warn on query budget overruns."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or 'unresolved'
+        budget = budget_for(view_name)
+        over_budget = budget is not None and len(recorder.queries) > budget
+        if over_budget:
+            self.warn(view_name, recorder, budget)
+        registry.record(view_name, recorder, latency_ms, over_budget)
+        registry.flush()
+        return response
+
+    @staticmethod
+    def warn(view_name, recorder, budget):
+        repeated = recorder.repeated()
+        if repeated:
+            sql, n = repeated[0]
+            detail = f"most repeated ({n}x): {sql}"
+        else:
+            sql, ms = max(recorder.queries, key=lambda q: q[1])
+            detail = f"slowest ({ms:.1f} ms): {sql}"
+        logger.warning(
+            "%s ran %d queries (budget %d); %s",
+            view_name, len(recorder.queries), budget, detail,
+        )
@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import rollup
+
+
+def _day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}; expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily booking rollup from the booking history, streamed in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD); default: the beginning.")
+        parser.add_argument('--end', help="Last day to rebuild (YYYY-MM-DD); default: today and later.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = _day(options['start']) if options['start'] else None
+        end = _day(options['end']) if options['end'] else None
+        if start and end and start > end:
+            raise CommandError("--start is after --end.")
+        rows = rollup.backfill(start, end, chunk_size=options['chunk_size'],
+                               log=lambda message: self.stdout.write(f"  {message}"))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rollup row(s)."))
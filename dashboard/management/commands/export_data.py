@@ -0,0 +1,49 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.models import Booking
+from dashboard import exports
+
+
+def _day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}; expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Stream bookings, reviews or payouts as CSV or NDJSON to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.DATASETS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--start', help="First day to export (YYYY-MM-DD).")
+        parser.add_argument('--end', help="Last day to export (YYYY-MM-DD).")
+        parser.add_argument('--status', action='append', default=[],
+                            choices=[value for value, _ in Booking.STATUS_CHOICES],
+                            help="Only bookings in this status (repeatable).")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output.")
+        parser.add_argument('--output', '-o', help="File to write; default: stdout.")
+
+    def handle(self, *args, **options):
+        start = _day(options['start']) if options['start'] else None
+        end = _day(options['end']) if options['end'] else None
+        if start and end and start > end:
+            raise CommandError("--start is after --end.")
+        try:
+            header, rows = exports.export_rows(options['dataset'], start, end, options['status'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in exports.stream(header, rows, options['format'], options['gzip']):
+                out.write(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from dashboard.models import PlatformStats
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard's PlatformStats row from the tables and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report counters that drifted; exit non-zero if there are any.")
+
+    def handle(self, *args, **options):
+        stored = PlatformStats.objects.filter(pk=PlatformStats.ROW_ID).first()
+        if stored is None:
+            if options['check']:
+                raise CommandError("Platform stats have not been computed yet.")
+            PlatformStats.reconcile()
+            self.stdout.write(self.style.SUCCESS("Computed platform stats."))
+            return
+
+        actual = PlatformStats.compute()
+        drift = {field: value for field, value in actual.items() if getattr(stored, field) != value}
+        for field, value in drift.items():
+            self.stdout.write(f"  {field}: stored={getattr(stored, field)} actual={value}")
+        if options['check']:
+            if drift:
+                raise CommandError(f"{len(drift)} counter(s) drifted from the tables.")
+            self.stdout.write(self.style.SUCCESS("Platform stats match the tables."))
+            return
+        with transaction.atomic():
+            PlatformStats.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled platform stats ({len(drift)} counter(s) corrected)."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import fraud
+
+
+class Command(BaseCommand):
+    help = "Slide the fraud-signal window (run daily), or rebuild all counters from the bookings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Recompute every counter and bucket from the bookings.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            counters = fraud.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt fraud counters for {counters} customer(s)."))
+            return
+        removed = fraud.slide_window()
+        flagged = fraud.flagged_customers().count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {removed} expired bucket(s); {flagged} customer(s) flagged."))
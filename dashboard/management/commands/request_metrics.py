@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from dashboard.instrumentation import metrics, registry
+
+
+class Command(BaseCommand):
+    help = "Show per-view query counts and latency recorded by InstrumentationMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help="Print the raw summaries as JSON.")
+        parser.add_argument('--view', nargs='*', default=None, help="Only these view names.")
+        parser.add_argument('--reset', action='store_true', help="Discard all recorded data.")
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            registry.reset()
+            self.stdout.write(self.style.SUCCESS("Request metrics reset."))
+            return
+        data = metrics()
+        if options['view']:
+            data['views'] = {name: v for name, v in data['views'].items() if name in options['view']}
+        if options['json']:
+            self.stdout.write(json.dumps(data, indent=2))
+            return
+
+        self.stdout.write(f"{data['workers']} worker(s) reporting")
+        self.stdout.write(
+            f"{'view':<28}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'queries p95':>12}"
+            f"{'sql ms':>9}{'tmpl ms':>9}{'over budget':>12}"
+        )
+        for name, v in data['views'].items():
+            self.stdout.write(
+                f"{name:<28}{v['requests']:>9}{v['latency_ms']['p50']:>9}{v['latency_ms']['p95']:>9}"
+                f"{v['queries']['p95']:>12}{v['sql_ms']['mean']:>9}{v['template_ms']['mean']:>9}"
+                f"{v['over_budget']:>12}"
+            )
+            for entry in v['repeated_queries'][:3]:
+                self.stdout.write(
+                    f"    repeated in {entry['requests']} request(s), up to {entry['max_repeats']}x: "
+                    f"{entry['sql'][:160]}"
+                )
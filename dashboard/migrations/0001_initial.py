@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('users_admin', models.IntegerField(default=0)),
+                ('users_employee', models.IntegerField(default=0)),
+                ('users_customer', models.IntegerField(default=0)),
+                ('pending_verifications', models.IntegerField(default=0)),
+                ('bookings_pending', models.IntegerField(default=0)),
+                ('bookings_accepted', models.IntegerField(default=0)),
+                ('bookings_rejected', models.IntegerField(default=0)),
+                ('bookings_in_progress', models.IntegerField(default=0)),
+                ('bookings_completed', models.IntegerField(default=0)),
+                ('bookings_cancelled', models.IntegerField(default=0)),
+                ('completed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'platform stats',
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 6.0.2 on 2026-10-17 14:40
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def populate_fraud_counters(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    FraudBucket = apps.get_model('dashboard', 'FraudBucket')
+    FraudCounter = apps.get_model('dashboard', 'FraudCounter')
+    counts = {
+        'cancelled': Count('pk', filter=Q(status='cancelled')),
+        'rejected': Count('pk', filter=Q(status='rejected')),
+    }
+    signals = Booking.objects.filter(status__in=('cancelled', 'rejected')).order_by()
+    start = timezone.localdate() - timedelta(days=settings.FRAUD_WINDOW_DAYS - 1)
+    recent = {}
+    buckets = []
+    for row in signals.filter(updated_at__date__gte=start).values(
+            'customer_id', day=TruncDate('updated_at')).annotate(**counts).iterator():
+        buckets.append(FraudBucket(customer_id=row['customer_id'], day=row['day'],
+                                   cancelled=row['cancelled'], rejected=row['rejected']))
+        c, r = recent.get(row['customer_id'], (0, 0))
+        recent[row['customer_id']] = (c + row['cancelled'], r + row['rejected'])
+    FraudBucket.objects.bulk_create(buckets, batch_size=5000)
+
+    counters = []
+    for row in signals.values('customer_id').annotate(**counts).iterator():
+        counter = FraudCounter(customer_id=row['customer_id'], cancelled_total=row['cancelled'],
+                               rejected_total=row['rejected'])
+        counter.cancelled_recent, counter.rejected_recent = recent.get(row['customer_id'], (0, 0))
+        counter.flagged = any(
+            threshold is not None and getattr(counter, field) >= threshold
+            for field, threshold in settings.FRAUD_THRESHOLDS.items()
+        )
+        counters.append(counter)
+    FraudCounter.objects.bulk_create(counters, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_outbox_coalescing'),
+        ('dashboard', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FraudBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('cancelled', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='fraud_bucket_day')],
+                'constraints': [models.UniqueConstraint(fields=('customer', 'day'), name='fraud_bucket_customer_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FraudCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cancelled_total', models.IntegerField(default=0)),
+                ('rejected_total', models.IntegerField(default=0)),
+                ('cancelled_recent', models.IntegerField(default=0)),
+                ('rejected_recent', models.IntegerField(default=0)),
+                ('flagged', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fraud_counter', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('flagged', True)), fields=['-cancelled_recent', '-rejected_recent'], name='fraud_counter_flagged')],
+            },
+        ),
+        migrations.RunPython(populate_fraud_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_fraud_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(blank=True, default='', max_length=100)),
+                ('city', models.CharField(blank=True, default='', max_length=100)),
+                ('created', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'daily booking stats',
+                'ordering': ['day'],
+                'constraints': [models.UniqueConstraint(fields=('category', 'city', 'day'), name='daily_booking_stats_key')],
+            },
+        ),
+    ]
@@ -1,3 +1,170 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Count, F, Q, Sum
 
-# Create your models here.
+
+class PlatformStats(models.Model):
+    """
+    Single-row rollup of the admin dashboard's headline numbers.
+
+    Kept current by signal handlers (``dashboard.signals``) that apply atomic
+    ``F()`` deltas in the same transaction as the change; ``manage.py
+    reconcile_stats`` recomputes it from the tables to correct drift.
+    """
+    ROW_ID = 1
+    BOOKING_STATUSES = ('pending', 'accepted', 'rejected', 'in_progress', 'completed', 'cancelled')
+
+    users_admin = models.IntegerField(default=0)
+    users_employee = models.IntegerField(default=0)
+    users_customer = models.IntegerField(default=0)
+    pending_verifications = models.IntegerField(default=0)
+    bookings_pending = models.IntegerField(default=0)
+    bookings_accepted = models.IntegerField(default=0)
+    bookings_rejected = models.IntegerField(default=0)
+    bookings_in_progress = models.IntegerField(default=0)
+    bookings_completed = models.IntegerField(default=0)
+    bookings_cancelled = models.IntegerField(default=0)
+    completed_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'platform stats'
+
+    def __str__(self):
+        return f"Platform stats (updated {self.updated_at:%Y-%m-%d %H:%M})"
+
+    @property
+    def total_users(self):
+        return self.users_admin + self.users_employee + self.users_customer
+
+    @property
+    def total_bookings(self):
+        return sum(self.bookings_by_status.values())
+
+    @property
+    def bookings_by_status(self):
+        return {status: getattr(self, f'bookings_{status}') for status in self.BOOKING_STATUSES}
+
+    @classmethod
+    def load(cls):
+        """The stats row, computed from scratch the first time."""
+        stats = cls.objects.filter(pk=cls.ROW_ID).first()
+        if stats is None:
+            stats, _ = cls.reconcile()
+        return stats
+
+    @classmethod
+    def apply(cls, **deltas):
+        """Add ``deltas`` (field -> amount) to the row in one UPDATE."""
+        deltas = {field: amount for field, amount in deltas.items() if amount}
+        if not deltas:
+            return
+        updated = cls.objects.filter(pk=cls.ROW_ID).update(
+            **{field: F(field) + amount for field, amount in deltas.items()})
+        if not updated:
+            cls.reconcile()  # first change ever: the row is built from the tables instead
+
+    @classmethod
+    def compute(cls):
+        """The true values, aggregated from the tables."""
+        from accounts.models import EmployeeProfile, User
+        from bookings.models import Booking
+        values = {f'users_{role}': 0 for role in ('admin', 'employee', 'customer')}
+        for role, n in User.objects.order_by().values_list('role').annotate(n=Count('pk')):
+            if f'users_{role}' in values:
+                values[f'users_{role}'] = n
+        values['pending_verifications'] = EmployeeProfile.objects.filter(is_verified=False).count()
+        values.update({f'bookings_{status}': 0 for status in cls.BOOKING_STATUSES})
+        for status, n in Booking.objects.order_by().values_list('status').annotate(n=Count('pk')):
+            if f'bookings_{status}' in values:
+                values[f'bookings_{status}'] = n
+        values['completed_revenue'] = Booking.objects.aggregate(
+            total=Sum('total_cost', filter=Q(status='completed')))['total'] or 0
+        return values
+
+    @classmethod
+    def reconcile(cls):
+        """Overwrite the row with computed values; returns (stats, {field: (stored, actual)} drift)."""
+        actual = cls.compute()
+        stats, created = cls.objects.get_or_create(pk=cls.ROW_ID, defaults=actual)
+        drift = {}
+        if not created:
+            drift = {
+                field: (getattr(stats, field), value)
+                for field, value in actual.items() if getattr(stats, field) != value
+            }
+            if drift:
+                for field, value in actual.items():
+                    setattr(stats, field, value)
+                stats.save()
+        return stats, drift
+
+
+class FraudCounter(models.Model):
+    """
+    A customer's cancelled/rejected booking counts, all-time and within the
+    sliding window (``FRAUD_WINDOW_DAYS``), maintained by ``dashboard.fraud``.
+    ``flagged`` is set when any count reaches its ``FRAUD_THRESHOLDS`` entry.
+    """
+    customer = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='fraud_counter')
+    cancelled_total = models.IntegerField(default=0)
+    rejected_total = models.IntegerField(default=0)
+    cancelled_recent = models.IntegerField(default=0)
+    rejected_recent = models.IntegerField(default=0)
+    flagged = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The dashboard only ever reads the (small) flagged set
+            models.Index(fields=['-cancelled_recent', '-rejected_recent'],
+                         condition=Q(flagged=True), name='fraud_counter_flagged'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer} – {self.cancelled_total} cancelled, {self.rejected_total} rejected"
+
+
+class FraudBucket(models.Model):
+    """One customer's cancellations/rejections on one day; pruned once outside the window."""
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    cancelled = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'day'], name='fraud_bucket_customer_day'),
+        ]
+        indexes = [models.Index(fields=['day'], name='fraud_bucket_day')]
+
+    def __str__(self):
+        return f"{self.customer} on {self.day}: {self.cancelled} cancelled, {self.rejected} rejected"
+
+
+class DailyBookingStats(models.Model):
+    """
+    Bookings created, completed and cancelled, and completed revenue, per day.
+
+    Rows are keyed by (day, category, city) where an empty category or city
+    means "all", so any combination of filters is answered by one row per day.
+    Maintained by ``dashboard.rollup``.
+    """
+    day = models.DateField()
+    category = models.CharField(max_length=100, blank=True, default='')
+    city = models.CharField(max_length=100, blank=True, default='')
+    created = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'city', 'day'], name='daily_booking_stats_key'),
+        ]
+        ordering = ['day']
+        verbose_name_plural = 'daily booking stats'
+
+    def __str__(self):
+        return f"{self.day} {self.category or 'all categories'} / {self.city or 'all cities'}"
@@ -0,0 +1,204 @@
+"""
+Daily booking rollup.
+
+Each booking event adds to ``DailyBookingStats`` rows for its day: creation on
+the day it was created, completion (with its revenue) or cancellation on the
+day the booking reached that status. A booking counts towards every
+(category, city) key it matches, where '' stands for "all": the overall row,
+its city, each category of its required skills, and each category within
+that city. The city is ``Booking.employee_city``, fixed when the booking is
+made, so later events and ``backfill()`` use the key that was first counted
+even after the employee moves. Rows are upserted with one
+``INSERT ... ON CONFLICT DO UPDATE`` per event.
+
+``backfill()`` rebuilds a date range by streaming the booking history in
+chunks; ``series()`` reads a date range back, zero-filled, without touching
+the booking table.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from itertools import product
+
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from bookings.models import Booking
+from .models import DailyBookingStats
+
+COUNTERS = ('created', 'completed', 'cancelled', 'revenue')
+OUTCOMES = ('completed', 'cancelled')  # final statuses with their own counter
+
+
+def dimensions(booking_ids):
+    """{booking id: (booking city, set of skill categories)} in two queries."""
+    dims = {
+        pk: (city, set())
+        for pk, city in Booking.objects.filter(pk__in=booking_ids).values_list('pk', 'employee_city')
+    }
+    categories = (
+        Booking.skills_required.through.objects.filter(booking_id__in=booking_ids)
+        .exclude(skill__category='').values_list('booking_id', 'skill__category').distinct()
+    )
+    for booking_id, category in categories:
+        if booking_id in dims:
+            dims[booking_id][1].add(category)
+    return dims
+
+
+def keys_for(city, categories):
+    """Every (category, city) row a booking with these dimensions counts towards."""
+    cities = {'', city} if city else {''}
+    return sorted(product({''} | set(categories), cities))
+
+
+def event_deltas(status, total_cost, created=False):
+    """Counter deltas for a booking being created or reaching ``status``."""
+    deltas = {}
+    if created:
+        deltas['created'] = 1
+    if status in OUTCOMES:
+        deltas[status] = 1
+        if status == 'completed':
+            deltas['revenue'] = total_cost
+    return deltas
+
+
+def apply(day, keys, deltas, sign=1):
+    """Add ``deltas`` (times ``sign``) to the ``day`` row of every key in one statement."""
+    if not deltas or not keys:
+        return
+    values = [sign * deltas.get(counter, 0) for counter in COUNTERS]
+    table = connection.ops.quote_name(DailyBookingStats._meta.db_table)
+    columns = ', '.join(('day', 'category', 'city') + COUNTERS)
+    updates = ', '.join(f'{c} = {table}.{c} + EXCLUDED.{c}' for c in COUNTERS)
+    rows = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(keys))
+    params = []
+    for category, city in keys:  # sorted: concurrent upserts lock rows in the same order
+        params.extend([day, category, city, *values])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) VALUES {rows} '
+            f'ON CONFLICT (day, category, city) DO UPDATE SET {updates}',
+            params,
+        )
+
+
+def record_created(booking_id, status, total_cost):
+    """
+    Count a new booking; run on commit, once its required skills are saved.
+    ``status`` is the one it was created with (imported history may already be final).
+    """
+    created_at = Booking.objects.filter(pk=booking_id).values_list('created_at', flat=True).first()
+    if created_at is None:
+        return
+    city, categories = dimensions([booking_id])[booking_id]
+    apply(timezone.localdate(created_at), keys_for(city, categories),
+          event_deltas(status, total_cost, created=True))
+
+
+def record_outcome(booking):
+    """Count ``booking`` reaching a final status today."""
+    if booking.status not in OUTCOMES:
+        return
+    city, categories = dimensions([booking.pk])[booking.pk]
+    apply(timezone.localdate(), keys_for(city, categories), event_deltas(booking.status, booking.total_cost))
+
+
+def remove(booking):
+    """Take a booking that is being deleted back out of the rollup."""
+    dims = dimensions([booking.pk]).get(booking.pk)
+    if dims is None:
+        return
+    keys = keys_for(*dims)
+    apply(timezone.localdate(booking.created_at), keys, {'created': 1}, sign=-1)
+    # A final status is never left again, so updated_at is when it was reached
+    apply(timezone.localdate(booking.updated_at), keys, event_deltas(booking.status, booking.total_cost), sign=-1)
+
+
+def series(start, end, category='', city=''):
+    """Per-day counters from ``start`` to ``end`` (inclusive) for one key, zero-filled."""
+    rows = {
+        row['day']: row for row in
+        DailyBookingStats.objects.filter(category=category, city=city, day__range=(start, end))
+        .values('day', *COUNTERS)
+    }
+    days = []
+    day = start
+    while day <= end:
+        days.append(rows.get(day) or {'day': day, 'created': 0, 'completed': 0, 'cancelled': 0,
+                                      'revenue': Decimal('0')})
+        day += timedelta(days=1)
+    return days
+
+
+def total(counter, start, end, category='', city=''):
+    """Sum of one counter over a date range for one key."""
+    return DailyBookingStats.objects.filter(
+        category=category, city=city, day__range=(start, end),
+    ).aggregate(n=Sum(counter))['n'] or 0
+
+
+def backfill(start=None, end=None, chunk_size=2000, log=None):
+    """
+    Rebuild the rows for ``start``..``end`` (inclusive; None = unbounded) from
+    the bookings, streamed ``chunk_size`` at a time; returns the rows written.
+    """
+    day_range = {}
+    if start:
+        day_range['gte'] = start
+    if end:
+        day_range['lte'] = end
+
+    def in_range(day):
+        return (start is None or day >= start) and (end is None or day <= end)
+
+    bookings = Booking.objects.all()
+    if day_range:
+        created = Q(**{f'created_at__date__{op}': day for op, day in day_range.items()})
+        finished = Q(status__in=OUTCOMES, **{f'updated_at__date__{op}': day for op, day in day_range.items()})
+        bookings = bookings.filter(created | finished)
+    rows = bookings.order_by().values_list('pk', 'created_at', 'updated_at', 'status', 'total_cost')
+
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    seen = 0
+    chunk = []
+
+    def flush():
+        dims = dimensions([row[0] for row in chunk])
+        for pk, created_at, updated_at, status, total_cost in chunk:
+            keys = keys_for(*dims[pk])
+            events = [(timezone.localdate(created_at), {'created': 1})]
+            if status in OUTCOMES:
+                events.append((timezone.localdate(updated_at), event_deltas(status, total_cost)))
+            for day, deltas in events:
+                if not in_range(day):
+                    continue
+                for category, city in keys:
+                    counters = totals[(day, category, city)]
+                    for counter, amount in deltas.items():
+                        counters[counter] += amount
+        chunk.clear()
+
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            seen += len(chunk)
+            flush()
+            if log:
+                log(f"{seen} bookings read")
+    seen += len(chunk)
+    flush()
+
+    stale = DailyBookingStats.objects.all()
+    if day_range:
+        stale = stale.filter(**{f'day__{op}': day for op, day in day_range.items()})
+    with transaction.atomic():
+        stale.delete()
+        DailyBookingStats.objects.bulk_create(
+            (DailyBookingStats(day=day, category=category, city=city, **counters)
+             for (day, category, city), counters in totals.items()),
+            batch_size=chunk_size,
+        )
+    return len(totals)
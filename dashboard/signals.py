@@ -0,0 +1,166 @@
+"""
+Keep ``PlatformStats`` in step with users, employee profiles and bookings,
+the fraud counters (``dashboard.fraud``) in step with cancellations and
+rejections, and the daily rollup (``dashboard.rollup``) in step with booking
+creations and outcomes.
+
+Each handler turns one model change into counter deltas applied with a
+single ``UPDATE ... SET x = x + n`` in the caller's transaction, so a rolled
+back booking never shows up in the dashboard. ``QuerySet.update`` and
+``bulk_create`` bypass these signals: wrap such bulk writes in
+``stats_paused()`` and run ``PlatformStats.reconcile()``, ``fraud.rebuild()``
+and ``rollup.backfill()`` afterwards.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import EmployeeProfile, User
+from bookings.models import Booking
+from . import fraud, rollup
+from .models import PlatformStats
+
+_paused = ContextVar('platform_stats_paused', default=False)
+
+
+@contextmanager
+def stats_paused():
+    """Skip per-row deltas (e.g. around bulk deletes that are followed by a reconcile)."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def _apply(**deltas):
+    if not _paused.get():
+        PlatformStats.apply(**deltas)
+
+
+def _touches(update_fields, field):
+    return update_fields is None or field in update_fields
+
+
+def _role_field(role):
+    return f'users_{role}'
+
+
+def _booking_deltas(status, total_cost, sign):
+    deltas = {f'bookings_{status}': sign}
+    if status == 'completed':
+        deltas['completed_revenue'] = sign * total_cost
+    return deltas
+
+
+@receiver(pre_save, sender=User)
+def remember_user_role(sender, instance, update_fields=None, **kwargs):
+    instance._stats_old_role = None
+    if instance.pk and _touches(update_fields, 'role'):
+        instance._stats_old_role = User.objects.filter(pk=instance.pk).values_list('role', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        _apply(**{_role_field(instance.role): 1})
+        return
+    old_role = getattr(instance, '_stats_old_role', None)
+    if old_role and old_role != instance.role:
+        _apply(**{_role_field(old_role): -1, _role_field(instance.role): 1})
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    _apply(**{_role_field(instance.role): -1})
+
+
+@receiver(pre_save, sender=EmployeeProfile)
+def remember_verification(sender, instance, update_fields=None, **kwargs):
+    instance._stats_was_verified = None
+    if instance.pk and _touches(update_fields, 'is_verified'):
+        instance._stats_was_verified = (
+            EmployeeProfile.objects.filter(pk=instance.pk).values_list('is_verified', flat=True).first())
+
+
+@receiver(post_save, sender=EmployeeProfile)
+def employee_profile_saved(sender, instance, created, **kwargs):
+    if created:
+        _apply(pending_verifications=0 if instance.is_verified else 1)
+        return
+    was_verified = getattr(instance, '_stats_was_verified', None)
+    if was_verified is not None and was_verified != instance.is_verified:
+        _apply(pending_verifications=1 if was_verified else -1)
+
+
+@receiver(post_delete, sender=EmployeeProfile)
+def employee_profile_deleted(sender, instance, **kwargs):
+    if not instance.is_verified:
+        _apply(pending_verifications=-1)
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, created, **kwargs):
+    if created:
+        _apply(**_booking_deltas(instance.status, instance.total_cost, 1))
+    elif instance.status_changed:
+        # post_save runs before Booking.save() refreshes _loaded_status
+        if getattr(instance, '_loaded_status', None) is None:
+            # Saved without being loaded: the old status is unknown, recount instead
+            if not _paused.get():
+                transaction.on_commit(PlatformStats.reconcile)
+            return
+        deltas = _booking_deltas(instance._loaded_status, instance.total_cost, -1)
+        for field, amount in _booking_deltas(instance.status, instance.total_cost, 1).items():
+            deltas[field] = deltas.get(field, 0) + amount
+        _apply(**deltas)
+
+
+@receiver(pre_delete, sender=Booking)
+def load_counted_booking(sender, instance, **kwargs):
+    """Uncount a deleted booking as stored: the instance may predate a ``transition()``."""
+    if _paused.get():
+        return
+    stored = Booking.objects.filter(pk=instance.pk).values('status', 'total_cost', 'updated_at').first()
+    for field, value in (stored or {}).items():
+        setattr(instance, field, value)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    _apply(**_booking_deltas(instance.status, instance.total_cost, -1))
+
+
+@receiver(post_save, sender=Booking)
+def booking_fraud_signal(sender, instance, created, **kwargs):
+    if (created or instance.status_changed) and not _paused.get():
+        fraud.record(instance.customer_id, instance.status)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_fraud_signal_deleted(sender, instance, **kwargs):
+    if not _paused.get():
+        fraud.record(instance.customer_id, instance.status, sign=-1, day=timezone.localdate(instance.updated_at))
+
+
+@receiver(post_save, sender=Booking)
+def booking_rollup(sender, instance, created, **kwargs):
+    if _paused.get():
+        return
+    if created:
+        # Skills are added after the booking row; count it once the transaction commits
+        pk, status, total_cost = instance.pk, instance.status, instance.total_cost
+        transaction.on_commit(lambda: rollup.record_created(pk, status, total_cost))
+    elif instance.status_changed:
+        rollup.record_outcome(instance)
+
+
+@receiver(pre_delete, sender=Booking)
+def booking_rollup_deleted(sender, instance, **kwargs):
+    # pre_delete: the required skills (and so the categories) are still there
+    if not _paused.get():
+        rollup.remove(instance)
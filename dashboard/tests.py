@@ -1,3 +1,350 @@
-from django.test import TestCase
+"""
+Tests for the admin dashboard endpoints.
 
-# Create your tests here.
+    python manage.py test dashboard
+"""
+import csv
+import gzip
+import io
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomerProfile, EmployeeProfile, Skill, User
+from bookings.models import Booking
+from bookings.workflow import transition
+from . import fraud, rollup
+from .instrumentation import metrics, registry
+from .models import DailyBookingStats, FraudBucket, FraudCounter, PlatformStats
+
+
+class BatchMatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+        cls.skill = Skill.objects.create(name='Plumbing')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        # The matching index picks the employee up from the committed change
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = User.objects.create_user('plumber', 'plumber@example.com', 'pw', role='employee')
+            self.profile = EmployeeProfile.objects.create(user=employee, hourly_rate=Decimal('20.00'),
+                                                          latitude=10.0, longitude=20.0)
+            self.profile.skills.add(self.skill)
+
+    def post(self, payload):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        return self.client.post(reverse('batch_match'), body, content_type='application/json')
+
+    def test_ranks_each_request(self):
+        response = self.post({'requests': [
+            {'skills': [self.skill.pk], 'lat': 10.0, 'lng': 20.0},
+            {'skills': [], 'lat': None, 'lng': None},
+        ], 'limit': 3.0, 'max_per_employee': 2})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual([m['profile_id'] for m in results[0]['matches']], [self.profile.pk])
+        self.assertEqual(results[0]['matches'][0]['breakdown']['skill'], 1.0)
+
+    def test_max_per_employee_caps_assignments(self):
+        response = self.post({'requests': [{'skills': [self.skill.pk]}] * 2, 'max_per_employee': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([len(r['matches']) for r in response.json()['results']], [1, 0])
+
+    def test_malformed_payloads_are_rejected(self):
+        for body in (
+            'not json',
+            '[]',
+            '{"requests": {}}',
+            '{"requests": [1]}',
+            '{"requests": [], "limit": Infinity}',
+            '{"requests": [], "limit": NaN}',
+            '{"requests": [], "limit": 1.9}',
+            '{"requests": [], "limit": "5"}',
+            '{"requests": [], "limit": true}',
+            '{"requests": [], "max_per_employee": -Infinity}',
+            '{"requests": [{"skills": "12"}]}',
+            '{"requests": [{"skills": [1e400]}]}',
+            '{"requests": [{"skills": [1.5]}]}',
+            '{"requests": [{"skills": [null]}]}',
+            '{"requests": [{"lat": NaN}]}',
+            '{"requests": [{"lat": "10"}]}',
+            '{"requests": [{"lat": 90.5}]}',
+            '{"requests": [{"lng": -181}]}',
+            '{"requests": [{"lng": 1%s}]}' % ('0' * 400),
+        ):
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_large_integers_are_clamped(self):
+        response = self.post('{"requests": [{"skills": [1%s]}], "limit": 1%s}' % ('0' * 400, '0' * 400))
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_only(self):
+        self.client.force_login(self.profile.user)
+        self.assertEqual(self.post({'requests': []}).status_code, 403)
+
+
+class ExportTests(TestCase):
+    FORMULAS = ('=SUM(A1:A9)', '+1', '-2', '@cmd', '\tindent', '\rreturn')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+        customer = User.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        employee = User.objects.create_user('employee', 'employee@example.com', 'pw', role='employee')
+        CustomerProfile.objects.create(user=customer)
+        EmployeeProfile.objects.create(user=employee, hourly_rate=Decimal('20.00'))
+        for title in cls.FORMULAS + ('Fix the sink',):
+            Booking.objects.create(customer=customer, employee=employee, title=title, duration_value=3,
+                                   start_date=date(2026, 1, 5))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def export(self, dataset='bookings', **params):
+        response = self.client.get(reverse('export', args=[dataset]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def csv_rows(self, content):
+        reader = csv.DictReader(io.StringIO(content.decode(), newline=''))
+        return {row['id']: row for row in reader}
+
+    def test_formula_cells_are_neutralised_in_csv(self):
+        rows = self.csv_rows(self.export())
+        titles = sorted(row['title'] for row in rows.values())
+        self.assertEqual(titles, sorted(["'" + title for title in self.FORMULAS] + ['Fix the sink']))
+        for row in rows.values():
+            self.assertEqual(row['total_cost'], '60.00')
+            self.assertEqual(row['duration_value'], '3')
+            self.assertEqual(row['start_date'], '2026-01-05')
+            self.assertRegex(row['created_at'], r'^\d{4}-\d{2}-\d{2} ')
+
+    def test_ndjson_is_left_unchanged(self):
+        records = [json.loads(line) for line in self.export(format='ndjson').decode().splitlines()]
+        self.assertEqual(sorted(r['title'] for r in records), sorted(self.FORMULAS + ('Fix the sink',)))
+        self.assertEqual({r['total_cost'] for r in records}, {'60.00'})
+        self.assertEqual({r['start_date'] for r in records}, {'2026-01-05'})
+
+    def test_gzip_matches_the_plain_export(self):
+        self.assertEqual(gzip.decompress(self.export(gzip='1')), self.export())
+
+    def test_filters(self):
+        self.assertEqual(len(self.csv_rows(self.export(status='pending'))), len(self.FORMULAS) + 1)
+        self.assertEqual(self.csv_rows(self.export(status='completed,cancelled')), {})
+        self.assertEqual(self.csv_rows(self.export('payouts')), {})
+
+    def test_invalid_parameters_are_rejected(self):
+        for dataset, params in (
+            ('bookings', {'format': 'xml'}),
+            ('bookings', {'status': 'bogus'}),
+            ('bookings', {'start': '2026-02-01', 'end': '2026-01-01'}),
+            ('bookings', {'start': 'yesterday'}),
+            ('payouts', {'status': 'completed'}),
+        ):
+            with self.subTest(dataset=dataset, params=params):
+                response = self.client.get(reverse('export', args=[dataset]), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        self.assertEqual(self.client.get(reverse('export', args=['users'])).status_code, 404)
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.customer = User.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        self.employee = User.objects.create_user('employee', 'employee@example.com', 'pw', role='employee',
+                                                 city='Leeds')
+        CustomerProfile.objects.create(user=self.customer)
+        EmployeeProfile.objects.create(user=self.employee, hourly_rate=Decimal('20.00'))
+        self.skill = Skill.objects.create(name='Pipes', category='Plumbing')
+
+    def book(self, title):
+        # Counted on commit, once the required skills are saved
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(customer=self.customer, employee=self.employee, title=title,
+                                             duration_value=3)
+            booking.skills_required.add(self.skill)
+        return booking
+
+    def rows(self):
+        return sorted(
+            row for row in DailyBookingStats.objects.values_list('day', 'category', 'city', *rollup.COUNTERS)
+            if any(row[3:])
+        )
+
+    def test_incremental_updates_match_a_backfill_after_the_employee_moves(self):
+        completed, cancelled, deleted = self.book('Fix the sink'), self.book('Fix the tap'), self.book('Fix the bath')
+        self.employee.city = 'York'
+        self.employee.save()
+        self.book('Fix the boiler')  # booked after the move: counted in York
+        for action in ('accept', 'start', 'complete'):
+            transition(completed.pk, action, self.employee)
+        transition(cancelled.pk, 'cancel', self.customer)
+        deleted.delete()
+
+        incremental = self.rows()
+        today = incremental[0][0]
+        self.assertIn((today, 'Plumbing', 'Leeds', 2, 1, 1, Decimal('60.00')), incremental)
+        self.assertIn((today, 'Plumbing', 'York', 1, 0, 0, Decimal('0.00')), incremental)
+        self.assertIn((today, '', '', 3, 1, 1, Decimal('60.00')), incremental)
+        self.assertEqual(rollup.backfill(), len(incremental))
+        self.assertEqual(self.rows(), incremental)
+
+
+class PlatformStatsTests(TestCase):
+
+    def setUp(self):
+        PlatformStats.reconcile()
+        self.customer = User.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        self.employee = User.objects.create_user('employee', 'employee@example.com', 'pw', role='employee')
+        CustomerProfile.objects.create(user=self.customer)
+        self.profile = EmployeeProfile.objects.create(user=self.employee, hourly_rate=Decimal('20.00'))
+
+    def assertStats(self, **expected):
+        """The stored row matches the tables, and the named fields have these values."""
+        stats = PlatformStats.objects.get(pk=PlatformStats.ROW_ID)
+        stored = {field: getattr(stats, field) for field in PlatformStats.compute()}
+        self.assertEqual(stored, PlatformStats.compute())
+        self.assertEqual({field: stored[field] for field in expected}, expected)
+
+    def book(self):
+        return Booking.objects.create(customer=self.customer, employee=self.employee, title='Fix the sink',
+                                      duration_value=3)
+
+    def test_users_and_verifications(self):
+        self.assertStats(users_customer=1, users_employee=1, pending_verifications=1)
+        admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+        self.assertStats(users_admin=1)
+        admin.role = 'customer'
+        admin.save()
+        self.assertStats(users_admin=0, users_customer=2)
+        admin.save(update_fields=['last_login'])
+        self.assertStats(users_admin=0, users_customer=2)
+        self.profile.is_verified = True
+        self.profile.save()
+        self.assertStats(pending_verifications=0)
+        self.employee.delete()
+        self.assertStats(users_employee=0, pending_verifications=0)
+        admin.delete()
+        self.assertStats(users_customer=1)
+
+    def test_bookings_through_their_statuses(self):
+        first, second = self.book(), self.book()
+        self.assertStats(bookings_pending=2)
+        for action in ('accept', 'start', 'complete'):
+            transition(first.pk, action, self.employee)
+        transition(second.pk, 'cancel', self.customer)
+        self.assertStats(bookings_pending=0, bookings_completed=1, bookings_cancelled=1,
+                         completed_revenue=Decimal('60.00'))
+        first.delete()  # loaded before the transitions: uncounted as stored
+        self.assertStats(bookings_completed=0, completed_revenue=Decimal('0.00'))
+        second.delete()
+        self.assertStats(bookings_cancelled=0)
+
+    def test_status_saved_without_being_loaded_is_recounted(self):
+        booking = self.book()
+        unloaded = Booking(pk=booking.pk, customer=self.customer, employee=self.employee, title=booking.title,
+                           duration_value=3, total_cost=booking.total_cost, created_at=booking.created_at,
+                           status='rejected')
+        with self.captureOnCommitCallbacks(execute=True):
+            unloaded.save(force_update=True)
+        self.assertStats(bookings_pending=0, bookings_rejected=1)
+
+
+@override_settings(FRAUD_WINDOW_DAYS=30, FRAUD_THRESHOLDS={
+    'cancelled_total': 5, 'rejected_total': None, 'cancelled_recent': 2, 'rejected_recent': 2})
+class FraudSignalTests(TestCase):
+
+    def setUp(self):
+        self.customer = User.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        self.employee = User.objects.create_user('employee', 'employee@example.com', 'pw', role='employee')
+        CustomerProfile.objects.create(user=self.customer)
+        EmployeeProfile.objects.create(user=self.employee, hourly_rate=Decimal('20.00'))
+
+    def book(self, action=None):
+        booking = Booking.objects.create(customer=self.customer, employee=self.employee, title='Fix the sink',
+                                         duration_value=1)
+        if action:
+            transition(booking.pk, action, self.customer if action == 'cancel' else self.employee)
+        return booking
+
+    def counter(self):
+        counter = FraudCounter.objects.get(customer=self.customer)
+        return (counter.cancelled_total, counter.cancelled_recent, counter.rejected_total,
+                counter.rejected_recent, counter.flagged)
+
+    def age(self, days):
+        """Move every cancellation/rejection ``days`` into the past."""
+        FraudBucket.objects.update(day=timezone.localdate() - timedelta(days=days))
+        Booking.objects.update(updated_at=timezone.now() - timedelta(days=days))
+
+    def test_recent_cancellations_flag_the_customer(self):
+        self.book('cancel')
+        self.book()  # still pending: not a signal
+        self.assertEqual(self.counter(), (1, 1, 0, 0, False))
+        self.book('cancel')
+        self.assertEqual(self.counter(), (2, 2, 0, 0, True))
+        self.assertEqual(list(fraud.flagged_customers().values_list('customer', flat=True)), [self.customer.pk])
+        self.book('reject')
+        self.assertEqual(self.counter(), (2, 2, 1, 1, True))
+
+    def test_flags_expire_with_the_window(self):
+        self.book('cancel')
+        self.book('cancel')
+        self.age(settings.FRAUD_WINDOW_DAYS - 1)  # the window's first day: still counted
+        self.assertEqual(fraud.slide_window(), 0)
+        self.assertEqual(self.counter(), (2, 2, 0, 0, True))
+        self.age(settings.FRAUD_WINDOW_DAYS)
+        self.assertEqual(fraud.slide_window(), 1)
+        self.assertEqual(self.counter(), (2, 0, 0, 0, False))
+        self.book('cancel')  # a fresh one counts on its own
+        self.assertEqual(self.counter(), (3, 1, 0, 0, False))
+
+    def test_deleting_bookings_uncounts_them(self):
+        old, recent = self.book('cancel'), self.book('cancel')
+        Booking.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=90))
+        FraudBucket.objects.update(cancelled=1)  # the old one's bucket has long been pruned
+        old.delete()
+        self.assertEqual(self.counter(), (1, 1, 0, 0, False))
+        recent.delete()
+        self.assertEqual(self.counter(), (0, 0, 0, 0, False))
+
+    def test_rebuild_matches_the_incremental_counters(self):
+        for action in ('cancel', 'cancel', 'reject', None):
+            self.book(action)
+        self.age(settings.FRAUD_WINDOW_DAYS + 5)
+        self.book('reject')
+        fraud.slide_window()
+        incremental = self.counter()
+        fraud.rebuild()
+        self.assertEqual(self.counter(), incremental)
+        self.assertEqual(incremental, (2, 0, 2, 1, False))
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.user = User.objects.create_user('customer', 'customer@example.com', 'pw', role='customer')
+        CustomerProfile.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def test_requests_record_queries_and_template_time(self):
+        self.assertEqual(self.client.get(reverse('booking_list')).status_code, 200)
+        stats = metrics()['views']['booking_list']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries']['max'], 0)
+        self.assertGreater(stats['template_ms']['max'], 0)
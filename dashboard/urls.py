@@ -4,4 +4,9 @@ from . import views
 urlpatterns = [
     path('', views.admin_dashboard_view, name='admin_dashboard'),
     path('verify/<int:pk>/', views.verify_employee_view, name='verify_employee'),
+    path('matching/batch/', views.batch_match_view, name='batch_match'),
+    path('metrics/matching-index/', views.matching_index_stats_view, name='matching_index_stats'),
+    path('stats/bookings/', views.booking_series_view, name='booking_series'),
+    path('metrics/requests/', views.request_metrics_view, name='request_metrics'),
+    path('export/<str:dataset>/', views.export_view, name='export'),
 ]
@@ -1,12 +1,27 @@
+import json
+import math
+
+from django.conf import settings
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
-from django.db.models import Count, Sum, Q
+from django.http import Http404, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 
-from accounts.models import User, EmployeeProfile
+from accounts.models import EmployeeProfile
 from bookings.models import Booking, Review
+from bookings.index import matching_index
+from bookings.services import rank_employees_batch
+from . import exports, fraud, rollup
+from .instrumentation import metrics
+from .models import PlatformStats
+
+MAX_BATCH_REQUESTS = 1000
+MAX_BATCH_LIMIT = 50
+UNVERIFIED_SHOWN = 20
+FRAUD_FLAGS_SHOWN = 20
+MAX_SERIES_DAYS = 3 * 366
 
 
 @login_required
@@ -15,53 +30,32 @@ def admin_dashboard_view(request):
     if not request.user.is_admin_user:
         return HttpResponseForbidden("Admin access only.")
 
-    now = timezone.now()
-    last_30_days = now - timedelta(days=30)
-
-    # Counts
-    total_users = User.objects.count()
-    total_employees = User.objects.filter(role='employee').count()
-    total_customers = User.objects.filter(role='customer').count()
-    pending_verifications = EmployeeProfile.objects.filter(is_verified=False).count()
-
-    # Bookings stats
-    total_bookings = Booking.objects.count()
-    bookings_by_status = dict(
-        Booking.objects.values_list('status').annotate(c=Count('id')).values_list('status', 'c')
-    )
-    recent_bookings = Booking.objects.filter(created_at__gte=last_30_days)
-    revenue = Booking.objects.filter(status='completed').aggregate(
-        total=Sum('total_cost'))['total'] or 0
-
-    # Fraud indicators: users with many cancelled/rejected bookings
-    fraud_flags = (
-        User.objects.annotate(
-            cancelled=Count('bookings_as_customer', filter=Q(bookings_as_customer__status='cancelled')),
-            rejected=Count('bookings_as_customer', filter=Q(bookings_as_customer__status='rejected')),
-        )
-        .filter(Q(cancelled__gte=5) | Q(rejected__gte=5))
-    )
+    # Headline counters come from one pre-aggregated row kept current by signals
+    stats = PlatformStats.load()
+    today = timezone.localdate()
 
     # Recent bookings for table
     latest_bookings = Booking.objects.select_related('customer', 'employee').order_by('-created_at')[:20]
 
-    # Unverified employees
+    # Oldest unverified employees first; the total is in pending_verifications
     unverified_employees = EmployeeProfile.objects.filter(
         is_verified=False
-    ).select_related('user')
+    ).select_related('user').order_by('pk')[:UNVERIFIED_SHOWN]
 
     return render(request, 'dashboard/admin_dashboard.html', {
-        'total_users': total_users,
-        'total_employees': total_employees,
-        'total_customers': total_customers,
-        'pending_verifications': pending_verifications,
-        'total_bookings': total_bookings,
-        'bookings_by_status': bookings_by_status,
-        'recent_bookings_count': recent_bookings.count(),
-        'revenue': revenue,
-        'fraud_flags': fraud_flags,
+        'total_users': stats.total_users,
+        'total_employees': stats.users_employee,
+        'total_customers': stats.users_customer,
+        'pending_verifications': stats.pending_verifications,
+        'total_bookings': stats.total_bookings,
+        'bookings_by_status': stats.bookings_by_status,
+        'recent_bookings_count': rollup.total('created', today - timedelta(days=29), today),
+        'revenue': stats.completed_revenue,
+        'fraud_flags': fraud.flagged_customers(FRAUD_FLAGS_SHOWN),
+        'fraud_window_days': settings.FRAUD_WINDOW_DAYS,
         'latest_bookings': latest_bookings,
         'unverified_employees': unverified_employees,
+        'unverified_shown': UNVERIFIED_SHOWN,
     })
 
 
@@ -76,3 +70,195 @@ def verify_employee_view(request, pk):
     from django.contrib import messages
     messages.success(request, f"{profile.user.get_full_name()} verified.")
     return render(request, 'dashboard/admin_dashboard.html', {})
+
+
+@login_required
+def matching_index_stats_view(request):
+    """Hit/miss/refresh counters of this worker's matching index (JSON)."""
+    if not request.user.is_admin_user:
+        return HttpResponseForbidden()
+    return JsonResponse(matching_index.stats())
+
+
+@login_required
+def request_metrics_view(request):
+    """Per-view query counts, SQL/template time and latency across workers (JSON)."""
+    if not request.user.is_admin_user:
+        return HttpResponseForbidden()
+    return JsonResponse(metrics())
+
+
+def _number(value, name):
+    """A finite JSON number; bools and strings are refused."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f'"{name}" must be a number.')
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f'"{name}" must be a finite number.')
+    return value
+
+
+def _integer(value, name):
+    """A JSON number with no fractional part, as an int."""
+    value = _number(value, name)
+    if value != int(value):
+        raise ValueError(f'"{name}" must be a whole number.')
+    return int(value)
+
+
+def _coordinate(value, bound, name):
+    """A finite number within ±``bound``, or None; same limits as the search form."""
+    if value is None:
+        return None
+    if abs(_number(value, name)) > bound:
+        raise ValueError(f'"{name}" must be a number between -{bound} and {bound}.')
+    return float(value)
+
+
+def _skills(value):
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise ValueError('"skills" must be a list of skill ids.')
+    return [_integer(skill, 'skills') for skill in value]
+
+
+def _parse_batch(body):
+    """Validate a batch matching payload; returns (job_requests, limit, max_per_employee)."""
+    payload = json.loads(body)
+    if not isinstance(payload, dict) or not isinstance(payload.get('requests'), list):
+        raise ValueError('Expected an object with a "requests" list.')
+    if len(payload['requests']) > MAX_BATCH_REQUESTS:
+        raise ValueError(f'At most {MAX_BATCH_REQUESTS} requests per batch.')
+    job_requests = []
+    for item in payload['requests']:
+        if not isinstance(item, dict):
+            raise ValueError('Each request must be an object.')
+        job_requests.append({
+            'skills': _skills(item.get('skills')),
+            'lat': _coordinate(item.get('lat'), 90, 'lat'),
+            'lng': _coordinate(item.get('lng'), 180, 'lng'),
+        })
+    limit = min(max(_integer(payload.get('limit', 5), 'limit'), 1), MAX_BATCH_LIMIT)
+    max_per_employee = payload.get('max_per_employee')
+    if max_per_employee is not None:
+        max_per_employee = max(_integer(max_per_employee, 'max_per_employee'), 1)
+    return job_requests, limit, max_per_employee
+
+
+@login_required
+@require_POST
+def batch_match_view(request):
+    """
+    Rank employees for a batch of job requests (JSON in, JSON out).
+
+    Body: {"requests": [{"skills": [skill ids], "lat": .., "lng": ..}, ...],
+           "limit": 5, "max_per_employee": null}
+    """
+    if not request.user.is_admin_user:
+        return HttpResponseForbidden()
+    try:
+        job_requests, limit, max_per_employee = _parse_batch(request.body)
+    except (ValueError, TypeError, OverflowError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    batches = rank_employees_batch(job_requests, limit=limit, max_per_employee=max_per_employee)
+    return JsonResponse({'results': [
+        {'matches': [
+            {
+                'employee_id': r['profile'].user_id,
+                'profile_id': r['profile'].pk,
+                'name': r['profile'].user.get_full_name() or r['profile'].user.username,
+                'score': r['score'],
+                'breakdown': r['breakdown'],
+            }
+            for r in results
+        ]}
+        for results in batches
+    ]})
+
+
+def _parse_series(params):
+    """Validate booking series query parameters; returns (start, end, category, city)."""
+    end = date.fromisoformat(params['end']) if params.get('end') else timezone.localdate()
+    start = date.fromisoformat(params['start']) if params.get('start') else end - timedelta(days=29)
+    if start > end:
+        raise ValueError('start is after end.')
+    if (end - start).days >= MAX_SERIES_DAYS:
+        raise ValueError(f'At most {MAX_SERIES_DAYS} days per request.')
+    return start, end, params.get('category', ''), params.get('city', '')
+
+
+def _json_counter(counter, value):
+    return float(value) if counter == 'revenue' else value
+
+
+@login_required
+def booking_series_view(request):
+    """
+    Daily bookings created/completed/cancelled and revenue from the rollup (JSON).
+
+    Query: ?start=YYYY-MM-DD&end=YYYY-MM-DD&category=..&city=.. (default: the last 30 days,
+    all categories and cities).
+    """
+    if not request.user.is_admin_user:
+        return HttpResponseForbidden()
+    try:
+        start, end, category, city = _parse_series(request.GET)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    days = rollup.series(start, end, category, city)
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'category': category,
+        'city': city,
+        'totals': {
+            counter: _json_counter(counter, sum(day[counter] for day in days)) for counter in rollup.COUNTERS
+        },
+        'days': [
+            {'day': day['day'].isoformat(), **{counter: _json_counter(counter, day[counter]) for counter in rollup.COUNTERS}}
+            for day in days
+        ],
+    })
+
+
+def _parse_export(params):
+    """Validate export query parameters; returns (format, start, end, statuses, gzip)."""
+    fmt = params.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        raise ValueError(f'format must be one of: {", ".join(exports.FORMATS)}.')
+    start = date.fromisoformat(params['start']) if params.get('start') else None
+    end = date.fromisoformat(params['end']) if params.get('end') else None
+    if start and end and start > end:
+        raise ValueError('start is after end.')
+    statuses = [s for value in params.getlist('status') for s in value.split(',') if s]
+    unknown = set(statuses) - {value for value, _ in Booking.STATUS_CHOICES}
+    if unknown:
+        raise ValueError(f'Unknown status: {", ".join(sorted(unknown))}.')
+    return fmt, start, end, statuses, params.get('gzip') in ('1', 'true')
+
+
+@login_required
+def export_view(request, dataset):
+    """
+    Stream bookings, reviews or payouts as CSV or NDJSON (admin only).
+
+    Query: ?format=csv|ndjson&start=YYYY-MM-DD&end=YYYY-MM-DD&status=completed,cancelled&gzip=1
+    """
+    if not request.user.is_admin_user:
+        return HttpResponseForbidden()
+    if dataset not in exports.DATASETS:
+        raise Http404
+    try:
+        fmt, start, end, statuses, compress = _parse_export(request.GET)
+        header, rows = exports.export_rows(dataset, start, end, statuses)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    response = StreamingHttpResponse(
+        exports.stream(header, rows, fmt, compress),
+        content_type='application/gzip' if compress else f'{exports.FORMATS[fmt]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(dataset, fmt, compress)}"'
+    return response
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Project apps
     'accounts',
     'bookings',
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dashboard.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,7 +60,8 @@ ROOT_URLCONF = 'jobmate.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to dashboard.instrumentation
+        'BACKEND': 'dashboard.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -89,6 +92,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Workers share invalidation state (e.g. the matching index generation) through
+# the default cache, so point this at a shared backend such as Redis when
+# running more than one process.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='jobmate'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -129,6 +145,11 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads always go to a temporary file on disk, never fully into memory.
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+# Threads per process that build image size variants after upload (accounts/images.py).
+IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
+
 # Custom auth
 AUTH_USER_MODEL = 'accounts.User'
 LOGIN_URL = '/accounts/login/'
@@ -139,4 +160,46 @@ LOGOUT_REDIRECT_URL = '/'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@jobmate.com'
 
+# Notifications about the same booking for the same recipient are held for this
+# long and collapsed into one email with the latest state (bookings/outbox.py).
+NOTIFICATION_COALESCE_SECONDS = config('NOTIFICATION_COALESCE_SECONDS', default=120, cast=int)
+# Users with "email digest" switched on get one email per this period instead.
+NOTIFICATION_DIGEST_SECONDS = config('NOTIFICATION_DIGEST_SECONDS', default=3600, cast=int)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# AI Matching Engine backend for rank_employees():
+#   'index' – in-process NumPy index (bookings/index.py)
+#   'sql'   – score computed and top-k selected in the database (bookings/sql_matching.py)
+MATCHING_ENGINE = config('MATCHING_ENGINE', default='index')
+
+# Anonymous page cache (bookings/page_cache.py): responses are fresh for
+# PAGE_CACHE_SECONDS, then served stale for up to PAGE_CACHE_STALE_SECONDS more
+# while a single worker rebuilds them. Profile changes mark them stale at once.
+PAGE_CACHE_SECONDS = config('PAGE_CACHE_SECONDS', default=60, cast=int)
+PAGE_CACHE_STALE_SECONDS = config('PAGE_CACHE_STALE_SECONDS', default=300, cast=int)
+
+# Per-view request instrumentation (dashboard/instrumentation.py): query counts,
+# SQL/template time and latency at /dashboard/metrics/requests/ and
+# `manage.py request_metrics`. A request running more queries than its view's
+# budget logs a warning with the most repeated SQL.
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=True, cast=bool)
+QUERY_BUDGET_DEFAULT = None  # no budget for views not listed below
+QUERY_BUDGETS = {
+    'home': 8,
+    'employee_list': 8,
+    'booking_list': 8,
+    'booking_detail': 10,
+    'admin_dashboard': 15,
+}
+
+# Fraud signals (dashboard/fraud.py): a customer is flagged on the admin
+# dashboard once any of these counts reaches its threshold (None disables
+# one). *_recent counts only the last FRAUD_WINDOW_DAYS days.
+FRAUD_WINDOW_DAYS = config('FRAUD_WINDOW_DAYS', default=30, cast=int)
+FRAUD_THRESHOLDS = {
+    'cancelled_total': 5,
+    'rejected_total': 5,
+    'cancelled_recent': 3,
+    'rejected_recent': 3,
+}
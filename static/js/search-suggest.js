@@ -0,0 +1,29 @@
+/* Search box autocomplete: fills a <datalist> from the suggest endpoint.
+ * Usage: <input data-suggest="/search/suggest/" list="some-datalist-id"> */
+(function () {
+    document.querySelectorAll('input[data-suggest]').forEach(function (input) {
+        var list = document.getElementById(input.getAttribute('list'));
+        var timer = null;
+        var last = '';
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                var q = input.value.trim();
+                if (!q || q === last) { return; }
+                last = q;
+                fetch(input.dataset.suggest + '?q=' + encodeURIComponent(q))
+                    .then(function (r) { return r.json(); })
+                    .then(function (data) {
+                        if (data.query !== last) { return; }  // a newer keystroke won
+                        list.innerHTML = '';
+                        data.suggestions.forEach(function (s) {
+                            var option = document.createElement('option');
+                            option.value = s.label;
+                            option.label = s.kind;
+                            list.appendChild(option);
+                        });
+                    });
+            }, 120);
+        });
+    });
+})();